@@ -0,0 +1,5 @@
+"""
+Throughput benchmarks of :class:`gordo_client.client.Client`, run against a local stand-in Gordo server.
+
+Run them with ``python -m benchmarks.run --help``.
+"""
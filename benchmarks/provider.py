@@ -0,0 +1,41 @@
+from datetime import datetime
+from typing import Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from gordo_core.data_providers.base import GordoBaseDataProvider
+from gordo_core.sensor_tag import Tag, extract_tag_name
+from gordo_core.utils import capture_args
+
+
+class SyntheticDataProvider(GordoBaseDataProvider):
+    """
+    Data provider returning one value per ``resolution`` for every tag, so the number of
+    rows sent for a date range is known in advance, unlike with ``RandomDataProvider``.
+    """
+
+    @capture_args
+    def __init__(self, resolution: str = "10T"):
+        self.resolution = resolution
+
+    def can_handle_tag(self, tag: Tag):
+        return True
+
+    def load_series(
+        self,
+        train_start_date: datetime,
+        train_end_date: datetime,
+        tag_list: List[Tag],
+        dry_run: Optional[bool] = False,
+        **kwargs,
+    ) -> Iterable[Tuple[pd.Series, Tag]]:
+        if dry_run:
+            # Only checks the tags can be loaded, without generating their values
+            for tag in tag_list:
+                yield pd.Series([], index=pd.DatetimeIndex([]), name=extract_tag_name(tag), dtype=float), tag
+            return
+        index = pd.date_range(train_start_date, train_end_date, freq=self.resolution)
+        # Seeded by the start date, so the same range always gets the same values
+        random = np.random.default_rng(index[0].value if len(index) else 0)
+        for tag in tag_list:
+            yield pd.Series(random.random(len(index)), index=index, name=extract_tag_name(tag)), tag
@@ -0,0 +1,147 @@
+"""
+Measure the throughput of :meth:`gordo_client.client.Client.predict` against a local stand-in server.
+
+Every combination of the options given several times is run in a fresh process, reporting the rows
+and requests per second, the peak RSS and the CPU time of the client::
+
+    python -m benchmarks.run --batch-size 1000 --batch-size 10000 --format json --format parquet --tags 10
+"""
+
+import itertools
+import json
+import multiprocessing
+import resource
+import time
+from datetime import datetime, timedelta, timezone
+from typing import List, NamedTuple, Optional, Tuple
+
+import click
+
+from benchmarks.provider import SyntheticDataProvider
+from benchmarks.server import StandInServer
+from gordo_client import Client
+
+FORMATS = ("json", "parquet", "arrow")
+
+
+class Case(NamedTuple):
+    batch_size: int
+    parallelism: int
+    format: str
+    n_tags: int
+
+
+class Result(NamedTuple):
+    case: Case
+    rows: int
+    requests: int
+    errors: int
+    seconds: float
+    cpu_seconds: float
+    max_rss_mb: float
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows / self.seconds
+
+    @property
+    def requests_per_second(self) -> float:
+        return self.requests / self.seconds
+
+
+def run_case(
+    case: Case, host: str, port: int, project: str, start: datetime, end: datetime
+) -> Tuple[int, int, float, float, float]:
+    """
+    Run the predictions of a case, returning the number of rows predicted, the number of
+    errors, the elapsed seconds, the CPU seconds and the peak RSS in megabytes of the process.
+    """
+    client = Client(
+        project=project,
+        host=host,
+        port=port,
+        scheme="http",
+        data_provider=SyntheticDataProvider(),
+        batch_size=case.batch_size,
+        parallelism=case.parallelism,
+        use_parquet=case.format == "parquet",
+        use_arrow=case.format == "arrow",
+        n_retries=0,
+    )
+    # Fetch the metadata first, to only time the predictions
+    client.get_machine_names()
+    usage_before = resource.getrusage(resource.RUSAGE_SELF)
+    started = time.perf_counter()
+    results = client.predict(start=start, end=end)
+    seconds = time.perf_counter() - started
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+
+    rows = sum(len(predictions) for _, predictions, _ in results)
+    errors = sum(len(error_messages) for _, _, error_messages in results)
+    cpu_seconds = usage.ru_utime + usage.ru_stime - usage_before.ru_utime - usage_before.ru_stime
+    # ru_maxrss is in kilobytes on Linux
+    return rows, errors, seconds, cpu_seconds, usage.ru_maxrss / 1024
+
+
+def run_benchmarks(
+    cases: List[Case], n_machines: int, days: float, latency: float = 0.0, start: Optional[datetime] = None
+) -> List[Result]:
+    """
+    Run every case in a fresh process, against a stand-in server running in this one.
+    """
+    start = start or datetime(2020, 1, 1, tzinfo=timezone.utc)
+    end = start + timedelta(days=days)
+    context = multiprocessing.get_context("spawn")
+    results = []
+    for case in cases:
+        machines = {f"machine-{i}": [f"tag-{j}" for j in range(case.n_tags)] for i in range(n_machines)}
+        with StandInServer(machines=machines, latency=latency) as server:
+            with context.Pool(1) as pool:
+                rows, errors, seconds, cpu_seconds, max_rss_mb = pool.apply(
+                    run_case, (case, server.host, server.port, server.project, start, end)
+                )
+            results.append(Result(case, rows, server.n_predictions, errors, seconds, cpu_seconds, max_rss_mb))
+    return results
+
+
+@click.command("benchmark")
+@click.option("--batch-size", type=int, multiple=True, default=(10000,), help="Batch sizes to run")
+@click.option("--parallelism", type=int, multiple=True, default=(10,), help="Parallelism to run")
+@click.option("--format", "formats", type=click.Choice(FORMATS), multiple=True, default=FORMATS, help="Formats to run")
+@click.option("--tags", type=int, multiple=True, default=(10,), help="Number of tags of every machine")
+@click.option("--machines", type=int, default=4, help="Number of machines of the project")
+@click.option("--days", type=float, default=30, help="Number of days to predict, at a 10 minutes resolution")
+@click.option("--latency", type=float, default=0.0, help="Seconds the server waits before answering a prediction")
+@click.option("--output", type=click.Path(), help="Also write the results in this file, one JSON object per line")
+def main(batch_size, parallelism, formats, tags, machines, days, latency, output):
+    """Run the benchmarks and print their results."""
+    cases = [Case(*values) for values in itertools.product(batch_size, parallelism, formats, tags)]
+    header = (
+        f"{'batch_size':>10} {'parallelism':>11} {'format':>7} {'tags':>5} "
+        f"{'rows/s':>10} {'requests/s':>10} {'errors':>6} {'cpu_s':>7} {'max_rss_mb':>10}"
+    )
+    click.echo(header)
+    results = []
+    for case in cases:
+        (result,) = run_benchmarks([case], n_machines=machines, days=days, latency=latency)
+        results.append(result)
+        click.echo(
+            f"{case.batch_size:>10} {case.parallelism:>11} {case.format:>7} {case.n_tags:>5} "
+            f"{result.rows_per_second:>10.0f} {result.requests_per_second:>10.1f} {result.errors:>6} "
+            f"{result.cpu_seconds:>7.2f} {result.max_rss_mb:>10.1f}"
+        )
+    if output:
+        with open(output, "w") as f:
+            for result in results:
+                record = {
+                    **result.case._asdict(),
+                    **result._asdict(),
+                    "rows_per_second": result.rows_per_second,
+                    "requests_per_second": result.requests_per_second,
+                }
+                record.pop("case")
+                f.write(json.dumps(record) + "\n")
+
+
+if __name__ == "__main__":
+    main()
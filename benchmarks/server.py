@@ -0,0 +1,235 @@
+"""
+Stand-in for the routes of a Gordo server used by the client, serving synthetic machines.
+
+Predictions are computed from the posted data with a few numpy operations, so the time
+spent by the server is mostly (de)serialization, plus the configured latency.
+"""
+
+import re
+import threading
+import time
+from email.message import EmailMessage
+from email.parser import BytesParser
+from email.policy import HTTP
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple, cast
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+import pandas as pd
+
+from gordo_client.dataframe import (
+    ARROW_STREAM_CONTENT_TYPE,
+    dataframe_from_arrow_bytes,
+    dataframe_from_dict,
+    dataframe_from_parquet_bytes,
+    dataframe_into_arrow_bytes,
+    dataframe_into_parquet_bytes,
+    dataframe_to_dict,
+    is_arrow_stream,
+)
+from gordo_client.io import _json_dumps, _json_loads
+
+REVISION = "1600000000000"
+
+
+def machine_config(name: str, project: str, tags: List[str], resolution: str = "10T") -> dict:
+    """
+    Metadata of a machine whose model takes and predicts ``tags``.
+    """
+    return {
+        "name": name,
+        "project_name": project,
+        "dataset": {
+            "type": "TimeSeriesDataset",
+            "tag_list": tags,
+            "target_tag_list": tags,
+            "data_provider": {"type": "benchmarks.provider.SyntheticDataProvider", "resolution": resolution},
+            "resolution": resolution,
+            "row_filter": "",
+            "known_filter_periods": [],
+            "aggregation_methods": "mean",
+            "row_filter_buffer_size": 0,
+            "asset": None,
+            "n_samples_threshold": 0,
+            "interpolation_method": "linear_interpolation",
+            "interpolation_limit": "8H",
+            "filter_periods": {},
+            "train_start_date": "2020-01-01T00:00:00+00:00",
+            "train_end_date": "2020-02-01T00:00:00+00:00",
+        },
+        "model": {"sklearn.decomposition.PCA": {"svd_solver": "auto"}},
+        "metadata": {
+            "user_defined": {},
+            "build_metadata": {
+                "model": {
+                    "model_offset": 0,
+                    "model_creation_date": None,
+                    "model_builder_version": "1.1.0",
+                    "cross_validation": {"scores": {}, "cv_duration_sec": None, "splits": {}},
+                    "model_training_duration_sec": None,
+                    "model_meta": {},
+                },
+                "dataset": {
+                    "query_duration_sec": None,
+                    "dataset_meta": {
+                        "tag_loading_metadata": {"tags": {tag: {"name": tag, "asset": "benchmark"} for tag in tags}}
+                    },
+                },
+            },
+        },
+        "runtime": {"reporters": []},
+        "evaluation": {"cv_mode": "full_build"},
+    }
+
+
+def anomaly_predictions(X: pd.DataFrame) -> pd.DataFrame:
+    """
+    Fake response of the ``/anomaly/prediction`` route, with the same columns as a Gordo anomaly model.
+    """
+    values = X.to_numpy(dtype=float)
+    scores = np.abs(values - values.mean(axis=0))
+    columns = pd.MultiIndex.from_tuples(
+        [(group, tag) for group in ("model-input", "model-output", "tag-anomaly-scaled") for tag in X.columns]
+        + [("total-anomaly-scaled", "")]
+    )
+    data = np.hstack([values, values, scores, scores.sum(axis=1, keepdims=True)])
+    return pd.DataFrame(data, index=X.index, columns=columns)
+
+
+class StandInServer:
+    """
+    Serve the machines of a project on localhost, in a background thread.
+
+    .. code-block:: python
+
+        with StandInServer(machines={"machine-1": ["tag-1", "tag-2"]}) as server:
+            client = Client(project=server.project, host=server.host, port=server.port, scheme="http")
+    """
+
+    def __init__(self, machines: Dict[str, List[str]], project: str = "gordo-bench", latency: float = 0.0):
+        """
+        Parameters
+        ----------
+        machines
+            Tags of every machine, by machine name.
+        project
+            Name of the project.
+        latency
+            Seconds every prediction request waits before being answered.
+        """
+        self.project = project
+        self.machines = machines
+        self.latency = latency
+        self.host = "127.0.0.1"
+        self.port = 0
+        self.n_predictions = 0
+        self._lock = threading.Lock()
+        self._httpd: Optional[ThreadingHTTPServer] = None
+        self._thread: Optional[threading.Thread] = None
+
+    def __enter__(self) -> "StandInServer":
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def start(self):
+        self._httpd = ThreadingHTTPServer((self.host, 0), _Handler)
+        self._httpd.daemon_threads = True
+        self._httpd.stand_in = self  # type: ignore
+        self.port = self._httpd.server_address[1]
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="stand-in-server", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._httpd is not None:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+            self._httpd = None
+
+    def route(self, method: str, path: str, query: dict, content_type: str, body: bytes) -> Tuple[int, str, bytes]:
+        """
+        Answer a request, returning the status code, content type and body of the response.
+        """
+        match = re.fullmatch(rf"/gordo/v0/{re.escape(self.project)}/(?P<rest>.+)", path)
+        rest = match.group("rest") if match else ""
+        if method == "GET" and rest == "revisions":
+            return _json({"available-revisions": [REVISION], "latest": REVISION, "revision": REVISION})
+        if method == "GET" and rest == "models":
+            return _json({"models": list(self.machines), "revision": REVISION})
+        name, _, route = rest.partition("/")
+        if name not in self.machines:
+            return 404, "text/plain", b"Not found"
+        if method == "GET" and route == "metadata":
+            metadata = machine_config(name, self.project, self.machines[name])
+            return _json({"metadata": metadata, "revision": REVISION, "gordo-server-version": "stand-in"})
+        if method == "POST" and route in ("anomaly/prediction", "prediction"):
+            return self._predict(query.get("format", ["json"])[0], content_type, body)
+        return 404, "text/plain", b"Not found"
+
+    def _predict(self, response_format: str, content_type: str, body: bytes) -> Tuple[int, str, bytes]:
+        if self.latency:
+            time.sleep(self.latency)
+        if content_type.startswith("multipart/form-data"):
+            X = _read_dataframe(_form_files(content_type, body)["X"])
+        else:
+            X = dataframe_from_dict(_json_loads(body)["X"])
+        with self._lock:
+            self.n_predictions += 1
+
+        predictions = anomaly_predictions(X)
+        if response_format == "arrow":
+            return 200, ARROW_STREAM_CONTENT_TYPE, dataframe_into_arrow_bytes(predictions)
+        if response_format == "parquet":
+            return 200, "application/octet-stream", dataframe_into_parquet_bytes(predictions)
+        return _json({"data": dataframe_to_dict(predictions)})
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        self._handle()
+
+    def do_POST(self):
+        self._handle()
+
+    def _handle(self):
+        url = urlparse(self.path)
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        status, content_type, content = self.server.stand_in.route(  # type: ignore
+            self.command, url.path, parse_qs(url.query), self.headers.get("Content-Type", ""), body
+        )
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def _json(obj) -> Tuple[int, str, bytes]:
+    return 200, "application/json", _json_dumps(obj)
+
+
+def _form_files(content_type: str, body: bytes) -> Dict[str, bytes]:
+    # Parsed with an email.policy.HTTP, so the message is an EmailMessage
+    message = cast(
+        EmailMessage,
+        BytesParser(policy=HTTP).parsebytes(b"Content-Type: " + content_type.encode() + b"\r\n\r\n" + body),
+    )
+    # The parts aren't multipart themselves, so their decoded payloads are bytes
+    return {
+        str(part.get_param("name", header="content-disposition")): cast(bytes, part.get_payload(decode=True))
+        for part in message.iter_parts()
+    }
+
+
+def _read_dataframe(content: bytes) -> pd.DataFrame:
+    if is_arrow_stream(content):
+        return dataframe_from_arrow_bytes(content)
+    return dataframe_from_parquet_bytes(content)
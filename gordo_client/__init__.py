@@ -5,6 +5,12 @@ from pkg_resources import DistributionNotFound, get_distribution
 from gordo_client.client import Client
 from gordo_client.utils import influx_client_from_uri
 
+try:
+    from gordo_client.async_client import AsyncClient
+except ImportError:
+    # aiohttp is an optional dependency, installed with the "async" extra
+    pass
+
 try:
     __version__ = get_distribution("gordo_client").version
 except DistributionNotFound:
@@ -0,0 +1,799 @@
+"""
+Asyncio client for a deployed Gordo project.
+
+Requires the optional ``aiohttp`` dependency, installed with ``pip install gordo-client[async]``.
+"""
+
+import asyncio
+import copy
+import functools
+import logging
+import os
+import pickle
+import tempfile
+from datetime import datetime
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Set, Tuple, Union
+
+import aiohttp
+import pandas as pd
+from gordo_core.data_providers.base import GordoBaseDataProvider
+from sklearn.base import BaseEstimator
+
+from gordo_client.cache import CacheStats, DiskCache, SingleFlightCache
+from gordo_client.compression import check_encoding, compressed_body, multipart_body
+from gordo_client.client import (
+    MODEL_CHUNK_SIZE,
+    Client,
+    _as_dataframe,
+    _dataset_for_machine,
+    _fallback_features,
+    _is_anomaly_model,
+    _merge_batch_results,
+    _prediction_batches,
+)
+from gordo_client.dataframe import dataframe_into_arrow_bytes, dataframe_into_parquet_bytes, dataframe_to_dict
+from gordo_client.io import (
+    BadGordoRequest,
+    BadGordoResponse,
+    HttpUnprocessableEntity,
+    NotFound,
+    TooManyRequests,
+    _is_json_response,
+    _json_dumps,
+    _json_loads,
+    _is_model_response,
+    _raise_for_status,
+)
+from gordo_client.retry import CircuitBreaker, RetryBudget, backoff_delay
+from gordo_client.schemas import Machine, Metadata
+from gordo_client.utils import BatchPredictionResult, PredictionResult
+
+logger = logging.getLogger(__name__)
+
+# Body of a prediction request, either JSON, files to post as a form, or a body with its headers
+_Payload = Union[bytes, Dict[str, Any], Tuple[bytes, Dict[str, str]]]
+
+
+async def _handle_async_response(
+    resp: aiohttp.ClientResponse, resource_name: Optional[str] = None
+) -> Union[dict, bytes]:
+    """
+    Asyncio counterpart of :func:`gordo_client.io._handle_response`.
+
+    Parameters
+    ----------
+    resp
+        The response to inspect for a result
+    resource_name
+        An optional name to add to error messages. Should describe the resource we
+        attempted to GET
+
+    Returns
+    -------
+     Union[dict, bytes]
+    """
+    content = await resp.read()
+    if 200 <= resp.status <= 299:
+        if _is_model_response(resp):
+            return content
+        elif _is_json_response(resp):
+            return _json_loads(content)
+        resource_msg = f" while fetching resource: {resource_name}" if resource_name else ""
+        raise BadGordoResponse(
+            f"Bad gordo response found{resource_msg}.", content, resp.status, resp.headers.get("content-type")
+        )
+    _raise_for_status(resp.status, content, resource_name=resource_name, retry_after=resp.headers.get("Retry-After"))
+
+
+def _forward_predictions(prediction_forwarder: Callable, predictions: Any, machine: Machine, metadata: dict):
+    """
+    Forward ``predictions`` as a dataframe, run in the executor as the conversion of an Arrow table copies it.
+    """
+    prediction_forwarder(predictions=_as_dataframe(predictions), machine=machine, metadata=metadata)
+
+
+class AsyncClient:
+    """
+    Asyncio counterpart of :class:`gordo_client.client.Client`
+
+    All requests are made on the running event loop, so the number of prediction
+    requests in flight is bounded by ``parallelism`` only, and not by a pool of threads.
+    The data provider and the prediction forwarder are synchronous and are run in
+    the default executor of the loop.
+
+    .. code-block:: python
+
+        async with AsyncClient(project="my-project", data_provider=data_provider) as client:
+            predictions = await client.predict(start, end)
+    """
+
+    def __init__(
+        self,
+        project: str,
+        host: str = "localhost",
+        port: int = 443,
+        scheme: str = "https",
+        metadata: Optional[dict] = None,
+        data_provider: Optional[GordoBaseDataProvider] = None,
+        prediction_forwarder: Optional[Callable[[pd.DataFrame, Machine, dict, pd.DataFrame], None]] = None,
+        batch_size: int = 100000,
+        parallelism: int = 10,
+        forward_resampled_sensors: bool = False,
+        n_retries: int = 5,
+        use_parquet: bool = False,
+        session: Optional[aiohttp.ClientSession] = None,
+        all_columns: bool = False,
+        use_arrow: bool = False,
+        result_format: str = "pandas",
+        revisions_cache_ttl: float = 5,
+        machines_cache_ttl: float = 30,
+        metadata_cache_size: int = 1024,
+        metadata_cache_ttl: float = 600,
+        cache_dir: Optional[str] = None,
+        request_compression: Optional[str] = None,
+        compression_min_size: int = 1024,
+        retry_budget_ratio: float = 0.2,
+        circuit_breaker_threshold: int = 5,
+        circuit_breaker_reset: float = 30,
+        circuit_breaker_max_wait: float = 300,
+        infer_prediction_path: bool = False,
+    ):
+        """
+        Takes the same parameters as :class:`gordo_client.client.Client`, with the following differences.
+
+        Parameters
+        ----------
+        parallelism
+            The maximum number of prediction requests in flight at a given time, shared
+            by all the machines. Also the maximum number of machines whose data is fetched
+            and held in memory at a given time.
+        session
+            The ``aiohttp.ClientSession`` to use for making requests. If not set, the client
+            creates its own session on first use and closes it in :meth:`close`.
+        """
+        self.base_url = f"{scheme}://{host}:{port}"
+        self.server_endpoint = f"{self.base_url}/gordo/v0/{project}"
+        self.metadata = metadata if metadata is not None else dict()
+        self.prediction_forwarder = prediction_forwarder
+        self.data_provider = data_provider
+        self.use_parquet = use_parquet
+        self.project_name = project
+
+        # Default, failing back to /prediction on http code 422
+        self.prediction_path = "/anomaly/prediction"
+        self.infer_prediction_path = infer_prediction_path
+        # The prediction path each machine supports, by machine name and revision
+        self._prediction_paths: Dict[Tuple[str, str], str] = {}
+        # The optional features of the requests the server turned out not to support
+        self._rejected_features: Set[str] = set()
+        self.batch_size = batch_size
+        self.parallelism = parallelism
+        self.forward_resampled_sensors = forward_resampled_sensors
+        self.n_retries = n_retries
+        self.use_arrow = use_arrow
+        self.format = "arrow" if use_arrow else "parquet" if use_parquet else "json"
+        if result_format not in ("pandas", "arrow"):
+            raise ValueError(f"result_format must be either 'pandas' or 'arrow', got '{result_format}'")
+        self.result_format = result_format
+        self.all_columns = all_columns
+        check_encoding(request_compression)
+        self.request_compression = request_compression
+        self.compression_min_size = compression_min_size
+
+        self._session = session
+        self._owns_session = session is None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._machine_semaphore: Optional[asyncio.Semaphore] = None
+        self.retry_budget = RetryBudget(ratio=retry_budget_ratio)
+        self.circuit_breaker = CircuitBreaker(
+            failure_threshold=circuit_breaker_threshold, reset_timeout=circuit_breaker_reset
+        )
+        self.circuit_breaker_max_wait = circuit_breaker_max_wait
+
+        self._revisions_cache = SingleFlightCache(maxsize=1, ttl=revisions_cache_ttl)
+        self._machines_cache = SingleFlightCache(maxsize=64, ttl=machines_cache_ttl)
+        self._metadata_cache = SingleFlightCache(maxsize=metadata_cache_size, ttl=metadata_cache_ttl)
+        self.disk_cache = DiskCache(cache_dir, project=project) if cache_dir is not None else None
+
+    async def __aenter__(self) -> "AsyncClient":
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def close(self):
+        """
+        Close the http session, if it was created by the client.
+        """
+        if self._owns_session and self._session is not None:
+            await self._session.close()
+            self._session = None
+        self._semaphore = None
+        self._machine_semaphore = None
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        if self._session is None:
+            self._session = aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=self.parallelism))
+        return self._session
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        # Created lazily, so it belongs to the running event loop
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.parallelism)
+        return self._semaphore
+
+    def _get_machine_semaphore(self) -> asyncio.Semaphore:
+        # Bounds the machines being predicted, each holding its data until all its batches were sent
+        if self._machine_semaphore is None:
+            self._machine_semaphore = asyncio.Semaphore(self.parallelism)
+        return self._machine_semaphore
+
+    async def _get(self, url: str, resource_name: str, params: Optional[dict] = None) -> Union[dict, bytes]:
+        async with self._get_session().get(url, params=params) as resp:
+            return await _handle_async_response(resp, resource_name=resource_name)
+
+    def cache_stats(self) -> Dict[str, CacheStats]:
+        """
+        Statistics of the caches of the server responses, by name: 'revisions', 'machines' and 'metadata'.
+        """
+        return {
+            "revisions": self._revisions_cache.stats(),
+            "machines": self._machines_cache.stats(),
+            "metadata": self._metadata_cache.stats(),
+        }
+
+    async def get_revisions(self) -> dict:
+        """
+        Gets the available revisions served by the server.
+
+        Returns
+        ------
+            Dictionary with two keys, ``available-revisions`` and ``latest``. The first is
+            a list of all available revisions, and ``latest`` is the latest and default
+            revision.
+        """
+        return await self._revisions_cache.aget("revisions", self._fetch_revisions)
+
+    async def _fetch_revisions(self) -> dict:
+        cached = self.disk_cache.get(("revisions",)) if self.disk_cache is not None else None
+        headers = {"If-None-Match": cached.etag} if cached is not None and cached.etag else None
+        async with self._get_session().get(
+            f"{self.base_url}/gordo/v0/{self.project_name}/revisions", headers=headers
+        ) as resp:
+            if cached is not None and resp.status == 304:
+                return cached.content
+            revisions = await _handle_async_response(resp, resource_name="List of available revisions from server")
+            etag = resp.headers.get("ETag")
+        if self.disk_cache is not None and isinstance(revisions, dict):
+            self.disk_cache.set(("revisions",), revisions, etag=etag)
+            self.disk_cache.prune(revisions.get("available-revisions", []))
+        return revisions  # type: ignore
+
+    async def _cached_on_disk(self, key: Tuple[str, ...], revision: str) -> Optional[Any]:
+        """
+        Content cached on disk for ``key`` of ``revision``, if the revision is still available.
+        """
+        if self.disk_cache is None:
+            return None
+        entry = self.disk_cache.get(key)
+        if entry is None or revision not in (await self.get_revisions()).get("available-revisions", []):
+            return None
+        return entry.content
+
+    async def _get_latest_revision(self) -> str:
+        return (await self.get_revisions())["latest"]
+
+    async def _get_available_machines(self, revision: str) -> dict:
+        async def fetch():
+            cached = await self._cached_on_disk((revision, "models"), revision)
+            if cached is not None:
+                return cached
+            model_response = await self._get(
+                f"{self.base_url}/gordo/v0/{self.project_name}/models",
+                resource_name=f"Model name listing for revision {revision}",
+                params={"revision": revision},
+            )
+            if not isinstance(model_response, dict) or "models" not in model_response:
+                raise ValueError(f"Invalid response from server, key 'model' not found in: {model_response!r}")
+            model_response["revision"] = model_response.get("revision", revision)
+            if self.disk_cache is not None:
+                self.disk_cache.set((revision, "models"), model_response)
+            return model_response
+
+        return await self._machines_cache.aget(revision, fetch)
+
+    async def get_available_machines(self, revision: Optional[str] = None) -> dict:
+        """Returns a dict representing the ``/models`` endpoint of the project for the given revision.
+
+        Contains at least a key ``models`` which contains the name of the models the
+        server can serve for that revision, and a key ``revision`` containing the
+        revision."""
+        return await self._get_available_machines(revision=revision or await self._get_latest_revision())
+
+    async def get_machine_names(self, revision: Optional[str] = None) -> List[str]:
+        """Returns the list of machine names served by a given revision, or latest
+        revision if no revision is passed"""
+        model_response = await self.get_available_machines(revision=revision)
+        return model_response.get("models")  # type: ignore
+
+    async def _get_machines(
+        self, revision: Optional[str] = None, machine_names: Optional[List[str]] = None
+    ) -> List[Machine]:
+        """
+        Returns a list of :class:`gordo_client.schemas.Machine` elements served by the server for
+        the provided machine names, fetching their metadata concurrently.
+        """
+        rev = revision or await self._get_latest_revision()
+        _machine_names: List[str] = machine_names or await self.get_machine_names(revision=rev)
+        return list(
+            await asyncio.gather(*(self.machine_from_server(name=name, revision=rev) for name in _machine_names))
+        )
+
+    async def machine_from_server(self, name: str, revision: str) -> Machine:
+        async def fetch():
+            cached = await self._cached_on_disk((revision, "metadata", name), revision)
+            if cached is not None:
+                return Machine(**cached)
+            metadata = await self._get(
+                f"{self.base_url}/gordo/v0/{self.project_name}/{name}/metadata",
+                resource_name=f"Machine metadata for {name}",
+                params={"revision": revision},
+            )
+            if isinstance(metadata, dict) and metadata.get("metadata", None):
+                machine = Machine(**metadata.get("metadata", None))
+                if self.disk_cache is not None:
+                    self.disk_cache.set((revision, "metadata", name), metadata["metadata"])
+                return machine
+            else:
+                raise NotFound(f"Machine {name} not found")
+
+        return await self._metadata_cache.aget((name, revision), fetch)
+
+    async def download_model(
+        self, revision: Optional[str] = None, targets: Optional[List[str]] = None
+    ) -> Dict[str, BaseEstimator]:
+        """
+        Download the actual model(s) from the ML server ``/download-model``, at most
+        ``parallelism`` at a time.
+
+        The models are streamed to temporary files, which they are loaded from.
+
+        Returns
+        -------
+            Mapping of target name to the model
+        """
+        loop = asyncio.get_running_loop()
+        rev = revision or await self._get_latest_revision()
+        machine_names = targets or await self.get_machine_names(revision=rev)
+
+        async def download(machine_name: str, path: str) -> Tuple[str, BaseEstimator]:
+            async with self._get_semaphore(), self._get_session().get(
+                f"{self.base_url}/gordo/v0/{self.project_name}/{machine_name}/download-model",
+                params={"revision": rev},
+            ) as resp:
+                if not 200 <= resp.status <= 299 or not _is_model_response(resp):
+                    content = await _handle_async_response(
+                        resp, resource_name=f"Model download for model {machine_name}"
+                    )
+                    raise ValueError(
+                        f"Got unexpected return type: {type(content)} when attempting to"
+                        f" download the model {machine_name}."
+                    )
+                with open(path, "wb") as f:
+                    async for chunk in resp.content.iter_chunked(MODEL_CHUNK_SIZE):
+                        await loop.run_in_executor(None, f.write, chunk)
+            with open(path, "rb") as f:
+                return machine_name, await loop.run_in_executor(None, pickle.load, f)
+
+        # The models are only kept on disk until they are loaded
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            return dict(
+                await asyncio.gather(
+                    *(
+                        download(machine_name, os.path.join(tmp_dir, f"{i}.pkl"))
+                        for i, machine_name in enumerate(machine_names)
+                    )
+                )
+            )
+
+    async def get_metadata(
+        self, revision: Optional[str] = None, targets: Optional[List[str]] = None
+    ) -> Dict[str, Metadata]:
+        """
+        Get the machine metadata for provided machines, or all if no machine names are provided.
+
+        Parameters
+        ----------
+        revision
+            Revision to fetch machines for. If None then the latest revision is fetched
+            from the server.
+        targets
+            List of names of machines to fetch metadata for. If None then all machines
+            for the given revision is fetched.
+
+        Returns
+        -------
+            Mapping of target names to their metadata
+        """
+        machines = await self._get_machines(revision=revision, machine_names=targets)
+        return {ep.name: copy.copy(ep.metadata) for ep in machines}
+
+    async def predict(
+        self, start: datetime, end: datetime, targets: Optional[List[str]] = None, revision: Optional[str] = None
+    ) -> List[Tuple[str, pd.DataFrame, List[str]]]:
+        """
+        Start the prediction process, see :meth:`gordo_client.client.Client.predict`.
+
+        Parameters
+        ----------
+        start
+        end
+        targets
+            Optionally only target certain machines, referring to them by name.
+        revision
+            Revision of the model to run predictions again, defaulting to latest.
+
+        Raises
+        -----
+        ResourceGone
+            If the sever returns a 410, most likely because the revision is too old
+
+        Returns
+        -------
+            0th element is the target name
+            1st element is the dataframe of the predictions; complete with a DateTime index.
+            2nd element is a list of error messages (if any) for running the predictions
+        """
+        rev = revision or await self._get_latest_revision()
+        machines = await self._get_machines(revision=rev, machine_names=targets)
+        batches: List[BatchPredictionResult] = []
+
+        async def collect(batch: BatchPredictionResult):
+            batches.append(batch)
+
+        await asyncio.gather(
+            *(
+                self._predict_machine(machine, start=start, end=end, revision=rev, on_batch=collect)
+                for machine in machines
+            )
+        )
+        jobs = _merge_batch_results(machines, batches, result_format=self.result_format)
+        return [(j.name, j.predictions, j.error_messages) for j in jobs]
+
+    async def predict_iter(
+        self, start: datetime, end: datetime, targets: Optional[List[str]] = None, revision: Optional[str] = None
+    ) -> AsyncIterator[BatchPredictionResult]:
+        """
+        Run the prediction process, yielding the result of every batch as soon as it completes,
+        see :meth:`gordo_client.client.Client.predict_iter`.
+
+        .. code-block:: python
+
+            async for machine, batch_start, batch_end, predictions, error_messages in client.predict_iter(start, end):
+                ...
+
+        Requests are paused while ``parallelism`` batch results are waiting to be consumed.
+        """
+        rev = revision or await self._get_latest_revision()
+        machines = await self._get_machines(revision=rev, machine_names=targets)
+        results: "asyncio.Queue[BatchPredictionResult]" = asyncio.Queue(maxsize=self.parallelism)
+
+        all_done = asyncio.ensure_future(
+            asyncio.gather(
+                *(
+                    self._predict_machine(machine, start=start, end=end, revision=rev, on_batch=results.put)
+                    for machine in machines
+                )
+            )
+        )
+        try:
+            while True:
+                next_result = asyncio.ensure_future(results.get())
+                await asyncio.wait({next_result, all_done}, return_when=asyncio.FIRST_COMPLETED)
+                if next_result.done():
+                    yield next_result.result()
+                    continue
+                next_result.cancel()
+                # Every result is in the queue once all the machines are done, raises any of their errors
+                all_done.result()
+                while not results.empty():
+                    yield results.get_nowait()
+                return
+        finally:
+            all_done.cancel()
+
+    async def predict_single_machine(
+        self, machine: Machine, start: datetime, end: datetime, revision: str
+    ) -> PredictionResult:
+        """
+        Get predictions based on the ``/prediction`` POST machine of Gordo ML Servers.
+
+        Parameters
+        ----------
+        machine
+            Named tuple which has 'machine' specifying the full url to the base ml server
+        start
+        end
+        revision
+            Revision of the model to use
+
+        Returns
+        -------
+            Prediction response from ``/prediction`` GET
+        """
+        batches: List[BatchPredictionResult] = []
+
+        async def collect(batch: BatchPredictionResult):
+            batches.append(batch)
+
+        await self._predict_machine(machine, start=start, end=end, revision=revision, on_batch=collect)
+        return _merge_batch_results([machine], batches, result_format=self.result_format)[0]
+
+    async def _predict_machine(
+        self,
+        machine: Machine,
+        start: datetime,
+        end: datetime,
+        revision: str,
+        on_batch: Callable[[BatchPredictionResult], Awaitable[None]],
+    ):
+        """
+        Fetch the data of the machine and send all of its batches, passing each batch result
+        to ``on_batch`` as it completes.
+
+        At most ``parallelism`` machines are predicted at a given time, the others waiting
+        before fetching their data.
+        """
+        loop = asyncio.get_running_loop()
+
+        async with self._get_machine_semaphore():
+            # Fetch all of the raw data
+            X, y = await loop.run_in_executor(None, self._raw_data, machine, start, end)
+
+            # Forward sensor data
+            if self.prediction_forwarder is not None and self.forward_resampled_sensors:
+                await loop.run_in_executor(
+                    None, functools.partial(self.prediction_forwarder, resampled_sensor_data=X)  # type: ignore
+                )
+
+            async def send(chunk: slice, batch_start: datetime, batch_end: datetime):
+                result = await self._send_prediction_request(
+                    X, y, chunk=chunk, machine=machine, start=batch_start, end=batch_end, revision=revision
+                )
+                await on_batch(
+                    BatchPredictionResult(
+                        machine=machine,
+                        start=batch_start,
+                        end=batch_end,
+                        predictions=result.predictions,
+                        error_messages=result.error_messages,
+                    )
+                )
+
+            # Start making batch predictions, the semaphore bounds how many are in flight. Each sender
+            # takes the next batch once it is done with the previous one, so the batches aren't all
+            # started up front
+            batches = _prediction_batches(X, self.batch_size)
+
+            async def send_batches():
+                for batch in batches:
+                    await send(*batch)
+
+            await asyncio.gather(*(send_batches() for _ in range(self.parallelism)))
+
+    async def _send_prediction_request(
+        self,
+        X: pd.DataFrame,
+        y: Optional[pd.DataFrame],
+        chunk: slice,
+        machine: Machine,
+        start: datetime,
+        end: datetime,
+        revision: str,
+    ) -> PredictionResult:
+        """
+        Post a slice of data to the machine.
+
+        The slot of the request is given up while waiting for a retry, or while the circuit breaker
+        of the machine is open, so a failing machine doesn't hold up the requests of the others.
+
+        Notes
+        -----
+        ``PredictionResult.predictions`` may be None if the prediction process fails
+
+        Raises
+        -----
+        ResourceGone
+            If the sever returns a 410, most likely because the revision is too old
+        """
+        loop = asyncio.get_running_loop()
+        request_format = "parquet" if "arrow" in self._rejected_features else self.format
+        params = {"format": request_format, "revision": revision}
+        if self.all_columns:
+            params["all_columns"] = "true"
+
+        compression = None if "compression" in self._rejected_features else self.request_compression
+        payload: Optional[_Payload] = None
+        # The features given up to send the request once more after the server rejected it
+        fallback: List[str] = []
+        error: Exception
+        current_attempt = 0
+        # Time of the event loop after which the request fails if the circuit breaker is still open
+        hold_deadline: Optional[float] = None
+        while True:
+            wait_time = self.circuit_breaker.wait_time(machine.name)
+            if wait_time > 0:
+                now = loop.time()
+                if hold_deadline is None:
+                    hold_deadline = now + self.circuit_breaker_max_wait
+                if now >= hold_deadline:
+                    error = Exception(f"Circuit breaker open for {self.circuit_breaker_max_wait:.0f} seconds")
+                    break
+                logger.debug(f"Circuit breaker open for target: '{machine.name}', retrying in {wait_time:.1f} seconds")
+                await asyncio.sleep(min(wait_time, hold_deadline - now))
+                continue
+            current_attempt += 1
+            async with self._get_semaphore():
+                try:
+                    if payload is None:
+                        payload = await loop.run_in_executor(
+                            None,
+                            self._encode_payload,
+                            request_format,
+                            compression,
+                            X.iloc[chunk],
+                            y.iloc[chunk] if y is not None else None,
+                        )
+                    try:
+                        resp = await self._post_prediction(
+                            machine, self._prediction_path(machine, revision), params, payload
+                        )
+                    except HttpUnprocessableEntity:
+                        self._prediction_paths[machine.name, revision] = "/prediction"
+                        resp = await self._post_prediction(machine, "/prediction", params, payload)
+                # If it was an IO or TimeoutError, or the server is overloaded, we can retry
+                except (IOError, asyncio.TimeoutError, aiohttp.ClientError, TooManyRequests) as exc:
+                    error = exc
+                # No point in retrying a BadGordoRequest
+                except (BadGordoRequest, NotFound) as exc:
+                    # Unless the server may not support some feature of the request, then it is sent once more
+                    # without
+                    if not fallback:
+                        fallback = _fallback_features(
+                            exc, request_format, payload[1] if isinstance(payload, tuple) else {}
+                        )
+                        if fallback:
+                            logger.warning(
+                                f"Request rejected by the server, sending it without {' and '.join(fallback)}. "
+                                f"Error: {exc}"
+                            )
+                            if "arrow" in fallback:
+                                request_format = params["format"] = "parquet"
+                            compression = None
+                            payload = None
+                            continue
+                    msg = (
+                        f"Failed with bad request or not found for dates {start} -> {end} "
+                        f"for target: '{machine.name}' Error: {exc}"
+                    )
+                    logger.error(msg)
+                    return PredictionResult(name=machine.name, predictions=None, error_messages=[msg])
+                # Process response and return if no exception
+                else:
+                    # The request only went through without the features, so the later ones are sent without too
+                    if fallback and not self._rejected_features.issuperset(fallback):
+                        logger.warning(f"The server doesn't support {' and '.join(fallback)}, no longer using it")
+                        self._rejected_features.update(fallback)
+                    from_response = (
+                        self.table_from_response if self.result_format == "arrow" else self.dataframe_from_response
+                    )
+                    predictions = await loop.run_in_executor(None, from_response, resp)
+                    # Forward predictions to any other consumer if registered.
+                    if self.prediction_forwarder is not None:
+                        await loop.run_in_executor(
+                            None,
+                            functools.partial(
+                                _forward_predictions,
+                                self.prediction_forwarder,
+                                predictions=predictions,
+                                machine=machine,
+                                metadata=self.metadata,
+                            ),
+                        )
+                    return PredictionResult(name=machine.name, predictions=predictions, error_messages=[])
+
+            if current_attempt > self.n_retries:
+                break
+            if not self.retry_budget.try_acquire():
+                error = Exception(f"{error} (retry budget exhausted)")
+                break
+            time_to_sleep = backoff_delay(current_attempt, getattr(error, "retry_after", None))
+            logger.warning(f"Failed to get response on attempt {current_attempt} out of {self.n_retries} attempts.")
+            await asyncio.sleep(time_to_sleep)
+
+        msg = f"Failed to get predictions for dates {start} -> {end} for target: '{machine.name}' Error: {error}"
+        logger.error(msg)
+        return PredictionResult(name=machine.name, predictions=None, error_messages=[msg])
+
+    def _prediction_path(self, machine: Machine, revision: str) -> str:
+        """
+        Path of the prediction requests of the machine, either ``/anomaly/prediction`` or ``/prediction``.
+        """
+        prediction_path = self._prediction_paths.get((machine.name, revision))
+        if prediction_path is not None:
+            return prediction_path
+        if self.infer_prediction_path and machine.model:
+            return "/anomaly/prediction" if _is_anomaly_model(machine.model) else "/prediction"
+        return self.prediction_path
+
+    async def _post_prediction(
+        self, machine: Machine, prediction_path: str, params: dict, payload: _Payload
+    ) -> Union[dict, bytes]:
+        url = f"{self.base_url}/gordo/v0/{self.project_name}/{machine.name}{prediction_path}"
+        kwargs: Dict[str, Any] = dict(params=params)
+        if isinstance(payload, tuple):
+            kwargs["data"], kwargs["headers"] = payload
+        elif isinstance(payload, bytes):
+            kwargs["data"] = payload
+            kwargs["headers"] = {"Content-Type": "application/json"}
+        else:
+            # Form data can only be sent once, so it is re-created on every attempt
+            data = aiohttp.FormData()
+            for name, content in payload.items():
+                if content is not None:
+                    data.add_field(name, content, filename=name, content_type="application/octet-stream")
+            kwargs["data"] = data
+        self.retry_budget.record_request()
+        try:
+            async with self._get_session().post(url, **kwargs) as resp:
+                if resp.status == 429 or resp.status >= 500:
+                    self.circuit_breaker.record_failure(machine.name)
+                else:
+                    self.circuit_breaker.record_success(machine.name)
+                return await _handle_async_response(resp)
+        except (asyncio.TimeoutError, aiohttp.ClientConnectionError):
+            self.circuit_breaker.record_failure(machine.name)
+            raise
+
+    def _encode_payload(
+        self, request_format: str, compression: Optional[str], X: pd.DataFrame, y: Optional[pd.DataFrame]
+    ) -> _Payload:
+        """
+        :meth:`_prediction_payload`, with its body compressed with ``compression``, if any,
+        into a tuple of the body and its headers.
+        """
+        payload = self._prediction_payload(request_format, X, y)
+        if compression is None or request_format == "parquet":
+            return payload
+        if isinstance(payload, bytes):
+            body, content_type = payload, "application/json"
+        else:
+            body, content_type = multipart_body(payload)
+        return compressed_body(body, content_type, compression, self.compression_min_size)
+
+    @staticmethod
+    def _prediction_payload(
+        request_format: str, X: pd.DataFrame, y: Optional[pd.DataFrame]
+    ) -> Union[bytes, Dict[str, Any]]:
+        # We're going to serialize the data as either JSON, Parquet or Arrow
+        if request_format == "json":
+            return _json_dumps({"X": dataframe_to_dict(X), "y": dataframe_to_dict(y) if y is not None else None})
+        if request_format == "arrow":
+            return {
+                "X": dataframe_into_arrow_bytes(X),
+                "y": dataframe_into_arrow_bytes(y) if y is not None else None,
+            }
+        return {
+            "X": dataframe_into_parquet_bytes(X),
+            "y": dataframe_into_parquet_bytes(y) if y is not None else None,
+        }
+
+    def _raw_data(self, machine: Machine, start: datetime, end: datetime) -> Tuple[pd.DataFrame, pd.DataFrame]:
+        """
+        Fetch the required raw data in this time range which would satisfy this machine's ``POST /prediction``.
+        """
+        dataset = _dataset_for_machine(machine, start, end, data_provider=self.data_provider)
+        return dataset.get_client_data(Client._extract_build_metadata(machine))
+
+    dataframe_from_response = staticmethod(Client.dataframe_from_response)
+    table_from_response = staticmethod(Client.table_from_response)
@@ -0,0 +1,112 @@
+import threading
+from typing import Dict, Optional
+
+
+class AdaptiveBatchSize:
+    """
+    Tunes the number of rows sent by each prediction request of a machine.
+
+    After a successful request, the batch size of the machine moves towards the number of rows
+    which would have met the targets, assuming the payload size and the latency grow linearly with
+    the number of rows, and by at most ``max_step`` times the rows of the request. So it grows
+    while the responses stay small and fast, and shrinks when they exceed a target.
+    After a timeout, a ``413`` or a ``5xx`` response, it is divided by ``max_step`` right away.
+
+    Examples
+    --------
+    >>> batch_sizes = AdaptiveBatchSize(initial_size=1000, target_bytes=1_000_000)
+    >>> batch_sizes.get("machine-1")
+    1000
+    >>> batch_sizes.record_success("machine-1", n_rows=1000, n_bytes=250_000, seconds=0.1)
+    >>> batch_sizes.get("machine-1")
+    2000
+    >>> batch_sizes.record_success("machine-1", n_rows=2000, n_bytes=1_250_000, seconds=0.2)
+    >>> batch_sizes.get("machine-1")
+    1600
+    >>> batch_sizes.record_failure("machine-1", n_rows=1600)
+    >>> batch_sizes.get("machine-1")
+    800
+    """
+
+    def __init__(
+        self,
+        initial_size: int,
+        target_bytes: Optional[int] = None,
+        target_seconds: Optional[float] = None,
+        min_size: int = 1,
+        max_size: Optional[int] = None,
+        max_step: float = 2.0,
+    ):
+        """
+        Parameters
+        ----------
+        initial_size
+            Batch size of a machine until its first request completes.
+        target_bytes
+            Target size of the body of a prediction request, in bytes.
+        target_seconds
+            Target duration of a prediction request, in seconds.
+        min_size
+            Smallest batch size.
+        max_size
+            Largest batch size, unbounded if None.
+        max_step
+            Largest factor the batch size changes by after a single request.
+        """
+        if target_bytes is None and target_seconds is None:
+            raise ValueError("At least one of target_bytes or target_seconds must be set")
+        if target_bytes is not None and target_bytes <= 0:
+            raise ValueError("target_bytes must be greater than 0")
+        if target_seconds is not None and target_seconds <= 0:
+            raise ValueError("target_seconds must be greater than 0")
+        if min_size < 1 or (max_size is not None and max_size < min_size):
+            raise ValueError("min_size must be greater than 0, and not greater than max_size")
+        if max_step <= 1:
+            raise ValueError("max_step must be greater than 1")
+        self.initial_size = initial_size
+        self.target_bytes = target_bytes
+        self.target_seconds = target_seconds
+        self.min_size = min_size
+        self.max_size = max_size
+        self.max_step = max_step
+
+        self._lock = threading.Lock()
+        self._sizes: Dict[str, int] = {}
+
+    def get(self, name: str) -> int:
+        """
+        Number of rows to send in the next prediction request of the machine ``name``.
+        """
+        with self._lock:
+            return self._sizes.get(name, self._clip(self.initial_size))
+
+    def record_success(self, name: str, n_rows: int, n_bytes: int, seconds: float):
+        """
+        Adjust the batch size of the machine after a successful request of ``n_rows`` rows,
+        whose body was ``n_bytes`` long and which took ``seconds`` to complete.
+        """
+        ratios = []
+        if self.target_bytes is not None and n_bytes > 0:
+            ratios.append(self.target_bytes / n_bytes)
+        if self.target_seconds is not None and seconds > 0:
+            ratios.append(self.target_seconds / seconds)
+        if not ratios:
+            return
+        ratio = min(max(min(ratios), 1 / self.max_step), self.max_step)
+        with self._lock:
+            self._sizes[name] = self._clip(int(n_rows * ratio))
+
+    def record_failure(self, name: str, n_rows: int):
+        """
+        Shrink the batch size of the machine after a request of ``n_rows`` rows timed out,
+        or was rejected as too large or overloading the server.
+        """
+        with self._lock:
+            current = self._sizes.get(name, self._clip(self.initial_size))
+            self._sizes[name] = self._clip(int(min(current, n_rows) / self.max_step))
+
+    def _clip(self, size: int) -> int:
+        size = max(size, self.min_size)
+        if self.max_size is not None:
+            size = min(size, self.max_size)
+        return size
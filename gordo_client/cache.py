@@ -0,0 +1,236 @@
+import asyncio
+import logging
+import os
+import shutil
+import tempfile
+import threading
+from collections import namedtuple
+from concurrent.futures import Future
+from typing import Any, Awaitable, Callable, Dict, Hashable, Iterable, Optional, Tuple
+from urllib.parse import quote
+
+from cachetools import TTLCache
+
+from gordo_client.io import _json_dumps, _json_loads
+
+logger = logging.getLogger(__name__)
+
+# Statistics of a cache, hits=int, misses=int (loads), coalesced=int (misses which waited for
+# the load of another caller), size=int, maxsize=int
+CacheStats = namedtuple("CacheStats", "hits misses coalesced size maxsize")
+
+_MISSING = object()
+
+
+class SingleFlightCache:
+    """
+    TTL cache loading every missing key once, however many callers ask for it at the same time.
+
+    Callers missing the same key wait for the load of the first one, while the keys of other
+    callers are loaded in parallel. A failed load is not cached, and raised to all its callers.
+
+    Examples
+    --------
+    >>> cache = SingleFlightCache(maxsize=32, ttl=60)
+    >>> cache.get(("machine-1", "1604861479899"), lambda: "metadata")
+    'metadata'
+    >>> cache.get(("machine-1", "1604861479899"), lambda: "not called")
+    'metadata'
+    >>> cache.stats()
+    CacheStats(hits=1, misses=1, coalesced=0, size=1, maxsize=32)
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        """
+        Parameters
+        ----------
+        maxsize
+            The maximum number of values kept, evicting the least recently used ones.
+        ttl
+            Seconds a value is kept for.
+        """
+        self._cache: TTLCache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._lock = threading.Lock()
+        self._in_flight: Dict[Hashable, Any] = {}
+        self._hits = 0
+        self._misses = 0
+        self._coalesced = 0
+
+    def get(self, key: Hashable, load: Callable[[], Any]) -> Any:
+        """
+        Get the value of ``key``, calling ``load()`` to get it if it isn't cached.
+        """
+        with self._lock:
+            value = self._cache.get(key, _MISSING)
+            if value is not _MISSING:
+                self._hits += 1
+                return value
+            future, owner = self._claim(key, Future)
+        if not owner:
+            return future.result()
+        try:
+            value = load()
+        except BaseException as exc:
+            self._release(key)
+            future.set_exception(exc)
+            raise
+        self._release(key, value)
+        future.set_result(value)
+        return value
+
+    async def aget(self, key: Hashable, load: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Asyncio counterpart of :meth:`get`, awaiting ``load()`` to get the value.
+        """
+        with self._lock:
+            value = self._cache.get(key, _MISSING)
+            if value is not _MISSING:
+                self._hits += 1
+                return value
+            future, owner = self._claim(key, asyncio.get_running_loop().create_future)
+        if not owner:
+            try:
+                return await asyncio.shield(future)
+            except asyncio.CancelledError:
+                # The caller loading the value was cancelled, rather than this one
+                if future.cancelled():
+                    return await self.aget(key, load)
+                raise
+        try:
+            value = await load()
+        except asyncio.CancelledError:
+            self._release(key)
+            future.cancel()
+            raise
+        except BaseException as exc:
+            self._release(key)
+            future.set_exception(exc)
+            # Retrieved, so that it isn't reported as never retrieved when nobody waited
+            future.exception()
+            raise
+        self._release(key, value)
+        future.set_result(value)
+        return value
+
+    def stats(self) -> CacheStats:
+        """
+        Statistics of the cache since it was created.
+        """
+        with self._lock:
+            return CacheStats(
+                hits=self._hits,
+                misses=self._misses,
+                coalesced=self._coalesced,
+                size=len(self._cache),
+                maxsize=self._cache.maxsize,
+            )
+
+    def clear(self):
+        """
+        Drop all the cached values.
+        """
+        with self._lock:
+            self._cache.clear()
+
+    def _claim(self, key: Hashable, create_future: Callable[[], Any]) -> Tuple[Any, bool]:
+        """
+        Future of the in-flight load of ``key``, and whether the caller must load it.
+
+        Must be called holding the lock.
+        """
+        future = self._in_flight.get(key)
+        if future is not None:
+            self._coalesced += 1
+            return future, False
+        self._misses += 1
+        future = self._in_flight[key] = create_future()
+        return future, True
+
+    def _release(self, key: Hashable, value: Any = _MISSING):
+        with self._lock:
+            del self._in_flight[key]
+            if value is not _MISSING:
+                self._cache[key] = value
+
+
+# Cached server response, content=Any (the parsed JSON), etag=Optional[str]
+CacheEntry = namedtuple("CacheEntry", "content etag")
+
+
+class DiskCache:
+    """
+    Directory of the JSON responses of the server for a project, kept across runs.
+
+    Entries are keyed by a tuple of path components. Those starting with a revision are
+    stored in the directory of the revision, so they can be dropped with :meth:`prune`
+    once the revision is no longer served.
+
+    Examples
+    --------
+    >>> import tempfile
+    >>> cache = DiskCache(tempfile.mkdtemp(), project="gordo-test")
+    >>> cache.set(("1604861479899", "models"), {"models": ["machine-1"]}, etag='"abc"')
+    >>> cache.get(("1604861479899", "models"))
+    CacheEntry(content={'models': ['machine-1']}, etag='"abc"')
+    >>> cache.prune(revisions=[])
+    >>> cache.get(("1604861479899", "models")) is None
+    True
+    """
+
+    def __init__(self, directory: str, project: str):
+        """
+        Parameters
+        ----------
+        directory
+            Directory of the cache, shared by the projects.
+        project
+            Name of the project.
+        """
+        self.path = os.path.join(directory, quote(project, safe=""))
+
+    def get(self, key: Tuple[str, ...]) -> Optional[CacheEntry]:
+        """
+        Cached entry of ``key``, None if there is none or it can't be read.
+        """
+        try:
+            with open(self._file(key), "rb") as f:
+                entry = _json_loads(f.read())
+            return CacheEntry(content=entry["content"], etag=entry.get("etag"))
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, KeyError, TypeError) as exc:
+            logger.warning("Ignoring unreadable cache entry %s: %r", self._file(key), exc)
+            return None
+
+    def set(self, key: Tuple[str, ...], content: Any, etag: Optional[str] = None):
+        """
+        Cache the JSON ``content`` of ``key``, with the ETag it was served with.
+
+        The file is written next to its final path and then moved, so concurrent
+        runs never read a partial entry.
+        """
+        path = self._file(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(_json_dumps({"content": content, "etag": etag}))
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def prune(self, revisions: Iterable[str]):
+        """
+        Drop the entries of the revisions not in ``revisions``.
+        """
+        keep = {quote(revision, safe="") for revision in revisions}
+        if not os.path.isdir(self.path):
+            return
+        for name in os.listdir(self.path):
+            path = os.path.join(self.path, name)
+            if name not in keep and os.path.isdir(path):
+                shutil.rmtree(path, ignore_errors=True)
+
+    def _file(self, key: Tuple[str, ...]) -> str:
+        return os.path.join(self.path, *(quote(part, safe="") for part in key)) + ".json"
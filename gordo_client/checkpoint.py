@@ -0,0 +1,110 @@
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Iterable, Optional, Set, Tuple, Union
+
+import pandas as pd
+
+# Status of a window whose predictions were passed to the prediction forwarder
+FORWARDED = "forwarded"
+# Status of a window whose predictions were only returned to the caller, and so aren't kept
+PREDICTED = "predicted"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS windows (
+    project TEXT NOT NULL,
+    machine TEXT NOT NULL,
+    revision TEXT NOT NULL,
+    start TEXT NOT NULL,
+    end TEXT NOT NULL,
+    status TEXT NOT NULL,
+    completed_at TEXT NOT NULL,
+    PRIMARY KEY (project, machine, revision, start, end)
+)
+"""
+
+
+class CheckpointStore:
+    """
+    SQLite file of the data windows whose predictions completed, by project, machine and revision,
+    so that a prediction run which died can be resumed without predicting them again.
+
+    Examples
+    --------
+    >>> store = CheckpointStore(":memory:")
+    >>> store.record("project", "machine-1", "1604861479899", "2020-01-01", "2020-01-02", status=FORWARDED)
+    >>> store.completed("project", "machine-1", "1604861479899")
+    {('2020-01-01T00:00:00', '2020-01-02T00:00:00')}
+    >>> store.completed("project", "machine-1", "1604861479899", statuses=[PREDICTED])
+    set()
+    """
+
+    def __init__(self, path: str):
+        """
+        Parameters
+        ----------
+        path
+            Path of the SQLite file, created if it doesn't exist.
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        # Written by the thread consuming the predictions, which may not be the one creating the store
+        self._connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        with self._lock:
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute(_SCHEMA)
+
+    def record(
+        self,
+        project: str,
+        machine: str,
+        revision: str,
+        start: Union[str, datetime],
+        end: Union[str, datetime],
+        status: str,
+    ):
+        """
+        Record that the predictions of the machine for the ``[start, end]`` window completed,
+        with their ``status``, either :data:`FORWARDED` or :data:`PREDICTED`.
+        """
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO windows VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    project,
+                    machine,
+                    revision,
+                    _timestamp(start),
+                    _timestamp(end),
+                    status,
+                    pd.Timestamp.utcnow().isoformat(),
+                ),
+            )
+
+    def completed(
+        self, project: str, machine: str, revision: str, statuses: Optional[Iterable[str]] = None
+    ) -> Set[Tuple[str, str]]:
+        """
+        ``(start, end)`` of the completed windows of the machine, as ISO 8601 strings.
+
+        Parameters
+        ----------
+        statuses
+            Only the windows with one of these statuses, all of them if None.
+        """
+        query = "SELECT start, end, status FROM windows WHERE project = ? AND machine = ? AND revision = ?"
+        with self._lock:
+            rows = self._connection.execute(query, (project, machine, revision)).fetchall()
+        statuses = set(statuses) if statuses is not None else None
+        return {(start, end) for start, end, status in rows if statuses is None or status in statuses}
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+
+def _timestamp(value: Union[str, datetime]) -> str:
+    """
+    ISO 8601 string of a date, the same for a ``datetime`` and its ``pandas.Timestamp``.
+    """
+    return pd.Timestamp(value).isoformat()
@@ -3,24 +3,23 @@
 import json
 import logging
 import os
-import pickle  # noqa:S403
 import sys
 from copy import copy
 from datetime import datetime
 from pprint import pprint
-from typing import Iterable, List, Optional, Tuple, Union
+from typing import Iterable, List, Optional, Tuple
 from typing.io import IO
 
 import click
 import pandas as pd
-import simplejson
 import yaml
 from gordo_core.data_providers import providers
 from requests import Session
 
 from gordo_client import Client, __version__
 from gordo_client.cli.custom_types import DataProviderParam, IsoFormatDateTime, key_value_par
-from gordo_client.forwarders import ForwardPredictionsIntoInflux
+from gordo_client.compression import ENCODINGS
+from gordo_client.forwarders import ForwardPredictionsIntoInflux, ForwardPredictionsIntoParquet, PredictionForwarder
 
 
 @click.group("client")
@@ -31,6 +30,11 @@ from gordo_client.forwarders import ForwardPredictionsIntoInflux
 @click.option("--scheme", help="tcp/http/https", default="https")
 @click.option("--batch-size", help="How many samples to send", default=100000)
 @click.option("--parallelism", help="Maximum asynchronous jobs to run", default=10)
+@click.option(
+    "--machine-parallelism",
+    type=int,
+    help="Maximum asynchronous jobs to run for a single machine. Only limited by --parallelism if not set",
+)
 @click.option(
     "--metadata",
     type=key_value_par,
@@ -53,6 +57,31 @@ from gordo_client.forwarders import ForwardPredictionsIntoInflux
     default=False,
     help="Return all columns for prediction. Including 'smooth-..' columns",
 )
+@click.option(
+    "--cache-dir",
+    type=click.Path(file_okay=False),
+    envvar="GORDO_CLIENT_CACHE_DIR",
+    help="Cache the revisions, machines and metadata fetched from the server in this directory, "
+    "so later runs against an unchanged revision start without re-fetching them",
+)
+@click.option(
+    "--pool-size",
+    type=int,
+    help="Maximum number of connections kept open to the server. Defaults to --parallelism",
+)
+@click.option("--idle-timeout", type=float, help="Close the open connections after this many idle seconds")
+@click.option("--tcp-keepalive", type=float, help="Send TCP keep-alive probes after this many idle seconds")
+@click.option(
+    "--session-per-worker",
+    is_flag=True,
+    default=False,
+    help="Send the requests of every worker thread with its own session, sharing the connections",
+)
+@click.option(
+    "--http2/--no-http2",
+    default=False,
+    help="Multiplex the requests over HTTP/2 when the server supports it. Requires gordo-client[http2]",
+)
 @click.pass_context
 def gordo_client(ctx: click.Context, *args, session_config=None, **kwargs):
     """Entry sub-command for client related activities."""
@@ -76,7 +105,7 @@ def gordo_client(ctx: click.Context, *args, session_config=None, **kwargs):
 
 @click.command("predict")
 @click.argument("start", type=IsoFormatDateTime())
-@click.argument("end", type=IsoFormatDateTime())
+@click.argument("end", type=IsoFormatDateTime(), required=False)
 @click.option(
     "--target",
     help="A list of machines to target. If not provided then target all machines in the project",
@@ -90,38 +119,171 @@ def gordo_client(ctx: click.Context, *args, session_config=None, **kwargs):
     help="DataProvider dict encoded as json. Must contain a 'type' key with the name of a DataProvider as value.",
 )
 @click.option("--output-dir", type=click.Path(exists=True), help="Save output prediction dataframes in a directory")
+@click.option(
+    "--output-dataset",
+    help="Append the predictions to a Hive-partitioned Parquet dataset in this directory or URI, "
+    "ie 's3://bucket/predictions', rather than to Influx",
+)
 @click.option("--influx-uri", help="Format: <username>:<password>@<host>:<port>/<optional-path>/<db_name>")
 @click.option("--influx-api-key", help="Key to provide to the destination influx")
 @click.option("--influx-recreate-db", help="Recreate the desintation DB before writing", is_flag=True, default=False)
+@click.option(
+    "--influx-coalesce-bytes",
+    type=int,
+    help="Buffer the points of all the machines until there are this many bytes of them, "
+    "writing them to Influx in a single request",
+)
+@click.option(
+    "--influx-coalesce-seconds",
+    type=float,
+    default=1.0,
+    help="The maximum number of seconds points are buffered for, with --influx-coalesce-bytes",
+)
+@click.option(
+    "--influx-write-workers",
+    type=int,
+    default=1,
+    help="Number of requests writing the points of a batch to Influx at the same time",
+)
 @click.option("--forward-resampled-sensors", help="forward the resampled sensor values", is_flag=True, default=False)
 @click.option("--n-retries", help="Time client should retry failed predictions", type=int, default=5)
+@click.option(
+    "--data-window",
+    help="Fetch the data of a machine in windows of this length, ie '7D', "
+    "overlapping the fetching of the next window with the predictions of the current one",
+)
+@click.option(
+    "--target-request-bytes",
+    type=int,
+    help="Adapt the batch size of each machine so its prediction requests are about this many bytes. "
+    "--batch-size is then the initial batch size",
+)
+@click.option(
+    "--target-request-seconds",
+    type=float,
+    help="Adapt the batch size of each machine so its prediction requests take about this many seconds. "
+    "--batch-size is then the initial batch size",
+)
 @click.option(
     "--parquet/--no-parquet", help="Use parquet serialization when sending and receiving data from server", default=True
 )
+@click.option(
+    "--arrow/--no-arrow",
+    help="Use Arrow IPC stream serialization when sending and receiving data from server, "
+    "falling back to parquet if the server doesn't support it. Takes precedence over --parquet",
+    default=False,
+)
+@click.option(
+    "--request-compression",
+    type=click.Choice(ENCODINGS),
+    help="Compress the bodies of the prediction requests with this content encoding, "
+    "falling back to uncompressed bodies if the server rejects them",
+)
+@click.option(
+    "--compression-min-size",
+    type=int,
+    default=1024,
+    help="Bodies smaller than this many bytes are sent uncompressed",
+)
+@click.option(
+    "--infer-prediction-path",
+    is_flag=True,
+    default=False,
+    help="Send the predictions of the machines whose model isn't an anomaly detector to /prediction right away",
+)
+@click.option(
+    "--checkpoint-path",
+    type=click.Path(dir_okay=False),
+    envvar="GORDO_CLIENT_CHECKPOINT_PATH",
+    help="SQLite file recording the data windows whose predictions were forwarded to Influx or the "
+    "output dataset, so that a rerun skips them. Requires --influx-uri or --output-dataset, use --data-window "
+    "to checkpoint long runs",
+)
+@click.option(
+    "--result-cache-dir",
+    type=click.Path(file_okay=False),
+    envvar="GORDO_CLIENT_RESULT_CACHE_DIR",
+    help="Directory keeping the predictions of every data window, so that reruns over overlapping ranges "
+    "only send the windows whose data changed. Requires --data-window",
+)
+@click.option(
+    "--follow",
+    is_flag=True,
+    default=False,
+    help="Keep predicting the new data from START on instead of stopping at END, forwarding the "
+    "predictions to Influx or the output dataset. Requires --influx-uri or --output-dataset",
+)
+@click.option("--interval", type=float, default=60, help="Seconds between the predictions of new data with --follow")
+@click.option("--delay", type=float, default=0, help="Seconds the sensor data is late by, with --follow")
+@click.option(
+    "--forwarding-workers",
+    type=int,
+    help="Write the predictions to Influx from this many background threads, "
+    "so the prediction requests don't wait for the writes",
+)
+@click.option(
+    "--forwarding-queue-size",
+    type=int,
+    default=64,
+    help="Predictions waiting to be written to Influx before the prediction requests are held back, "
+    "with --forwarding-workers",
+)
 @click.pass_context
 def predict(
     ctx: click.Context,
     start: datetime,
-    end: datetime,
+    end: Optional[datetime],
     target: List[str],
     data_provider: providers.GordoBaseDataProvider,
     output_dir: str,
+    output_dataset: Optional[str],
     influx_uri: str,
     influx_api_key: str,
     influx_recreate_db: bool,
+    influx_coalesce_bytes: Optional[int],
+    influx_coalesce_seconds: float,
+    influx_write_workers: int,
     forward_resampled_sensors: bool,
     n_retries: int,
+    data_window: Optional[str],
+    target_request_bytes: Optional[int],
+    target_request_seconds: Optional[float],
     parquet: bool,
+    arrow: bool,
+    request_compression: Optional[str],
+    compression_min_size: int,
+    infer_prediction_path: bool,
+    checkpoint_path: Optional[str],
+    result_cache_dir: Optional[str],
+    follow: bool,
+    interval: float,
+    delay: float,
+    forwarding_workers: Optional[int],
+    forwarding_queue_size: int,
 ):
     """Run some predictions against the target."""
-    if influx_uri is None:
-        prediction_forwarder = None
-    else:
+    if output_dataset is not None and influx_uri is not None:
+        raise click.UsageError("--output-dataset can't be given with --influx-uri")
+    if checkpoint_path is not None and influx_uri is None and output_dataset is None:
+        # The predictions of the skipped windows would be missing from the output files
+        raise click.UsageError("--checkpoint-path requires --influx-uri or --output-dataset")
+    if follow:
+        if end is not None:
+            raise click.UsageError("END can't be given with --follow")
+        if influx_uri is None and output_dataset is None:
+            raise click.UsageError("--follow requires --influx-uri or --output-dataset")
+    prediction_forwarder: Optional[PredictionForwarder] = None
+    if output_dataset is not None:
+        prediction_forwarder = ForwardPredictionsIntoParquet(output_dataset)
+    elif influx_uri is not None:
         prediction_forwarder = ForwardPredictionsIntoInflux(
             destination_influx_uri=influx_uri,
             destination_influx_api_key=influx_api_key,
             destination_influx_recreate=influx_recreate_db,
             n_retries=n_retries,
+            coalesce_bytes=influx_coalesce_bytes,
+            coalesce_seconds=influx_coalesce_seconds,
+            write_workers=influx_write_workers,
         )
 
     ctx.obj["kwargs"].update(
@@ -129,13 +291,32 @@ def predict(
             "data_provider": data_provider,
             "forward_resampled_sensors": forward_resampled_sensors,
             "n_retries": n_retries,
+            "data_window": data_window,
+            "target_request_bytes": target_request_bytes,
+            "target_request_seconds": target_request_seconds,
             "use_parquet": parquet,
+            "use_arrow": arrow,
+            "request_compression": request_compression,
+            "compression_min_size": compression_min_size,
+            "infer_prediction_path": infer_prediction_path,
+            "checkpoint_path": checkpoint_path,
+            "result_cache_dir": result_cache_dir,
             "prediction_forwarder": prediction_forwarder,
+            "forwarding_workers": forwarding_workers,
+            "forwarding_queue_size": forwarding_queue_size,
         }
     )
 
     client = Client(*ctx.obj["args"], **ctx.obj["kwargs"])
 
+    if follow:
+        for batch in client.predict_follow(start, interval=interval, targets=target, delay=delay):
+            for err_msg in batch.error_messages:
+                click.secho(err_msg, fg="red")
+        return
+    if end is None:
+        raise click.UsageError("Missing argument 'END'")
+
     # Fire off getting predictions
     predictions = client.predict(start, end, targets=target)  # type: Iterable[Tuple[str, pd.DataFrame, List[str]]]
 
@@ -187,31 +368,25 @@ def metadata(ctx: click.Context, output_file: Optional[IO[str]], target: List[st
     default=[],
     multiple=True,
 )
+@click.option(
+    "--model-store",
+    type=click.Path(file_okay=False),
+    envvar="GORDO_CLIENT_MODEL_STORE",
+    help="Keep the downloaded models in this directory, by project, machine and revision, "
+    "and only download the models which aren't in it",
+)
 @click.pass_context
-def download_model(ctx: click.Context, output_dir: str, target: List[str]):
+def download_model(ctx: click.Context, output_dir: str, target: List[str], model_store: Optional[str]):
     """Download the actual model from the target and write to an output directory."""
-    client = Client(*ctx.obj["args"], **ctx.obj["kwargs"])
-    models = client.download_model(targets=target)
+    client = Client(*ctx.obj["args"], **{**ctx.obj["kwargs"], "model_store": model_store})
+    paths = client.download_model_files(output_dir, targets=target)
 
-    # Iterate over mapping of models and save into their own sub dirs of the output_dir
-    for model_name, model in models.items():
-        model_out_dir = os.path.join(output_dir, model_name)
-        os.mkdir(model_out_dir)
-        click.secho(f"Writing model '{model_name}' to directory: '{model_out_dir}'...", nl=False)
-        _dump_model(model, model_out_dir)
-        click.secho("done")
+    for model_name, path in paths.items():
+        click.secho(f"Wrote model '{model_name}' to: '{path}'")
 
     click.secho(f"Wrote all models to directory: {output_dir}", fg="green")
 
 
-def _dump_model(obj: object, dest_dir: Union[os.PathLike, str], model_metadata: Optional[dict] = None):
-    with open(os.path.join(dest_dir, "model.pkl"), "wb") as m:
-        pickle.dump(obj, m)
-    if model_metadata is not None:
-        with open(os.path.join(dest_dir, "metadata.json"), "w") as f:
-            simplejson.dump(model_metadata, f, default=str)
-
-
 gordo_client.add_command(predict)
 gordo_client.add_command(metadata)
 gordo_client.add_command(download_model)
@@ -1,17 +1,24 @@
 import itertools
 import logging
+import os
 import pickle
 import copy
-
-from concurrent.futures import ThreadPoolExecutor
-from datetime import datetime
-from time import sleep
-from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple, Union, cast
-
+import shutil
+import tempfile
+import threading
+
+from collections import OrderedDict, deque
+from contextlib import closing, suppress
+from concurrent.futures import FIRST_COMPLETED, Future, wait
+from datetime import datetime, timezone
+from time import monotonic, sleep
+from urllib.parse import quote
+from typing import Any, Callable, Deque, Dict, Iterable, Iterator, List, Mapping, Optional, Set, Tuple, Union, cast
+
+import numpy as np
 import pandas as pd
+import pyarrow as pa
 import requests
-import wrapt
-from cachetools import TTLCache, cached
 from gordo_core.base import (
     GordoBaseDataset,
     DatasetWithProvider,
@@ -23,17 +30,103 @@ from gordo_core.data_providers.base import GordoBaseDataProvider
 from sklearn.base import BaseEstimator
 
 from gordo_client.dataframe import (
+    dataframe_from_arrow_bytes,
     dataframe_from_dict,
     dataframe_from_parquet_bytes,
+    dataframe_into_arrow_bytes,
     dataframe_into_parquet_bytes,
     dataframe_to_dict,
+    is_arrow_stream,
+    table_from_arrow_bytes,
+    table_from_parquet_bytes,
+)
+from gordo_client.batch_size import AdaptiveBatchSize
+from gordo_client.cache import CacheStats, DiskCache, SingleFlightCache
+from gordo_client.checkpoint import FORWARDED, CheckpointStore, _timestamp
+from gordo_client.compression import check_encoding, compressed_body, multipart_body
+from gordo_client.forwarders import PredictionForwarder, QueuedForwarder
+from gordo_client.io import (
+    BadGordoRequest,
+    HttpUnprocessableEntity,
+    NotFound,
+    PayloadTooLarge,
+    ResourceGone,
+    TooManyRequests,
+    UnsupportedMediaType,
+    _handle_response,
+    _is_model_response,
+    _json_dumps,
 )
-from gordo_client.io import BadGordoRequest, HttpUnprocessableEntity, NotFound, ResourceGone, _handle_response
+from gordo_client.model_store import MODEL_FILE_NAME, ModelStore
+from gordo_client.result_cache import ResultCache, input_hash
+from gordo_client.retry import CircuitBreaker, RetryBudget, backoff_delay
 from gordo_client.schemas import Machine, Metadata
-from gordo_client.utils import PredictionResult
+from gordo_client.scheduler import RetryLater, Scheduler
+from gordo_client.transport import (
+    HTTP2Adapter,
+    PooledAdapter,
+    TransportStats,
+    is_default_adapter,
+    transport_stats,
+    worker_session,
+)
+from gordo_client.utils import BatchPredictionResult, PredictionResult
 
 logger = logging.getLogger(__name__)
 
+# Bytes of a downloaded model held in memory at a time
+MODEL_CHUNK_SIZE = 1024 * 1024
+
+# Arguments of Client._fetch_data for a data window: start, end, history_start, end_exclusive
+_DataWindow = Tuple[datetime, datetime, Optional[datetime], bool]
+
+
+class _Window:
+    """
+    Data window of a machine, counting its batches until all of them completed.
+    """
+
+    __slots__ = ("machine", "start", "end", "pending", "submitted", "failed", "input_hash", "predictions")
+
+    def __init__(self, machine: Machine, start: datetime, end: datetime):
+        self.machine = machine
+        self.start = start
+        self.end = end
+        self.pending = 0
+        self.submitted = False
+        self.failed = False
+        # With the result cache, the hash of the data of the window and the predictions of its batches
+        self.input_hash: Optional[str] = None
+        self.predictions: List[Union[pd.DataFrame, pa.Table]] = []
+
+
+class _SplitBatch:
+    """
+    Halves of a batch too large for the server, each sent with a prediction request of its own.
+    """
+
+    __slots__ = ("X", "y", "chunks")
+
+    def __init__(self, X: pd.DataFrame, y: Optional[pd.DataFrame], chunks: List[slice]):
+        self.X = X
+        self.y = y
+        self.chunks = chunks
+
+
+class _QueuedData:
+    """
+    Data of a machine waiting for its batches to be submitted, from the row at ``position`` on.
+    """
+
+    __slots__ = ("machine", "X", "y", "position", "window")
+
+    def __init__(self, machine: Machine, X: pd.DataFrame, y: Optional[pd.DataFrame], window: _Window):
+        self.machine = machine
+        self.X = X
+        self.y = y
+        self.position = 0
+        self.window = window
+
 
 class Client:
     """
@@ -58,6 +151,34 @@ class Client:
         use_parquet: bool = False,
         session: Optional[requests.Session] = None,
         all_columns: bool = False,
+        machine_parallelism: Optional[int] = None,
+        data_window: Optional[str] = None,
+        target_request_bytes: Optional[int] = None,
+        target_request_seconds: Optional[float] = None,
+        use_arrow: bool = False,
+        result_format: str = "pandas",
+        revisions_cache_ttl: float = 5,
+        machines_cache_ttl: float = 30,
+        metadata_cache_size: int = 1024,
+        metadata_cache_ttl: float = 600,
+        cache_dir: Optional[str] = None,
+        model_store: Optional[str] = None,
+        pool_size: Optional[int] = None,
+        idle_timeout: Optional[float] = None,
+        tcp_keepalive: Optional[float] = None,
+        session_per_worker: bool = False,
+        http2: bool = False,
+        request_compression: Optional[str] = None,
+        compression_min_size: int = 1024,
+        retry_budget_ratio: float = 0.2,
+        circuit_breaker_threshold: int = 5,
+        circuit_breaker_reset: float = 30,
+        circuit_breaker_max_wait: float = 300,
+        infer_prediction_path: bool = False,
+        checkpoint_path: Optional[str] = None,
+        result_cache_dir: Optional[str] = None,
+        forwarding_workers: Optional[int] = None,
+        forwarding_queue_size: int = 64,
     ):
         """
 
@@ -86,25 +207,145 @@ class Client:
             provider is supplied.
         parallelism
             The maximum number of tasks to run at a given time when
-            running predictions
+            running predictions, shared by all the machines
         forward_resampled_sensors
             If true then forward resampled sensor values to the prediction_forwarder
         n_retries
             Number of times the client should attempt to retry a failed prediction request. Each time the client
-            retires the time it sleeps before retrying is exponentially calculated.
+            retries, the time it waits before retrying is drawn up to an exponentially growing bound, and is at
+            least the ``Retry-After`` of the server. The waiting requests don't hold a worker.
         use_parquet
             Pass the data to the server using the parquet protocol. Default is True
             and recommended as it's more efficient for larger batch sizes. If False JSON
             is used for sending the data back and forth.
         session
-            The http session object to use for making requests.
+            The http session object to use for making requests. The client sends them with a
+            copy of it, taken when the client is created.
         all_columns
             Return all columns for prediction. Including `smooth-..` columns
+        machine_parallelism
+            The maximum number of tasks of a single machine to run at a given time.
+            If None, a machine may use all of ``parallelism``.
+        data_window
+            Fetch the data of a machine in windows of this length, parsed by :class:`pandas.Timedelta`,
+            ie '7D'. The data of the next window is fetched while the predictions of the current one are
+            sent, which also bounds the data kept in memory. If None, all the data is fetched at once.
+        target_request_bytes
+            Adapt the batch size of each machine so that the body of its prediction requests
+            is about this many bytes. ``batch_size`` is then the initial batch size.
+        target_request_seconds
+            Adapt the batch size of each machine so that its prediction requests take about
+            this many seconds. With ``target_request_bytes``, the smaller batch size wins.
+        use_arrow
+            Pass the data to the server as Arrow IPC streams, which are cheaper to write and read
+            than parquet. Takes precedence over ``use_parquet``, and falls back to parquet if the
+            server rejects it.
+        result_format
+            The type of the predictions returned, either 'pandas' for :class:`pandas.DataFrame`,
+            or 'arrow' for :class:`pyarrow.Table`. The Arrow tables of a machine are the
+            concatenation of the record batches of its responses, without copying them.
+            The ``prediction_forwarder`` still receives dataframes.
+        revisions_cache_ttl
+            Seconds the list of revisions is cached for.
+        machines_cache_ttl
+            Seconds the list of machines of a revision is cached for.
+        metadata_cache_size
+            The maximum number of machine metadata cached.
+        metadata_cache_ttl
+            Seconds the metadata of a machine is cached for.
+        cache_dir
+            Also cache the revisions, machines and metadata in this directory, so they are
+            reused by later runs. The revisions are revalidated with their ETag, and the
+            machines and metadata of a revision are reused as long as the revision is available.
+        model_store
+            Keep the downloaded models in this directory, by project, machine and revision,
+            so they are only downloaded once. See :class:`gordo_client.model_store.ModelStore`.
+        pool_size
+            The maximum number of connections kept open to the server, defaulting to ``parallelism``
+            which is the maximum number of concurrent requests.
+        idle_timeout
+            Close the connections kept open when no request was sent for this many seconds.
+        tcp_keepalive
+            Enable TCP keep-alive probes on the connections after this many seconds without traffic.
+            Not supported with ``http2``.
+        session_per_worker
+            Send the requests of every worker thread with its own copy of ``session``, sharing its
+            connection pools, since a ``requests.Session`` isn't thread safe.
+        http2
+            Multiplex the requests over HTTP/2 connections when the server supports it. Requires the
+            optional ``httpx`` dependency, installed with ``pip install gordo-client[http2]``.
+        request_compression
+            Compress the bodies of the prediction requests with this ``Content-Encoding``, either
+            'gzip' or 'zstd', which requires the optional ``zstandard`` dependency. Parquet bodies are
+            already compressed, so they're sent as is. Falls back to uncompressed bodies if the server
+            rejects them. The compressed responses of the server are decoded by ``requests``.
+        compression_min_size
+            Bodies smaller than this many bytes are sent uncompressed.
+        retry_budget_ratio
+            The maximum number of retries per prediction request sent within the last minute, on top of
+            10 retries, shared by all the machines. Further failed requests aren't retried.
+        circuit_breaker_threshold
+            Number of consecutive failed prediction requests of a machine after which its requests
+            are held back, leaving the workers to the other machines.
+        circuit_breaker_reset
+            Seconds the requests of a machine are held back, before a trial request is sent.
+        circuit_breaker_max_wait
+            Seconds a prediction request may be held back in total, after which it fails. Being held
+            back doesn't count as one of its ``n_retries``.
+        infer_prediction_path
+            Send the prediction requests of the machines whose model isn't an anomaly detector,
+            according to their metadata, to ``/prediction`` right away, rather than to
+            ``/anomaly/prediction`` first. Otherwise, a machine falls back to ``/prediction`` once
+            the server rejects its anomaly predictions.
+        checkpoint_path
+            Path of a SQLite file recording the data windows of every machine and revision whose
+            predictions were all forwarded, which requires a ``prediction_forwarder``. Runs with the
+            same file resume where the earlier ones stopped, skipping the forwarded windows, so their
+            predictions aren't returned again. Predictions which were only returned to the caller are
+            lost with the run, so their windows are always predicted again. ``data_window`` sets the
+            size of the windows, which is the whole prediction range if it is None.
+        result_cache_dir
+            Directory keeping the predictions of every data window of the machines, by revision,
+            which requires ``data_window``. The windows are then aligned to multiples of ``data_window``,
+            and the predictions of a window whose data didn't change since are read from the cache
+            rather than requested from the server, and are still passed to the prediction forwarder
+            like the predictions of the server. Entries of the revisions no longer served are
+            dropped, and older windows are dropped by :meth:`gordo_client.result_cache.ResultCache.prune`.
+        forwarding_workers
+            Forward the predictions on this many background threads, through a
+            :class:`gordo_client.forwarders.QueuedForwarder`, rather than on the workers sending the
+            prediction requests. The forwarding failures are reported at the end of every run, as
+            failed batch results.
+        forwarding_queue_size
+            The maximum number of predictions waiting to be forwarded, after which the prediction
+            requests wait for the forwarding.
+
+        The transport replaces the default adapters of the copy of ``session``, but not the ones
+        mounted on it, leaving ``session`` itself untouched.
+        See :meth:`transport_stats` for the reuse of the connections.
         """
+        if result_format not in ("pandas", "arrow"):
+            raise ValueError(f"result_format must be either 'pandas' or 'arrow', got '{result_format}'")
+        if http2 and tcp_keepalive is not None:
+            raise ValueError("tcp_keepalive is not supported with http2")
+        if result_cache_dir is not None and data_window is None:
+            raise ValueError("result_cache_dir requires data_window")
+        if checkpoint_path is not None and prediction_forwarder is None:
+            raise ValueError("checkpoint_path requires a prediction_forwarder")
+        check_encoding(request_compression)
 
         self.base_url = f"{scheme}://{host}:{port}"
         self.server_endpoint = f"{self.base_url}/gordo/v0/{project}"
         self.metadata = metadata if metadata is not None else dict()
+        # Whether the client created the queue of the forwarder, which it then closes
+        self._owns_forwarder = False
+        if prediction_forwarder is not None and forwarding_workers is not None:
+            prediction_forwarder = QueuedForwarder(
+                prediction_forwarder,  # type: ignore
+                n_workers=forwarding_workers,
+                max_queued=forwarding_queue_size,
+            )
+            self._owns_forwarder = True
         self.prediction_forwarder = prediction_forwarder
         self.data_provider = data_provider
         self.use_parquet = use_parquet
@@ -112,16 +353,104 @@ class Client:
 
         # Default, failing back to /prediction on http code 422
         self.prediction_path = "/anomaly/prediction"
+        self.infer_prediction_path = infer_prediction_path
+        # The prediction path each machine supports, by machine name and revision
+        self._prediction_paths: Dict[Tuple[str, str], str] = {}
+        # The optional features of the requests the server turned out not to support
+        self._rejected_features: Set[str] = set()
         self.batch_size = batch_size
         self.parallelism = parallelism
         self.forward_resampled_sensors = forward_resampled_sensors
         self.n_retries = n_retries
-        self.format = "parquet" if use_parquet else "json"
-        self.session = session or requests.Session()
+        self.use_arrow = use_arrow
+        self.format = "arrow" if use_arrow else "parquet" if use_parquet else "json"
+        self.result_format = result_format
+        self.request_compression = request_compression
+        self.compression_min_size = compression_min_size
+        # The adapters of the transport are mounted on a session of the client's own
+        self.session = worker_session(session) if session is not None else requests.Session()
+        self.session_per_worker = session_per_worker
+        self._local = threading.local()
+        self._transport = transport = (
+            HTTP2Adapter(pool_size or parallelism, idle_timeout=idle_timeout)
+            if http2
+            else PooledAdapter(pool_size or parallelism, idle_timeout=idle_timeout, tcp_keepalive=tcp_keepalive)
+        )
+        for prefix in ("https://", "http://"):
+            if is_default_adapter(self.session.adapters[prefix]):
+                self.session.mount(prefix, transport)
         self.all_columns = all_columns
+        self.machine_parallelism = machine_parallelism
+        self.data_window = pd.Timedelta(data_window) if data_window is not None else None
+        self.batch_sizes: Optional[AdaptiveBatchSize] = None
+        if target_request_bytes is not None or target_request_seconds is not None:
+            self.batch_sizes = AdaptiveBatchSize(
+                initial_size=batch_size, target_bytes=target_request_bytes, target_seconds=target_request_seconds
+            )
+
+        # Runs the data fetching and prediction requests of all the machines
+        self.scheduler = Scheduler(max_workers=parallelism, max_per_group=machine_parallelism)
+        self.retry_budget = RetryBudget(ratio=retry_budget_ratio)
+        self.circuit_breaker = CircuitBreaker(
+            failure_threshold=circuit_breaker_threshold, reset_timeout=circuit_breaker_reset
+        )
+        self.circuit_breaker_max_wait = circuit_breaker_max_wait
+
+        self._revisions_cache = SingleFlightCache(maxsize=1, ttl=revisions_cache_ttl)
+        self._machines_cache = SingleFlightCache(maxsize=64, ttl=machines_cache_ttl)
+        self._metadata_cache = SingleFlightCache(maxsize=metadata_cache_size, ttl=metadata_cache_ttl)
+        self.disk_cache = DiskCache(cache_dir, project=project) if cache_dir is not None else None
+        self.model_store = ModelStore(model_store) if model_store is not None else None
+        self.checkpoints = CheckpointStore(checkpoint_path) if checkpoint_path is not None else None
+        self.result_cache = ResultCache(result_cache_dir, project=project) if result_cache_dir is not None else None
+
+    def __enter__(self) -> "Client":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """
+        Stop the worker threads of the client, then close the forwarding queue, the connections of
+        the transport and the checkpoint store it created. The client can't be used afterwards.
+        """
+        self.scheduler.shutdown()
+        if self._owns_forwarder:
+            for failure in cast(QueuedForwarder, self.prediction_forwarder).close():
+                logger.error(f"Failed to forward data for dates {failure.start} -> {failure.end}: {failure.error}")
+        self._transport.close()
+        if self.checkpoints is not None:
+            self.checkpoints.close()
+
+    def cache_stats(self) -> Dict[str, CacheStats]:
+        """
+        Statistics of the caches of the server responses, by name: 'revisions', 'machines' and 'metadata'.
+        """
+        return {
+            "revisions": self._revisions_cache.stats(),
+            "machines": self._machines_cache.stats(),
+            "metadata": self._metadata_cache.stats(),
+        }
+
+    def transport_stats(self) -> TransportStats:
+        """
+        Number of requests sent and connections opened by the transport of the client,
+        ``requests - connections`` of the requests having reused a connection.
+        """
+        return transport_stats(self.session)
+
+    def _get_session(self) -> requests.Session:
+        """
+        The session of the current thread with ``session_per_worker``, ``session`` otherwise.
+        """
+        if not self.session_per_worker:
+            return self.session
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = self._local.session = worker_session(self.session)
+        return session
 
-    @wrapt.synchronized
-    @cached(TTLCache(maxsize=1, ttl=5))
     def get_revisions(self):
         """
         Gets the available revisions served by the server.
@@ -132,21 +461,52 @@ class Client:
             a list of all available revisions, and ``latest`` is the latest and default
             revision.
         """
-        resp = self.session.get(f"{self.base_url}/gordo/v0/{self.project_name}/revisions")
+        return self._revisions_cache.get("revisions", self._fetch_revisions)
+
+    def _fetch_revisions(self):
+        cached = self.disk_cache.get(("revisions",)) if self.disk_cache is not None else None
+        headers = {"If-None-Match": cached.etag} if cached is not None and cached.etag else None
+        resp = self._get_session().get(f"{self.base_url}/gordo/v0/{self.project_name}/revisions", headers=headers)
+        if cached is not None and resp.status_code == 304:
+            return cached.content
         resp_json = _handle_response(resp=resp, resource_name="List of available revisions from server")
+        if self.disk_cache is not None:
+            self.disk_cache.set(("revisions",), resp_json, etag=resp.headers.get("ETag"))
+            self.disk_cache.prune(resp_json.get("available-revisions", []))
+        if self.result_cache is not None:
+            self.result_cache.prune(resp_json.get("available-revisions", []))
         return resp_json
 
+    def _cached_on_disk(self, key: Tuple[str, ...], revision: str) -> Optional[Any]:
+        """
+        Content cached on disk for ``key`` of ``revision``, if the revision is still available.
+        """
+        if self.disk_cache is None:
+            return None
+        entry = self.disk_cache.get(key)
+        if entry is None or revision not in self.get_revisions().get("available-revisions", []):
+            return None
+        return entry.content
+
     def _get_latest_revision(self) -> str:
         return self.get_revisions()["latest"]
 
-    @wrapt.synchronized
-    @cached(TTLCache(maxsize=64, ttl=30))
     def _get_available_machines(self, revision):
-        resp = self.session.get(f"{self.base_url}/gordo/v0/{self.project_name}/models", params={"revision": revision})
+        return self._machines_cache.get(revision, lambda: self._fetch_available_machines(revision))
+
+    def _fetch_available_machines(self, revision):
+        cached = self._cached_on_disk((revision, "models"), revision)
+        if cached is not None:
+            return cached
+        resp = self._get_session().get(
+            f"{self.base_url}/gordo/v0/{self.project_name}/models", params={"revision": revision}
+        )
         model_response = _handle_response(resp=resp, resource_name=f"Model name listing for revision {revision}")
         if "models" not in model_response:
             raise ValueError(f"Invalid response from server, key 'model' not found in: {model_response}")
         model_response["revision"] = model_response.get("revision", revision)
+        if self.disk_cache is not None:
+            self.disk_cache.set((revision, "models"), model_response)
         return model_response
 
     def get_available_machines(self, revision: Optional[str] = None):
@@ -182,48 +542,157 @@ class Client:
         -------
         """
         _machine_names: List[str] = machine_names or self.get_machine_names(revision=revision)
-        with ThreadPoolExecutor(max_workers=self.parallelism) as executor:
-            machines = executor.map(
-                lambda machine: self.machine_from_server(
-                    name=machine, revision=revision or self._get_latest_revision()
-                ),
-                _machine_names,
-            )
-            return list(machines)
+        rev = revision or self._get_latest_revision()
+        jobs = [
+            self.scheduler.submit(machine, self.machine_from_server, name=machine, revision=rev)
+            for machine in _machine_names
+        ]
+        return [job.result() for job in jobs]
 
-    @wrapt.synchronized
-    @cached(TTLCache(maxsize=32, ttl=600))
     def machine_from_server(self, name: str, revision: str) -> Machine:
-        resp = self.session.get(
+        return self._metadata_cache.get((name, revision), lambda: self._fetch_machine(name, revision))
+
+    def _fetch_machine(self, name: str, revision: str) -> Machine:
+        cached = self._cached_on_disk((revision, "metadata", name), revision)
+        if cached is not None:
+            return Machine(**cached)
+        resp = self._get_session().get(
             f"{self.base_url}/gordo/v0/{self.project_name}/{name}/metadata", params={"revision": revision}
         )
         metadata = _handle_response(resp=resp, resource_name=f"Machine metadata for {name}")
         if isinstance(metadata, dict) and metadata.get("metadata", None):
-            return Machine(**metadata.get("metadata", None))
+            machine = Machine(**metadata.get("metadata", None))
+            if self.disk_cache is not None:
+                self.disk_cache.set((revision, "metadata", name), metadata["metadata"])
+            return machine
         else:
             raise NotFound(f"Machine {name} not found")
 
     def download_model(self, revision=None, targets: Optional[List[str]] = None) -> Dict[str, BaseEstimator]:
         """
-        Download the actual model(s) from the ML server ``/download-model``.
+        Download the actual model(s) from the ML server ``/download-model``, ``parallelism`` at a time.
 
         Returns
         -------
             Mapping of target name to the model
         """
-        models = dict()
-        for machine_name in targets or self.get_machine_names(revision=revision):
-            resp = self.session.get(f"{self.base_url}/gordo/v0/{self.project_name}/{machine_name}/download-model")
-            content = _handle_response(resp, resource_name=f"Model download for model {machine_name}")
-            if isinstance(content, bytes):
-                models[machine_name] = pickle.loads(content)
-            else:
-                raise ValueError(
-                    f"Got unexpected return type: {type(content)} when attempting to"
-                    f" download the model {machine_name}."
+        rev = revision or self._get_latest_revision()
+        machine_names = targets or self.get_machine_names(revision=rev)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            # Without a model store, the models are only kept on disk until they are loaded
+            jobs = {
+                name: self.scheduler.submit(
+                    name,
+                    self._download_model_file,
+                    name,
+                    rev,
+                    None if self.model_store is not None else os.path.join(tmp_dir, name, MODEL_FILE_NAME),
                 )
+                for name in machine_names
+            }
+            models = dict()
+            for machine_name, job in jobs.items():
+                with open(job.result(), "rb") as f:
+                    models[machine_name] = pickle.load(f)
         return models
 
+    def download_model_files(
+        self, output_dir: str, revision: Optional[str] = None, targets: Optional[List[str]] = None
+    ) -> Dict[str, str]:
+        """
+        Download the pickled model(s) from the ML server ``/download-model`` into
+        ``<output_dir>/<machine>/model.pkl``, ``parallelism`` at a time, without loading them.
+
+        The models are streamed to disk. An interrupted download is resumed by the next call,
+        and the models found in the ``model_store`` of the client are linked rather than
+        downloaded.
+
+        Returns
+        -------
+            Mapping of target name to the path of its model
+        """
+        rev = revision or self._get_latest_revision()
+        jobs = {
+            name: self.scheduler.submit(
+                name, self._download_model_file, name, rev, os.path.join(output_dir, name, MODEL_FILE_NAME)
+            )
+            for name in targets or self.get_machine_names(revision=rev)
+        }
+        return {machine_name: job.result() for machine_name, job in jobs.items()}
+
+    def _download_model_file(self, machine_name: str, revision: str, path: Optional[str]) -> str:
+        """
+        Download the model of a machine to ``path``, through the model store if the client has one,
+        returning the path of the model. ``path`` may only be None with a model store, to
+        return the path of the model in the store.
+        """
+        if self.model_store is None:
+            if path is None:
+                raise ValueError("The path of the model is required without a model store")
+            self._stream_model(machine_name, revision, path)
+            return path
+        stored_path = self.model_store.get(self.project_name, machine_name, revision)
+        if stored_path is None:
+            stored_path = self.model_store.path(self.project_name, machine_name, revision)
+            self._stream_model(machine_name, revision, stored_path)
+        if path is None:
+            return stored_path
+        _link_or_copy(stored_path, path)
+        return path
+
+    def _stream_model(self, machine_name: str, revision: str, path: str):
+        """
+        Stream the model of a machine to ``path``, through a ``<model>.<revision>.part`` file
+        which is resumed with a range request if it exists.
+
+        The range only applies if the model is unchanged according to the ``ETag`` or
+        ``Last-Modified`` validator of the response the download started with, and the partial
+        download is moved to a name of its own while it's written, so concurrent downloads of
+        the model don't write to the same file.
+        """
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        part_path = f"{os.path.splitext(path)[0]}.{quote(revision, safe='')}.part"
+        tmp_path = f"{part_path}.{os.getpid()}-{threading.get_ident()}"
+        offset, validator = _claim_partial_download(part_path, tmp_path)
+        headers = None
+        if offset:
+            headers = {"Range": f"bytes={offset}-"}
+            if validator is not None:
+                headers["If-Range"] = validator
+        try:
+            resp = self._get_session().get(
+                f"{self.base_url}/gordo/v0/{self.project_name}/{machine_name}/download-model",
+                params={"revision": revision},
+                headers=headers,
+                stream=True,
+            )
+            with closing(resp):
+                if offset and resp.status_code == 416:
+                    # The partial download is no longer a prefix of the model
+                    os.unlink(tmp_path)
+                    return self._stream_model(machine_name, revision, path)
+                if not 200 <= resp.status_code <= 299:
+                    _handle_response(resp, resource_name=f"Model download for model {machine_name}")
+                if not _is_model_response(resp):
+                    raise ValueError(
+                        f"Got unexpected content type: {resp.headers.get('content-type')} when attempting to"
+                        f" download the model {machine_name}."
+                    )
+                # A server ignoring the range, or whose model changed, sends the whole model again
+                if resp.status_code != 206:
+                    validator = _validator(resp.headers)
+                with open(tmp_path, "ab" if resp.status_code == 206 else "wb") as f:
+                    for chunk in resp.iter_content(chunk_size=MODEL_CHUNK_SIZE):
+                        f.write(chunk)
+        except BaseException:
+            # Left for a later download to resume
+            _release_partial_download(tmp_path, part_path, validator)
+            raise
+        os.replace(tmp_path, path)
+        if not os.path.exists(part_path):
+            with suppress(FileNotFoundError):
+                os.unlink(f"{part_path}.validator")
+
     def get_metadata(self, revision: Optional[str] = None, targets: Optional[List[str]] = None) -> Dict[str, Metadata]:
         """
         Get the machine metadata for provided machines, or all if no machine names are provided.
@@ -269,17 +738,171 @@ class Client:
         -------
             0th element is the target name
             1st element is the dataframe of the predictions; complete with a DateTime index.
+            An Arrow table with ``result_format='arrow'``.
             2nd element is a list of error messages (if any) for running the predictions
         """
         rev = revision or self._get_latest_revision()
         machines = self._get_machines(revision=rev, machine_names=targets)
+        batches = self._iter_predictions(machines, start=start, end=end, revision=rev)
+        jobs = _merge_batch_results(machines, batches, result_format=self.result_format)
+        return [(j.name, j.predictions, j.error_messages) for j in jobs]
 
-        # For every machine, start making predictions for the time range
-        with ThreadPoolExecutor(max_workers=self.parallelism) as executor:
-            jobs = executor.map(
-                lambda ep: self.predict_single_machine(machine=ep, start=start, end=end, revision=rev), machines
-            )
-            return [(j.name, j.predictions, j.error_messages) for j in jobs]
+    def predict_iter(
+        self, start: datetime, end: datetime, targets: Optional[List[str]] = None, revision: Optional[str] = None
+    ) -> Iterator[BatchPredictionResult]:
+        """
+        Run the prediction process, yielding the result of every batch as soon as it completes.
+
+        Unlike :meth:`predict`, the batch results are not held until all the machines are done,
+        so the consumer can start processing them right away.
+
+        .. code-block:: python
+
+            for machine, batch_start, batch_end, predictions, error_messages in client.predict_iter(start, end):
+                ...
+
+        Parameters
+        ----------
+        start
+        end
+        targets
+            Optionally only target certain machines, referring to them by name.
+        revision
+            Revision of the model to run predictions again, defaulting to latest.
+
+        Raises
+        -----
+        ResourceGone
+            If the sever returns a 410, most likely because the revision is too old
+
+        Returns
+        -------
+            The batch results, in order of completion. ``predictions`` is None if the batch failed,
+            with the reason in ``error_messages``.
+        """
+        rev = revision or self._get_latest_revision()
+        machines = self._get_machines(revision=rev, machine_names=targets)
+        return self._iter_predictions(machines, start=start, end=end, revision=rev)
+
+    def predict_follow(
+        self,
+        start: datetime,
+        interval: float = 60,
+        targets: Optional[List[str]] = None,
+        revision: Optional[str] = None,
+        delay: float = 0,
+        high_water_marks: Optional[Dict[str, datetime]] = None,
+        ticks: Optional[int] = None,
+    ) -> Iterator[BatchPredictionResult]:
+        """
+        Keep predicting the new data of the machines from ``start`` on, every ``interval`` seconds,
+        yielding the result of every batch as soon as it completes, like :meth:`predict_iter`.
+
+        Every machine has a high-water mark, the date its predictions are complete up to. On every
+        tick, only the data from the mark of the machine to the current time is fetched, along with
+        the history its model needs, and the mark moves to the current time if all its batches
+        succeeded, or else to the start of its first failed batch. Failed intervals are sent again
+        on the next tick.
+
+        The client, its connections and caches are kept between the ticks. Without ``revision``,
+        the latest revision is used on every tick, so that new models are picked up, and a tick
+        whose revision was removed meanwhile is sent again with the new latest revision.
+
+        .. code-block:: python
+
+            for machine, batch_start, batch_end, predictions, error_messages in client.predict_follow(start):
+                ...
+
+        Parameters
+        ----------
+        start
+            Date to predict from, for the machines without a high-water mark.
+        interval
+            Seconds between the start of two ticks.
+        targets
+            Optionally only target certain machines, referring to them by name.
+        revision
+            Revision of the model to run predictions again, defaulting to latest.
+        delay
+            Seconds the data of the sensors is late by, which is only predicted once this old.
+        high_water_marks
+            Dates the predictions of the machines are complete up to, by machine name, which is
+            updated after every tick. Allows resuming from the marks of an earlier call.
+        ticks
+            Stop after this many ticks, never if None.
+        """
+        marks = high_water_marks if high_water_marks is not None else {}
+        tick_started = monotonic()
+        for tick in itertools.count():
+            if ticks is not None and tick >= ticks:
+                return
+            if tick:
+                sleep(max(0.0, tick_started + interval - monotonic()))
+                tick_started = monotonic()
+            now = _utcnow() - pd.Timedelta(seconds=delay)
+            try:
+                rev = revision or self._get_latest_revision()
+                machines = self._get_machines(revision=rev, machine_names=targets)
+            except (IOError, requests.RequestException) as exc:
+                logger.error(f"Failed to get the machines to predict, retrying on the next tick. Error: {exc}")
+                continue
+
+            ends = {}
+            data_windows = {}
+            for machine in machines:
+                mark = marks.get(machine.name, start)
+                ends[machine.name] = pd.Timestamp(now).floor(machine.dataset["resolution"]).to_pydatetime()
+                data_windows[machine.name] = self._follow_windows(machine, mark, ends[machine.name])
+            # Start of the first failed batch of the machines, their predictions being complete up to it
+            first_failures: Dict[str, datetime] = {}
+            try:
+                for batch in self._iter_predictions(
+                    [machine for machine in machines if data_windows[machine.name]],
+                    start=start,
+                    end=now,
+                    revision=rev,
+                    data_windows=data_windows,
+                ):
+                    if batch.error_messages:
+                        name = batch.machine.name
+                        first_failures[name] = min(first_failures.get(name, batch.start), batch.start)
+                    yield batch
+            except ResourceGone as exc:
+                if revision is not None:
+                    raise
+                logger.warning(
+                    f"Revision {rev} is gone, retrying with the latest revision on the next tick. Error: {exc}"
+                )
+                self._revisions_cache.clear()
+                continue
+            for machine in machines:
+                if not data_windows[machine.name]:
+                    continue
+                first_failure = first_failures.get(machine.name)
+                if first_failure is None:
+                    marks[machine.name] = ends[machine.name]
+                else:
+                    # The batches may start with the history of the model, from before the mark
+                    marks[machine.name] = max(
+                        marks.get(machine.name, start), pd.Timestamp(first_failure).to_pydatetime()
+                    )
+
+    def _follow_windows(self, machine: Machine, mark: datetime, end: datetime) -> List[_DataWindow]:
+        """
+        Data windows of ``[mark, end)``, the new data of a tick of :meth:`predict_follow`.
+
+        The first one starts with the history the model needs before ``mark``, and the rows at ``end``
+        are left to the next tick.
+        """
+        if end <= mark:
+            return []
+        windows = self._data_windows(machine, mark, end)
+        history = pd.Timedelta(machine.dataset["resolution"]) * machine.metadata.build_metadata.model.model_offset
+        first_start, first_end, _, end_exclusive = windows[0]
+        windows[0] = (first_start, first_end, mark - history, end_exclusive)
+        last_start, last_end, history_start, _ = windows[-1]
+        windows[-1] = (last_start, last_end, history_start, True)
+        return windows
 
     def predict_single_machine(
         self, machine: Machine, start: datetime, end: datetime, revision: str
@@ -300,41 +923,341 @@ class Client:
         -------
             Prediction response from ``/prediction`` GET
         """
+        batches = self._iter_predictions([machine], start=start, end=end, revision=revision)
+        return _merge_batch_results([machine], batches, result_format=self.result_format)[0]
+
+    def _iter_predictions(
+        self,
+        machines: List[Machine],
+        start: datetime,
+        end: datetime,
+        revision: str,
+        data_windows: Optional[Dict[str, List[_DataWindow]]] = None,
+    ) -> Iterator[BatchPredictionResult]:
+        """
+        Fetch the data of ``machines`` and send their prediction requests on the client's scheduler,
+        yielding every batch result as it completes.
+
+        The data windows of every machine are the :meth:`_pending_data_windows` of ``[start, end]``,
+        unless they are given by machine name in ``data_windows``.
+
+        Batches are handed to the scheduler round-robin over the machines, and at most
+        ``2 * parallelism`` of them are submitted and not yet consumed at a given time,
+        which bounds the number of batch results kept in memory when the consumer falls behind.
+
+        With ``data_window``, the data of the next window of a machine is fetched while the
+        batches of the current one are sent.
+
+        The data is split into batches as they are submitted, so that every batch gets the
+        latest size of the machine when the batch size is adaptive.
+        """
+        max_pending_batches = 2 * self.parallelism
+        queued_data: "OrderedDict[str, Deque[_QueuedData]]" = OrderedDict()
+        data_jobs: Dict[Future, _Window] = {}
+        batch_jobs: Dict[Future, Tuple[Machine, datetime, datetime, _Window]] = {}
+        windows = {
+            machine.name: iter(
+                data_windows[machine.name]
+                if data_windows is not None
+                else self._pending_data_windows(machine, start, end, revision)
+            )
+            for machine in machines
+        }
+        # Machines waiting for their queued batches to be submitted before fetching their next window
+        deferred_windows: Set[str] = set()
+        # Completed windows whose predictions are still queued for the forwarder
+        unforwarded: List[_Window] = []
+
+        def submit_batch(
+            X: pd.DataFrame,
+            y: Optional[pd.DataFrame],
+            chunk: slice,
+            batch_start: datetime,
+            batch_end: datetime,
+            window: _Window,
+        ):
+            window.pending += 1
+            job = self.scheduler.submit(
+                window.machine.name,
+                self._send_prediction_request,
+                X,
+                y,
+                chunk=chunk,
+                machine=window.machine,
+                start=batch_start,
+                end=batch_end,
+                revision=revision,
+            )
+            batch_jobs[job] = (window.machine, batch_start, batch_end, window)
+
+        def fetch_next_window(machine: Machine):
+            window = next(windows[machine.name], None)
+            if window is not None:
+                pending = _Window(machine, start=window[0], end=window[1])
+                job = self.scheduler.submit(machine.name, self._fetch_window, pending, revision, *window[2:])
+                data_jobs[job] = pending
+
+        try:
+            for machine in machines:
+                fetch_next_window(machine)
+
+            while data_jobs or batch_jobs or queued_data:
+                while queued_data and len(batch_jobs) < max_pending_batches:
+                    name, pending = next(iter(queued_data.items()))
+                    data = pending[0]
+                    machine = data.machine
+                    chunk, batch_start, batch_end = _next_batch(data.X, data.position, self._batch_size(machine))
+                    data.position = chunk.stop
+                    if data.position >= len(data.X):
+                        data.window.submitted = True
+                        pending.popleft()
+                    if pending:
+                        queued_data.move_to_end(name)
+                    else:
+                        del queued_data[name]
+                        if name in deferred_windows:
+                            deferred_windows.remove(name)
+                            fetch_next_window(machine)
+                    submit_batch(data.X, data.y, chunk, batch_start, batch_end, data.window)
+
+                done, _ = wait(itertools.chain(data_jobs, batch_jobs), return_when=FIRST_COMPLETED)
+                for job in done:
+                    if job in data_jobs:
+                        window = data_jobs.pop(job)
+                        machine = window.machine
+                        X, y, cached = job.result()
+                        # Fetch the next window while this one is sent, unless the previous one is still queued
+                        if machine.name in queued_data:
+                            deferred_windows.add(machine.name)
+                        else:
+                            fetch_next_window(machine)
+                        if cached is not None:
+                            if self._forwarding_deferred():
+                                unforwarded.append(window)
+                            else:
+                                self._checkpoint(window, revision)
+                            yield BatchPredictionResult(
+                                machine=machine,
+                                start=window.start,
+                                end=window.end,
+                                predictions=cached,
+                                error_messages=[],
+                            )
+                        elif len(X):
+                            queued_data.setdefault(machine.name, deque()).append(_QueuedData(machine, X, y, window))
+                    else:
+                        machine, batch_start, batch_end, window = batch_jobs.pop(job)
+                        result = job.result()
+                        window.pending -= 1
+                        if isinstance(result, _SplitBatch):
+                            for chunk in result.chunks:
+                                submit_batch(
+                                    result.X,
+                                    result.y,
+                                    chunk,
+                                    result.X.index[chunk.start],
+                                    result.X.index[chunk.stop - 1],
+                                    window,
+                                )
+                            continue
+                        window.failed |= bool(result.error_messages)
+                        if window.input_hash is not None and result.predictions is not None:
+                            window.predictions.append(result.predictions)
+                        if window.submitted and not window.pending and not window.failed:
+                            if self._forwarding_deferred():
+                                unforwarded.append(window)
+                            else:
+                                self._checkpoint(window, revision)
+                                self._cache_results(window, revision)
+                        yield BatchPredictionResult(
+                            machine=machine,
+                            start=batch_start,
+                            end=batch_end,
+                            predictions=result.predictions,
+                            error_messages=result.error_messages,
+                        )
+            yield from self._flush_forwarder(unforwarded, revision)
+        finally:
+            # Stops pending work when the consumer stops early or a request raised,
+            # and waits for the running tasks, as the scheduler is shared with other calls
+            running = [job for job in itertools.chain(data_jobs, batch_jobs) if not self.scheduler.cancel(job)]
+            wait(running)
+
+    def _flush_forwarder(self, windows: List[_Window], revision: str) -> Iterator[BatchPredictionResult]:
+        """
+        Flush a forwarder writing the predictions after its calls returned, such as a
+        :class:`gordo_client.forwarders.QueuedForwarder`, yielding a failed batch result for every failure.
+
+        Then the completed ``windows`` of the machines whose predictions were all forwarded are checkpointed
+        and cached, and the others are predicted again by the next run.
+        """
+        forwarder = self.prediction_forwarder
+        if not isinstance(forwarder, PredictionForwarder) or not forwarder.deferred:
+            return
+        failed = set()
+        for failure in forwarder.flush():
+            # The resampled sensor data isn't passed with its machine, so its failures are only logged
+            if failure.machine is None:
+                continue
+            failed.add(failure.machine.name)
+            msg = (
+                f"Failed to forward predictions for dates {failure.start} -> {failure.end} "
+                f"for target: '{failure.machine.name}' Error: {failure.error}"
+            )
+            yield BatchPredictionResult(
+                machine=failure.machine,
+                start=failure.start,
+                end=failure.end,
+                predictions=None,
+                error_messages=[msg],
+            )
+        for window in windows:
+            if window.machine.name not in failed:
+                self._checkpoint(window, revision)
+                self._cache_results(window, revision)
+
+    def _forwarding_deferred(self) -> bool:
+        """
+        Whether the prediction forwarder may forward the predictions after its calls returned,
+        which are then only complete once it was flushed.
+        """
+        forwarder = self.prediction_forwarder
+        return isinstance(forwarder, PredictionForwarder) and forwarder.deferred
+
+    def _batch_size(self, machine: Machine) -> int:
+        """
+        Number of rows to send in the next prediction request of the machine.
+        """
+        if self.batch_sizes is not None:
+            return self.batch_sizes.get(machine.name)
+        return self.batch_size
+
+    def _pending_data_windows(
+        self, machine: Machine, start: datetime, end: datetime, revision: str
+    ) -> List[_DataWindow]:
+        """
+        :meth:`_data_windows` of the machine, without the windows whose predictions were forwarded
+        in an earlier run according to the checkpoint store.
+        """
+        windows = self._data_windows(machine, start, end)
+        if self.checkpoints is None:
+            return windows
+        completed = self.checkpoints.completed(self.project_name, machine.name, revision, statuses=[FORWARDED])
+        pending = [window for window in windows if (_timestamp(window[0]), _timestamp(window[1])) not in completed]
+        if len(pending) < len(windows):
+            logger.info(
+                f"Skipping {len(windows) - len(pending)} out of {len(windows)} data windows of target "
+                f"'{machine.name}' completed in an earlier run"
+            )
+        return pending
+
+    def _fetch_window(
+        self, window: _Window, revision: str, history_start: Optional[datetime] = None, end_exclusive: bool = False
+    ) -> Tuple[pd.DataFrame, Optional[pd.DataFrame], Optional[Union[pd.DataFrame, pa.Table]]]:
+        """
+        Fetch the data of the window, see :meth:`_fetch_data`, along with its predictions from
+        the result cache if they were cached for this data.
 
+        The cached predictions are forwarded to the prediction forwarder like the predictions
+        of the server.
+        """
+        X, y = self._fetch_data(window.machine, window.start, window.end, history_start, end_exclusive)
+        if self.result_cache is None or not len(X):
+            return X, y, None
+        window.input_hash = input_hash(X, y)
+        cached = self.result_cache.get(window.machine.name, revision, window.start, window.end, window.input_hash)
+        if cached is None:
+            return X, y, None
+        predictions = cached if self.result_format == "arrow" else cached.to_pandas()
+        if self.prediction_forwarder is not None:
+            self.prediction_forwarder(  # type: ignore
+                predictions=_as_dataframe(predictions),
+                machine=window.machine,
+                metadata=self.metadata,
+            )
+        return X, y, predictions
+
+    def _cache_results(self, window: _Window, revision: str):
+        """
+        Store the predictions of the window in the result cache, once all its batches succeeded.
+        """
+        if self.result_cache is not None and window.input_hash is not None and window.predictions:
+            predictions = _concat_predictions(window.predictions)
+            self.result_cache.set(
+                window.machine.name, revision, window.start, window.end, window.input_hash, predictions
+            )
+            window.predictions = []
+
+    def _checkpoint(self, window: _Window, revision: str):
+        """
+        Record in the checkpoint store that the predictions of all the batches of the window were forwarded.
+        """
+        if self.checkpoints is not None:
+            self.checkpoints.record(
+                self.project_name, window.machine.name, revision, window.start, window.end, status=FORWARDED
+            )
+
+    def _data_windows(self, machine: Machine, start: datetime, end: datetime) -> List[_DataWindow]:
+        """
+        Split ``[start, end]`` in the windows the data of the machine is fetched in, see ``data_window``.
+
+        Returns
+        -------
+            Arguments of :meth:`_fetch_data` for every window, after the machine.
+        """
+        if self.data_window is None:
+            return [(start, end, None, False)]
+
+        resolution = machine.dataset["resolution"]
+        bounds = _window_bounds(
+            start, end, window=self.data_window, resolution=resolution, align=self.result_cache is not None
+        )
+        history = pd.Timedelta(resolution) * machine.metadata.build_metadata.model.model_offset
+        return [
+            (window_start, window_end, window_start - history if i else None, window_end < end)
+            for i, (window_start, window_end) in enumerate(zip(bounds[:-1], bounds[1:]))
+        ]
+
+    def _fetch_data(
+        self,
+        machine: Machine,
+        start: datetime,
+        end: datetime,
+        history_start: Optional[datetime] = None,
+        end_exclusive: bool = False,
+    ) -> Tuple[pd.DataFrame, pd.DataFrame]:
+        """
+        Fetch the raw data of the machine, forwarding the resampled sensor data if requested.
+
+        Parameters
+        ----------
+        machine
+        start
+        end
+        history_start
+            Drop the rows before this date, keeping only the history the model needs to
+            predict from ``start`` on. The earlier rows are predicted with the previous window.
+        end_exclusive
+            Drop the rows at ``end``, which are predicted with the next window.
+        """
         # Fetch all of the raw data
         X, y = self._raw_data(machine, start, end)
 
+        if history_start is not None or end_exclusive:
+            mask = np.ones(len(X.index), dtype=bool)
+            if history_start is not None:
+                mask &= X.index >= history_start
+            if end_exclusive:
+                mask &= X.index < end
+            X = X[mask]
+            y = y[mask] if y is not None else None
+
         # Forward sensor data
         if self.prediction_forwarder is not None and self.forward_resampled_sensors:
-            self.prediction_forwarder(resampled_sensor_data=X)  # type: ignore
-
-        max_indx = len(X.index) - 1  # Maximum allowable index values
-
-        # Start making batch predictions
-        with ThreadPoolExecutor(max_workers=self.parallelism) as executor:
-            jobs = executor.map(
-                lambda i: self._send_prediction_request(
-                    X,
-                    y,
-                    chunk=slice(i, i + self.batch_size),
-                    machine=machine,
-                    start=X.index[i],
-                    end=X.index[i + self.batch_size if i + self.batch_size <= max_indx else max_indx],
-                    revision=revision,
-                ),
-                range(0, X.shape[0], self.batch_size),
+            self.prediction_forwarder(  # type: ignore
+                resampled_sensor_data=X[X.index >= start] if history_start is not None else X
             )
-
-            # Accumulate the batched predictions
-            prediction_dfs = []
-            error_messages: List[str] = []
-            for prediction_result in jobs:
-                if prediction_result.predictions is not None:
-                    prediction_dfs.append(prediction_result.predictions)
-                error_messages.extend(prediction_result.error_messages)
-
-            predictions = pd.concat(prediction_dfs).sort_index() if prediction_dfs else pd.DataFrame()
-        return PredictionResult(name=machine.name, predictions=predictions, error_messages=error_messages)
+        return X, y
 
     def _send_prediction_request(
         self,
@@ -345,10 +1268,17 @@ class Client:
         start: datetime,
         end: datetime,
         revision: str,
-    ):
+        attempt: int = 1,
+        hold_deadline: Optional[float] = None,
+    ) -> Union[PredictionResult, _SplitBatch]:
         """
         Post a slice of data to the machine.
 
+        A failed request is retried by raising :class:`gordo_client.scheduler.RetryLater`, so that the
+        scheduler runs this again with the next ``attempt`` once the backoff delay has passed, without
+        holding a worker in the meantime. The requests of a machine whose circuit breaker is open are
+        put off the same way, without counting as an attempt, until ``circuit_breaker_max_wait`` passed.
+
         Parameters
         ----------
         X
@@ -358,6 +1288,11 @@ class Client:
         machine
         start
         end
+        attempt
+            Number of the attempt at sending the request, starting at 1.
+        hold_deadline
+            Time of :func:`time.monotonic` after which the request fails if the circuit breaker
+            is still open, set once it is first held back.
 
         Notes
         -----
@@ -366,60 +1301,85 @@ class Client:
         Returns
         -------
         PredictionResult
+            Or the halves of the batch to send instead, when it was too large for the server.
 
         Raises
         -----
         ResourceGone
             If the sever returns a 410, most likely because the revision is too old
+        RetryLater
+            To retry the request
         """
-        params = {"format": self.format, "revision": revision}
+        # The workers are left to the machines whose circuit is closed
+        wait_time = self.circuit_breaker.wait_time(machine.name)
+        if wait_time > 0:
+            now = monotonic()
+            if hold_deadline is None:
+                hold_deadline = now + self.circuit_breaker_max_wait
+            if now < hold_deadline:
+                logger.debug(f"Circuit breaker open for target: '{machine.name}', retrying in {wait_time:.1f} seconds")
+                raise RetryLater(min(wait_time, hold_deadline - now), hold_deadline=hold_deadline)
+            msg = (
+                f"Failed to get predictions for dates {start} -> {end} for target: '{machine.name}' "
+                f"Error: Circuit breaker open for {self.circuit_breaker_max_wait:.0f} seconds"
+            )
+            logger.error(msg)
+            return PredictionResult(name=machine.name, predictions=None, error_messages=[msg])
+
+        request_format = "parquet" if "arrow" in self._rejected_features else self.format
+        params = {"format": request_format, "revision": revision}
         if self.all_columns:
             params["all_columns"] = "true"
+        prediction_path = self._prediction_path(machine, revision)
         kwargs: Dict[str, Any] = dict(
-            url=f"{self.base_url}/gordo/v0/{self.project_name}/{machine.name}{self.prediction_path}", params=params
+            url=f"{self.base_url}/gordo/v0/{self.project_name}/{machine.name}{prediction_path}", params=params
+        )
+        compression = None if "compression" in self._rejected_features else self.request_compression
+        kwargs.update(
+            self._encode_payload(request_format, compression, X.iloc[chunk], y.iloc[chunk] if y is not None else None)
         )
 
-        # We're going to serialize the data as either JSON or Arrow
-        if self.use_parquet:
-            kwargs["files"] = {
-                "X": dataframe_into_parquet_bytes(X.iloc[chunk]),
-                "y": dataframe_into_parquet_bytes(y.iloc[chunk]) if y is not None else None,
-            }
-        else:
-            kwargs["json"] = {
-                "X": dataframe_to_dict(X.iloc[chunk]),
-                "y": dataframe_to_dict(y.iloc[chunk]) if y is not None else None,
-            }
+        rows = range(len(X.index))[chunk]
+        # The features given up to send the request once more after the server rejected it
+        fallback: List[str] = []
 
-        # Start attempting to get predictions for this batch
-        for current_attempt in itertools.count(start=1):
+        while True:
             try:
                 try:
-                    resp = _handle_response(self.session.post(**kwargs))
+                    resp = self._post_prediction(machine, len(rows), **kwargs)
                 except HttpUnprocessableEntity:
-                    self.prediction_path = "/prediction"
-                    kwargs["url"] = f"{self.base_url}/gordo/v0/{self.project_name}/{machine.name}{self.prediction_path}"
-                    resp = _handle_response(self.session.post(**kwargs))
-            # If it was an IO or TimeoutError, we can retry
-            except (IOError, TimeoutError, requests.ConnectionError, requests.HTTPError) as exc:
-                if current_attempt <= self.n_retries:
-                    time_to_sleep = min(2 ** (current_attempt + 2), 300)
-                    logger.warning(
-                        f"Failed to get response on attempt {current_attempt} out of {self.n_retries} attempts."
-                    )
-                    sleep(time_to_sleep)
-                    continue
-                else:
-                    msg = (
-                        f"Failed to get predictions for dates {start} -> {end} "
-                        f"for target: '{machine.name}' Error: {exc}"
-                    )
-                    logger.error(msg)
-
-                    return PredictionResult(name=machine.name, predictions=None, error_messages=[msg])
+                    prediction_path = self._prediction_paths[machine.name, revision] = "/prediction"
+                    kwargs["url"] = f"{self.base_url}/gordo/v0/{self.project_name}/{machine.name}{prediction_path}"
+                    resp = self._post_prediction(machine, len(rows), **kwargs)
+            # If it was an IO or TimeoutError, or the server is overloaded, we can retry
+            except (IOError, TimeoutError, requests.ConnectionError, requests.HTTPError, TooManyRequests) as exc:
+                return self._retry_later(
+                    machine, start, end, attempt, exc, retry_after=getattr(exc, "retry_after", None)
+                )
 
             # No point in retrying a BadGordoRequest
             except (BadGordoRequest, NotFound) as exc:
+                # Unless the batch was too large, then its halves are sent with the shrunk batch size
+                if isinstance(exc, PayloadTooLarge) and self.batch_sizes is not None and len(rows) > 1:
+                    middle = rows.start + len(rows) // 2
+                    return _SplitBatch(X, y, [slice(rows.start, middle), slice(middle, rows.stop)])
+                # Or the server may not support some feature of the request, then it is sent once more without
+                if not fallback:
+                    fallback = _fallback_features(exc, request_format, kwargs.get("headers", {}))
+                    if fallback:
+                        logger.warning(
+                            f"Request rejected by the server, sending it without {' and '.join(fallback)}. Error: {exc}"
+                        )
+                        if "arrow" in fallback:
+                            request_format = params["format"] = "parquet"
+                        for key in ("data", "files", "headers"):
+                            kwargs.pop(key, None)
+                        kwargs.update(
+                            self._encode_payload(
+                                request_format, None, X.iloc[chunk], y.iloc[chunk] if y is not None else None
+                            )
+                        )
+                        continue
                 msg = (
                     f"Failed with bad request or not found for dates {start} -> {end} "
                     f"for target: '{machine.name}' Error: {exc}"
@@ -431,14 +1391,134 @@ class Client:
 
             # Process response and return if no exception
             else:
-                predictions = self.dataframe_from_response(resp)
+                # The request only went through without the features, so the later ones are sent without too
+                if fallback and not self._rejected_features.issuperset(fallback):
+                    logger.warning(f"The server doesn't support {' and '.join(fallback)}, no longer using it")
+                    self._rejected_features.update(fallback)
+                if self.result_format == "arrow":
+                    predictions = self.table_from_response(resp)
+                else:
+                    predictions = self.dataframe_from_response(resp)
                 # Forward predictions to any other consumer if registered.
                 if self.prediction_forwarder is not None:
                     self.prediction_forwarder(  # type: ignore
-                        predictions=predictions, machine=machine, metadata=self.metadata
+                        predictions=_as_dataframe(predictions),
+                        machine=machine,
+                        metadata=self.metadata,
                     )
                 return PredictionResult(name=machine.name, predictions=predictions, error_messages=[])
 
+    def _prediction_path(self, machine: Machine, revision: str) -> str:
+        """
+        Path of the prediction requests of the machine, either ``/anomaly/prediction`` or ``/prediction``.
+        """
+        prediction_path = self._prediction_paths.get((machine.name, revision))
+        if prediction_path is not None:
+            return prediction_path
+        if self.infer_prediction_path and machine.model:
+            return "/anomaly/prediction" if _is_anomaly_model(machine.model) else "/prediction"
+        return self.prediction_path
+
+    def _retry_later(
+        self,
+        machine: Machine,
+        start: datetime,
+        end: datetime,
+        attempt: int,
+        error: Union[Exception, str],
+        retry_after: Optional[float] = None,
+    ) -> PredictionResult:
+        """
+        Raise :class:`gordo_client.scheduler.RetryLater` for the next attempt of a prediction request,
+        or return its failed result if it can't be retried anymore.
+
+        Retries count against the retry budget.
+        """
+        if attempt <= self.n_retries:
+            if self.retry_budget.try_acquire():
+                delay = backoff_delay(attempt, retry_after)
+                logger.warning(
+                    f"Failed to get response on attempt {attempt} out of {self.n_retries} attempts "
+                    f"for target: '{machine.name}', retrying in {delay:.1f} seconds. Error: {error}"
+                )
+                raise RetryLater(delay, attempt=attempt + 1)
+            error = f"{error} (retry budget exhausted)"
+        msg = f"Failed to get predictions for dates {start} -> {end} for target: '{machine.name}' Error: {error}"
+        logger.error(msg)
+        return PredictionResult(name=machine.name, predictions=None, error_messages=[msg])
+
+    @staticmethod
+    def _prediction_payload(request_format: str, X: pd.DataFrame, y: Optional[pd.DataFrame]) -> Dict[str, Any]:
+        """
+        Keyword arguments of :meth:`requests.Session.post` holding ``X`` and ``y`` serialized in ``request_format``.
+        """
+        # We're going to serialize the data as either JSON, Parquet or Arrow
+        if request_format == "json":
+            return {
+                "data": _json_dumps({"X": dataframe_to_dict(X), "y": dataframe_to_dict(y) if y is not None else None}),
+                "headers": {"Content-Type": "application/json"},
+            }
+        if request_format == "arrow":
+            return {
+                "files": {
+                    "X": dataframe_into_arrow_bytes(X),
+                    "y": dataframe_into_arrow_bytes(y) if y is not None else None,
+                }
+            }
+        return {
+            "files": {
+                "X": dataframe_into_parquet_bytes(X),
+                "y": dataframe_into_parquet_bytes(y) if y is not None else None,
+            }
+        }
+
+    def _encode_payload(
+        self, request_format: str, compression: Optional[str], X: pd.DataFrame, y: Optional[pd.DataFrame]
+    ) -> Dict[str, Any]:
+        """
+        :meth:`_prediction_payload`, with its body compressed with ``compression``, if any.
+        """
+        payload = self._prediction_payload(request_format, X, y)
+        if compression is None or request_format == "parquet":
+            return payload
+        if "files" in payload:
+            body, content_type = multipart_body(payload["files"])
+        else:
+            body, content_type = payload["data"], payload["headers"]["Content-Type"]
+        data, headers = compressed_body(body, content_type, compression, self.compression_min_size)
+        return {"data": data, "headers": headers}
+
+    def _post_prediction(self, machine: Machine, n_rows: int, **kwargs) -> Union[dict, bytes]:
+        """
+        Post a prediction request of ``n_rows`` rows, reporting its outcome to the adaptive batch size.
+
+        Timeouts, ``413`` and ``5xx`` responses shrink the batch size of the machine, and
+        successful responses move it towards the targets. Connection failures, ``429`` and ``5xx``
+        responses count towards opening the circuit breaker of the machine.
+        """
+        started = monotonic()
+        self.retry_budget.record_request()
+        try:
+            resp = self._get_session().post(**kwargs)
+        except (requests.Timeout, requests.ConnectionError) as exc:
+            self.circuit_breaker.record_failure(machine.name)
+            if self.batch_sizes is not None and isinstance(exc, requests.Timeout):
+                self.batch_sizes.record_failure(machine.name, n_rows)
+            raise
+        if resp.status_code == 429 or resp.status_code >= 500:
+            self.circuit_breaker.record_failure(machine.name)
+        else:
+            self.circuit_breaker.record_success(machine.name)
+        if self.batch_sizes is not None:
+            if resp.status_code == 413 or resp.status_code >= 500:
+                self.batch_sizes.record_failure(machine.name, n_rows)
+            elif 200 <= resp.status_code <= 299:
+                body = resp.request.body
+                self.batch_sizes.record_success(
+                    machine.name, n_rows, n_bytes=len(body) if body else 0, seconds=monotonic() - started
+                )
+        return _handle_response(resp)
+
     def _get_dataset(self, machine: Machine, start: datetime, end: datetime) -> GordoBaseDataset:
         """
         Apply client setting to machine dataset.
@@ -450,31 +1530,7 @@ class Client:
         start
         end
         """
-        # We want to adjust for any model offset. If the model outputs less than it got in, it requires
-        # extra data than what we're being asked to get predictions for.
-        # just to give us some buffer zone.
-
-        resolution = machine.dataset["resolution"]
-        n_intervals = machine.metadata.build_metadata.model.model_offset + 5
-        start = self._adjust_for_offset(dt=start, resolution=resolution, n_intervals=n_intervals)
-
-        # Re-create the machine's dataset but updating to use the client's
-        # data provider and changing the dates of data we want.
-        config = copy.copy(machine.dataset)
-        config.update({"train_start_date": start, "train_end_date": end})
-
-        dataset_type = config.pop("type", None)
-        if dataset_type is None:
-            raise ValueError("dataset.type is empty")
-        dataset_cls = import_dataset(dataset_type)
-        if self.data_provider is not None:
-            if not issubclass(dataset_cls, DatasetWithProvider):
-                raise ValueError("Unable to apply custom data_provider for non DatasetWithProvider dataset class")
-            config["data_provider"] = self.data_provider
-            dataset = create_with_provider(dataset_cls, config)
-        else:
-            dataset = create_dataset(dataset_cls, config)
-        return dataset
+        return _dataset_for_machine(machine, start, end, data_provider=self.data_provider)
 
     @staticmethod
     def _extract_build_metadata(machine: Machine) -> dict:
@@ -538,7 +1594,8 @@ class Client:
         Convert response from server into dataframe.
 
         The response from the server, parsed as either JSON / dict or raw bytes,
-        of which would be expected to be loadable from ``gordo.server.utils.dataframe_from_parquet_bytes``
+        of which would be expected to be loadable from ``gordo.server.utils.dataframe_from_parquet_bytes``,
+        or to be an Arrow IPC stream
 
         Parameters
         ----------
@@ -551,8 +1608,289 @@ class Client:
         """
         if isinstance(response, dict):
             return dataframe_from_dict(response["data"])
+        if is_arrow_stream(response):
+            return dataframe_from_arrow_bytes(response)
         return dataframe_from_parquet_bytes(response)
 
+    @staticmethod
+    def table_from_response(response: Union[dict, bytes]) -> pa.Table:
+        """
+        Convert response from server into an Arrow table, the counterpart of :meth:`dataframe_from_response`.
+
+        Arrow IPC stream responses are read without copying them.
+
+        Parameters
+        ----------
+        response
+            The parsed response from the ML server.
+
+        Returns
+        -------
+        pyarrow.Table
+        """
+        if isinstance(response, dict):
+            return pa.Table.from_pandas(dataframe_from_dict(response["data"]))
+        if is_arrow_stream(response):
+            return table_from_arrow_bytes(response)
+        return table_from_parquet_bytes(response)
+
+
+def _dataset_for_machine(
+    machine: Machine, start: datetime, end: datetime, data_provider: Optional[GordoBaseDataProvider] = None
+) -> GordoBaseDataset:
+    """
+    Re-create the machine's dataset for the ``[start, end]`` range, optionally using a custom data provider.
+
+    Parameters
+    ----------
+    machine
+        Named tuple representing the machine info from controller
+    start
+    end
+    data_provider
+        The data provider to use for the dataset, defaults to the one the machine was built with.
+    """
+    # We want to adjust for any model offset. If the model outputs less than it got in, it requires
+    # extra data than what we're being asked to get predictions for.
+    # just to give us some buffer zone.
+
+    resolution = machine.dataset["resolution"]
+    n_intervals = machine.metadata.build_metadata.model.model_offset + 5
+    start = Client._adjust_for_offset(dt=start, resolution=resolution, n_intervals=n_intervals)
+
+    # Re-create the machine's dataset but updating to use the client's
+    # data provider and changing the dates of data we want.
+    config = copy.copy(machine.dataset)
+    config.update({"train_start_date": start, "train_end_date": end})
+
+    dataset_type = config.pop("type", None)
+    if dataset_type is None:
+        raise ValueError("dataset.type is empty")
+    dataset_cls = import_dataset(dataset_type)
+    if data_provider is not None:
+        if not issubclass(dataset_cls, DatasetWithProvider):
+            raise ValueError("Unable to apply custom data_provider for non DatasetWithProvider dataset class")
+        config["data_provider"] = data_provider
+        dataset = create_with_provider(dataset_cls, config)
+    else:
+        dataset = create_dataset(dataset_cls, config)
+    return dataset
+
+
+def _utcnow() -> datetime:
+    return datetime.now(tz=timezone.utc)
+
+
+def _is_anomaly_model(model: Dict[str, Any]) -> bool:
+    """
+    Whether the model definition of a machine is an anomaly detector of ``gordo``, serving ``/anomaly/prediction``.
+
+    Examples
+    --------
+    >>> _is_anomaly_model({"gordo.machine.model.anomaly.diff.DiffBasedAnomalyDetector": {}})
+    True
+    >>> _is_anomaly_model({"sklearn.decomposition.PCA": {"svd_solver": "auto"}})
+    False
+    """
+    return any(".anomaly." in definition for definition in model)
+
+
+def _fallback_features(exc: Exception, request_format: str, headers: Dict[str, str]) -> List[str]:
+    """
+    The optional features of a prediction request in ``request_format`` with ``headers`` the server
+    may have rejected it for with ``exc``, either a ``400`` or a ``415``.
+
+    Examples
+    --------
+    >>> _fallback_features(BadGordoRequest("Unreadable body"), "arrow", {"Content-Encoding": "gzip"})
+    ['compression', 'arrow']
+    >>> _fallback_features(UnsupportedMediaType("Unknown format"), "arrow", {})
+    ['arrow']
+    >>> _fallback_features(PayloadTooLarge("Too large"), "json", {"Content-Encoding": "gzip"})
+    []
+    """
+    if type(exc) not in (BadGordoRequest, UnsupportedMediaType):
+        return []
+    features = []
+    if "Content-Encoding" in headers:
+        features.append("compression")
+    if request_format == "arrow":
+        features.append("arrow")
+    return features
+
+
+def _validator(headers: Mapping[str, str]) -> Optional[str]:
+    """
+    The validator of a response to send in the ``If-Range`` header of a range request for the rest
+    of its body, its strong ``ETag`` or else its ``Last-Modified`` date. None if it has neither.
+
+    Examples
+    --------
+    >>> _validator({"ETag": '"v1"', "Last-Modified": "Wed, 21 Oct 2015 07:28:00 GMT"})
+    '"v1"'
+    >>> _validator({"ETag": 'W/"v1"', "Last-Modified": "Wed, 21 Oct 2015 07:28:00 GMT"})
+    'Wed, 21 Oct 2015 07:28:00 GMT'
+    """
+    etag = headers.get("ETag")
+    if etag is not None and not etag.startswith("W/"):
+        return etag
+    return headers.get("Last-Modified")
+
+
+def _claim_partial_download(part_path: str, tmp_path: str) -> Tuple[int, Optional[str]]:
+    """
+    Move the partial download at ``part_path`` to ``tmp_path``, returning its size and validator.
+    The size is 0 if there is no partial download, or another download claimed it first.
+    """
+    try:
+        os.replace(part_path, tmp_path)
+    except FileNotFoundError:
+        return 0, None
+    try:
+        with open(f"{part_path}.validator") as f:
+            validator: Optional[str] = f.read() or None
+    except FileNotFoundError:
+        validator = None
+    return os.path.getsize(tmp_path), validator
+
+
+def _release_partial_download(tmp_path: str, part_path: str, validator: Optional[str]):
+    """
+    Move the partial download at ``tmp_path`` back to ``part_path``, with the ``validator`` of its
+    response, for a later download to resume it.
+    """
+    if not os.path.exists(tmp_path):
+        return
+    with open(f"{part_path}.validator", "w") as f:
+        f.write(validator or "")
+    os.replace(tmp_path, part_path)
+
+
+def _link_or_copy(src: str, dst: str):
+    """
+    Hard link ``src`` to ``dst``, or copy it if they aren't on the same file system.
+    """
+    os.makedirs(os.path.dirname(dst), exist_ok=True)
+    if os.path.exists(dst):
+        os.unlink(dst)
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copyfile(src, dst)
+
+
+def _window_bounds(
+    start: datetime, end: datetime, window: pd.Timedelta, resolution: str, align: bool = False
+) -> List[datetime]:
+    """
+    Split ``[start, end]`` into windows of ``window`` length, with the inner bounds aligned to ``resolution``.
+
+    Parameters
+    ----------
+    start
+    end
+    window
+        Length of the windows, rounded down to a multiple of ``resolution``.
+    resolution
+        A string code capable of being parsed by :meth::`pandas.Timedelta`.
+    align
+        Align the inner bounds to multiples of ``window`` since the epoch instead, so that the
+        windows of ranges with different starts are the same.
+
+    Returns
+    -------
+        The bounds of the windows, starting with ``start`` and ending with ``end``.
+
+    Examples
+    --------
+    >>> import dateutil
+    >>> start = dateutil.parser.isoparse("2019-01-01T12:05:00+00:00")
+    >>> end = dateutil.parser.isoparse("2019-01-02T00:00:00+00:00")
+    >>> bounds = _window_bounds(start, end, window=pd.Timedelta("5H"), resolution="10T")
+    >>> [str(bound) for bound in bounds]
+    ['2019-01-01 12:05:00+00:00', '2019-01-01 17:00:00+00:00', '2019-01-01 22:00:00+00:00', '2019-01-02 00:00:00+00:00']
+    >>> later_start = dateutil.parser.isoparse("2019-01-01T13:05:00+00:00")
+    >>> bounds = _window_bounds(later_start, end, window=pd.Timedelta("5H"), resolution="10T", align=True)
+    >>> [str(bound) for bound in bounds]
+    ['2019-01-01 13:05:00+00:00', '2019-01-01 17:00:00+00:00', '2019-01-01 22:00:00+00:00', '2019-01-02 00:00:00+00:00']
+    """
+    step = pd.Timedelta(resolution)
+    window = max(window // step, 1) * step
+    bounds = [start]
+    bound = pd.Timestamp(start).floor(window if align else step) + window
+    while bound < end:
+        bounds.append(bound.to_pydatetime())
+        bound += window
+    bounds.append(end)
+    return bounds
+
+
+def _prediction_batches(X: pd.DataFrame, batch_size: int) -> Iterator[Tuple[slice, datetime, datetime]]:
+    """
+    Split ``X`` into the slices sent by each prediction request, with the start and end date of each slice.
+    """
+    for i in range(0, X.shape[0], batch_size):
+        yield _next_batch(X, i, batch_size)
+
+
+def _next_batch(X: pd.DataFrame, position: int, batch_size: int) -> Tuple[slice, datetime, datetime]:
+    """
+    Slice of the batch of ``X`` starting at the row ``position``, with its start and end date.
+    """
+    max_indx = len(X.index) - 1  # Maximum allowable index values
+    stop = min(position + batch_size, len(X.index))
+    return slice(position, stop), X.index[position], X.index[stop if stop <= max_indx else max_indx]
+
+
+def _merge_batch_results(
+    machines: List[Machine], batches: Iterable[BatchPredictionResult], result_format: str = "pandas"
+) -> List[PredictionResult]:
+    """
+    Accumulate the batch results of every machine into one :class:`gordo_client.utils.PredictionResult` each,
+    in the order of ``machines``.
+
+    With ``result_format='arrow'``, the predictions are Arrow tables, which are ordered by the
+    start date of their batch instead of being sorted, as the batches cover consecutive dates.
+    """
+    successful_batches: Dict[str, List[BatchPredictionResult]] = {machine.name: [] for machine in machines}
+    error_messages: Dict[str, List[str]] = {machine.name: [] for machine in machines}
+    for batch in batches:
+        if batch.predictions is not None:
+            successful_batches[batch.machine.name].append(batch)
+        error_messages[batch.machine.name].extend(batch.error_messages)
+
+    results = []
+    for machine in machines:
+        machine_batches = successful_batches[machine.name]
+        predictions: Union[pd.DataFrame, pa.Table]
+        if result_format == "arrow":
+            machine_batches.sort(key=lambda batch: batch.start)
+            tables = [batch.predictions for batch in machine_batches]
+            predictions = _concat_predictions(tables) if tables else pa.table({})
+        else:
+            dfs = [batch.predictions for batch in machine_batches]
+            predictions = pd.concat(dfs).sort_index() if dfs else pd.DataFrame()
+        results.append(
+            PredictionResult(name=machine.name, predictions=predictions, error_messages=error_messages[machine.name])
+        )
+    return results
+
+
+def _concat_predictions(predictions: list) -> Union[pd.DataFrame, pa.Table]:
+    """
+    Concatenate prediction dataframes, or Arrow tables, whose record batches are reused without copying them.
+    """
+    if isinstance(predictions[0], pa.Table):
+        return pa.concat_tables(predictions)
+    return pd.concat(predictions)
+
+
+def _as_dataframe(predictions: Union[pd.DataFrame, pa.Table]) -> pd.DataFrame:
+    """
+    Predictions as a dataframe, converting them if they are an Arrow table.
+    """
+    return predictions.to_pandas() if isinstance(predictions, pa.Table) else predictions
+
 
 def make_date_ranges(start: datetime, end: datetime, max_interval_days: int, freq: str = "H"):
     """
@@ -0,0 +1,78 @@
+"""
+Compression of the bodies of the prediction requests, announced with their ``Content-Encoding`` header.
+
+``zstd`` requires the optional ``zstandard`` dependency, installed with ``pip install gordo-client[zstd]``.
+"""
+
+import gzip
+from typing import Dict, Optional, Tuple
+
+from urllib3 import encode_multipart_formdata
+
+try:
+    import zstandard
+except ImportError:  # Optional, installed with the "zstd" extra
+    zstandard = None  # type: ignore
+
+ENCODINGS = ("gzip", "zstd")
+
+
+def check_encoding(encoding: Optional[str]):
+    """
+    Raise if requests can't be compressed with ``encoding``.
+
+    Raises
+    ------
+    ValueError
+        If the encoding isn't one of :data:`ENCODINGS`.
+    ImportError
+        If the encoding is ``zstd`` and ``zstandard`` isn't installed.
+    """
+    if encoding is None:
+        return
+    if encoding not in ENCODINGS:
+        raise ValueError(f"Request compression must be one of {ENCODINGS}, got '{encoding}'")
+    if encoding == "zstd" and zstandard is None:
+        raise ImportError("zstd compression requires zstandard, installed with 'pip install gordo-client[zstd]'")
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    """
+    Compress ``body`` with ``encoding``, either 'gzip' or 'zstd'.
+
+    Examples
+    --------
+    >>> gzip.decompress(compress(b"data", "gzip"))
+    b'data'
+    """
+    if encoding == "zstd":
+        return zstandard.ZstdCompressor(level=3).compress(body)
+    # Fast levels, the bodies are compressed once and sent right away
+    return gzip.compress(body, compresslevel=5, mtime=0)
+
+
+def compressed_body(
+    body: bytes, content_type: str, encoding: Optional[str], min_size: int = 0
+) -> Tuple[bytes, Dict[str, str]]:
+    """
+    Body of a request compressed with ``encoding`` if it is at least ``min_size`` bytes,
+    along with the headers describing it.
+
+    Examples
+    --------
+    >>> compressed_body(b"{}", "application/json", "gzip", min_size=1024)
+    (b'{}', {'Content-Type': 'application/json'})
+    """
+    if encoding is None or len(body) < min_size:
+        return body, {"Content-Type": content_type}
+    return compress(body, encoding), {"Content-Type": content_type, "Content-Encoding": encoding}
+
+
+def multipart_body(files: Dict[str, Optional[bytes]]) -> Tuple[bytes, str]:
+    """
+    ``multipart/form-data`` body of the files which aren't None, with its content type,
+    as posted by ``requests`` and ``aiohttp``.
+    """
+    return encode_multipart_formdata(
+        {name: (name, content, "application/octet-stream") for name, content in files.items() if content is not None}
+    )
@@ -1,5 +1,3 @@
-import io
-
 import dateutil
 import pandas as pd
 import pyarrow as pa
@@ -41,8 +39,100 @@ def dataframe_from_parquet_bytes(buf: bytes) -> pd.DataFrame:
     -------
     pandas.DataFrame
     """
-    table = pq.read_table(io.BytesIO(buf))
-    return table.to_pandas()
+    return table_from_parquet_bytes(buf).to_pandas()
+
+
+def table_from_parquet_bytes(buf: bytes) -> pa.Table:
+    """
+    Convert bytes representing a parquet table into an Arrow table.
+
+    Parameters
+    ----------
+    buf
+        Bytes representing a parquet table.
+
+    Returns
+    -------
+    pyarrow.Table
+    """
+    return pq.read_table(pa.BufferReader(buf))
+
+
+ARROW_STREAM_CONTENT_TYPE = "application/vnd.apache.arrow.stream"
+
+# Every message of an Arrow IPC stream starts with this continuation marker
+_ARROW_STREAM_MARKER = b"\xff\xff\xff\xff"
+
+
+def dataframe_into_arrow_bytes(df: pd.DataFrame) -> bytes:
+    """
+    Convert a dataframe into bytes representing an Arrow IPC stream.
+
+    Unlike parquet, the columns are written as they are laid out in memory, without
+    encoding, compression or statistics, which makes it cheap to write and to read.
+
+    Parameters
+    ----------
+    df
+        DataFrame to be converted
+
+    Returns
+    -------
+    bytes
+
+    Examples
+    --------
+    >>> import pandas as pd
+    >>> df = pd.DataFrame({"tag": [1.0, 2.0]}, index=pd.date_range("2019-01-01", periods=2, freq="10T"))
+    >>> dataframe_from_arrow_bytes(dataframe_into_arrow_bytes(df)).equals(df)
+    True
+    """
+    table = pa.Table.from_pandas(df)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def dataframe_from_arrow_bytes(buf: bytes) -> pd.DataFrame:
+    """
+    Convert bytes representing an Arrow IPC stream into a pandas dataframe.
+
+    Parameters
+    ----------
+    buf
+        Bytes representing an Arrow IPC stream, as written by :func:`dataframe_into_arrow_bytes`
+
+    Returns
+    -------
+    pandas.DataFrame
+    """
+    return table_from_arrow_bytes(buf).to_pandas()
+
+
+def table_from_arrow_bytes(buf: bytes) -> pa.Table:
+    """
+    Convert bytes representing an Arrow IPC stream into an Arrow table.
+
+    The record batches of the table reference ``buf`` instead of copying it.
+
+    Parameters
+    ----------
+    buf
+        Bytes representing an Arrow IPC stream, as written by :func:`dataframe_into_arrow_bytes`
+
+    Returns
+    -------
+    pyarrow.Table
+    """
+    return pa.ipc.open_stream(pa.py_buffer(buf)).read_all()
+
+
+def is_arrow_stream(buf: bytes) -> bool:
+    """
+    Whether ``buf`` looks like an Arrow IPC stream rather than a parquet file.
+    """
+    return buf[:4] == _ARROW_STREAM_MARKER
 
 
 def dataframe_to_dict(df: pd.DataFrame) -> dict:
@@ -88,17 +178,24 @@ def dataframe_to_dict(df: pd.DataFrame) -> dict:
                   'sub-feature-1': {'2019-01-01': 3, '2019-02-01': 7}}}
 
     """
-    # Need to copy, because Python's mutability allowed .index assignment to mutate the passed df
-    data = df.copy()
-    if isinstance(data.index, pd.DatetimeIndex):
-        data.index = data.index.astype(str)
+    # The index is converted once for all the columns, instead of once per cell
+    index = df.index.astype(str).tolist() if isinstance(df.index, pd.DatetimeIndex) else df.index.tolist()
     if isinstance(df.columns, pd.MultiIndex):
-        return {
-            col: data[col].to_dict() if isinstance(data[col], pd.DataFrame) else pd.DataFrame(data[col]).to_dict()
-            for col in data.columns.get_level_values(0)
-        }
+        result = {}
+        for col in df.columns.get_level_values(0).unique():
+            data = df[col]
+            result[col] = _columns_to_dict(data if isinstance(data, pd.DataFrame) else data.to_frame(), index)
+        return result
     else:
-        return data.to_dict()
+        return _columns_to_dict(df, index)
+
+
+def _columns_to_dict(df: pd.DataFrame, index: list) -> dict:
+    """
+    Same as :meth:`pandas.DataFrame.to_dict` with ``index`` as the keys, zipping it with the values
+    of every column converted to Python objects at once.
+    """
+    return {name: dict(zip(index, df.iloc[:, i].tolist())) for i, name in enumerate(df.columns)}
 
 
 def dataframe_from_dict(data: dict) -> pd.DataFrame:
@@ -136,17 +233,52 @@ def dataframe_from_dict(data: dict) -> pd.DataFrame:
     if isinstance(data, dict) and any(isinstance(val, dict) for val in data.values()):
         keys = data.keys()
         try:
-            df: pd.DataFrame = pd.concat((pd.DataFrame.from_dict(data[key]) for key in keys), axis=1, keys=keys)
+            df: pd.DataFrame = pd.concat((_frame_from_dict(data[key]) for key in keys), axis=1, keys=keys)
         except (ValueError, AttributeError):
-            df = pd.DataFrame.from_dict(data)
+            df = _frame_from_dict(data)
     else:
-        df = pd.DataFrame.from_dict(data)
+        df = _frame_from_dict(data)
 
-    try:
-        df.index = df.index.map(dateutil.parser.isoparse)  # type: ignore
-    except (TypeError, ValueError):
-        df.index = df.index.map(int)
+    df.index = _parse_index(df.index)
 
     df.sort_index(inplace=True)
 
     return df
+
+
+def _frame_from_dict(data: dict) -> pd.DataFrame:
+    """
+    Same as :meth:`pandas.DataFrame.from_dict`, skipping the alignment of the columns on their index
+    when they all have the same keys in the same order, as written by :func:`dataframe_to_dict`.
+    """
+    columns = list(data.values())
+    if columns and all(isinstance(column, dict) for column in columns):
+        index = list(columns[0])
+        if all(len(column) == len(index) and list(column) == index for column in columns[1:]):
+            return pd.DataFrame({name: list(column.values()) for name, column in data.items()}, index=index)
+    return pd.DataFrame.from_dict(data)
+
+
+def _parse_index(index: pd.Index) -> pd.Index:
+    """
+    Parse the index of a deserialized dataframe, made of either ISO 8601 dates or integers.
+
+    Dates are parsed by :func:`pandas.to_datetime` for the whole index at once, unless they
+    are not all in the same timezone.
+    """
+    try:
+        dateutil.parser.isoparse(index[0])
+    except (TypeError, ValueError, IndexError):
+        pass
+    else:
+        try:
+            parsed = pd.to_datetime(index)
+        except (TypeError, ValueError):
+            pass
+        else:
+            if isinstance(parsed, pd.DatetimeIndex):
+                return parsed
+    try:
+        return index.map(dateutil.parser.isoparse)
+    except (TypeError, ValueError):
+        return index.map(int)
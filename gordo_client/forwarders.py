@@ -1,18 +1,32 @@
 import abc
 import itertools
 import logging
+import os
+import queue
+import threading
 import time
-from typing import Any, Dict, Optional
+import uuid
+from collections import namedtuple
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+from urllib.parse import quote
 
-import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.fs as pa_fs
+import pyarrow.parquet as pq
 
+from gordo_client.line_protocol import encode_points
 from gordo_client.schemas import Machine
 from gordo_client.utils import influx_client_from_uri
 from gordo_core.sensor_tag import extract_tag_name
 
 logger = logging.getLogger(__name__)
 
+# Data a forwarder failed to write, machine=Machine (None for sensor data),
+# start=datetime, end=datetime (dates of the data, None if there was none) and error=str
+ForwardingFailure = namedtuple("ForwardingFailure", "machine start end error")
+
 
 class PredictionForwarder(metaclass=abc.ABCMeta):
     """
@@ -40,6 +54,141 @@ class PredictionForwarder(metaclass=abc.ABCMeta):
         resampled_sensor_data: pd.DataFrame = None,
     ): ...
 
+    @property
+    def deferred(self) -> bool:
+        """
+        Whether the data may still be written after the call returned, until :meth:`flush`.
+        """
+        return False
+
+    def flush(self) -> List[ForwardingFailure]:
+        """
+        Write the data the calls left to write.
+
+        Returns
+        -------
+            The failures to write it since the previous flush.
+        """
+        return []
+
+
+class QueuedForwarder(PredictionForwarder):
+    """
+    Forwarder passing the data to another forwarder on background threads, so that the
+    workers sending the prediction requests don't wait for it.
+
+    Calls return as soon as the data is queued, unless ``max_queued`` calls are already
+    waiting, in which case they block until there is room: prediction requests are then
+    slowed down to the pace of the forwarding, rather than piling up data in memory.
+
+    The failures of the forwarder are collected, and returned by :meth:`flush`, along with the
+    ones of flushing the forwarder itself.
+
+    Examples
+    --------
+    >>> forwarded = []
+    >>> forwarder = QueuedForwarder(lambda **kwargs: forwarded.append(kwargs["predictions"]), n_workers=2)
+    >>> forwarder(predictions=pd.DataFrame({"model-output": [1.0]}))
+    >>> forwarder.close()
+    []
+    >>> len(forwarded)
+    1
+    """
+
+    def __init__(self, forwarder: PredictionForwarder, n_workers: int = 1, max_queued: int = 64):
+        """
+        Parameters
+        ----------
+        forwarder
+            The forwarder to pass the data to.
+        n_workers
+            Number of threads calling ``forwarder`` at the same time.
+        max_queued
+            The maximum number of calls waiting for a thread.
+        """
+        if n_workers < 1:
+            raise ValueError("n_workers must be greater than 0")
+        self.forwarder = forwarder
+        self.n_workers = n_workers
+        self._queue: "queue.Queue[Optional[dict]]" = queue.Queue(maxsize=max_queued)
+        self._lock = threading.Lock()
+        self._workers: List[threading.Thread] = []
+        self._failures: List[ForwardingFailure] = []
+
+    def __call__(
+        self,
+        *,
+        predictions: pd.DataFrame = None,
+        machine: Optional[Machine] = None,
+        metadata: dict = dict(),
+        resampled_sensor_data: pd.DataFrame = None,
+    ):
+        with self._lock:
+            while len(self._workers) < self.n_workers:
+                worker = threading.Thread(target=self._work, name="gordo-client-forwarder", daemon=True)
+                worker.start()
+                self._workers.append(worker)
+        self._queue.put(
+            dict(
+                predictions=predictions,
+                machine=machine,
+                metadata=metadata,
+                resampled_sensor_data=resampled_sensor_data,
+            )
+        )
+
+    @property
+    def deferred(self) -> bool:
+        return True
+
+    def flush(self) -> List[ForwardingFailure]:
+        """
+        Wait until all the queued data was forwarded, then flush the forwarder.
+
+        Returns
+        -------
+            The failures since the previous flush.
+        """
+        self._queue.join()
+        with self._lock:
+            failures, self._failures = self._failures, []
+        if isinstance(self.forwarder, PredictionForwarder):
+            failures.extend(self.forwarder.flush())
+        return failures
+
+    def close(self) -> List[ForwardingFailure]:
+        """
+        :meth:`flush`, then stop the threads, which are started again by the next call.
+        """
+        failures = self.flush()
+        with self._lock:
+            workers, self._workers = self._workers, []
+        for _ in workers:
+            self._queue.put(None)
+        for worker in workers:
+            worker.join()
+        return failures
+
+    def _work(self):
+        while True:
+            kwargs = self._queue.get()
+            try:
+                if kwargs is None:
+                    return
+                self.forwarder(**kwargs)
+            except Exception as exc:
+                machine = kwargs["machine"]
+                data = kwargs["predictions"] if kwargs["predictions"] is not None else kwargs["resampled_sensor_data"]
+                start, end = (data.index.min(), data.index.max()) if data is not None and len(data) else (None, None)
+                logger.error(
+                    f"Failed to forward the data of target '{machine.name if machine else None}' "
+                    f"for dates {start} -> {end}. Error: {exc}"
+                )
+                with self._lock:
+                    self._failures.append(ForwardingFailure(machine=machine, start=start, end=end, error=str(exc)))
+            finally:
+                self._queue.task_done()
+
 
 class ForwardPredictionsIntoInflux(PredictionForwarder):
     """
@@ -47,6 +196,14 @@ class ForwardPredictionsIntoInflux(PredictionForwarder):
 
     After instantiation, it is a coroutine which accepts prediction dataframes
     which it will pass onto Influx
+
+    With ``coalesce_bytes``, the points of the calls, from any machine, are buffered and
+    written together once there are ``coalesce_bytes`` of them or the oldest ones were buffered
+    ``coalesce_seconds`` ago. :meth:`flush` must then be called to write the remaining points,
+    and returns the failures to write them.
+
+    With ``write_workers``, the requests of a call are sent at the same time over that many
+    connections, each retried on its own.
     """
 
     def __init__(
@@ -55,6 +212,10 @@ class ForwardPredictionsIntoInflux(PredictionForwarder):
         destination_influx_api_key: Optional[str] = None,
         destination_influx_recreate: bool = False,
         n_retries=5,
+        points_per_request: int = 50000,
+        coalesce_bytes: Optional[int] = None,
+        coalesce_seconds: float = 1.0,
+        write_workers: int = 1,
     ):
         """
         Create an instance which, when called, is a coroutine capable of
@@ -69,19 +230,50 @@ class ForwardPredictionsIntoInflux(PredictionForwarder):
             API key if needed for destination db
         destination_influx_recreate
             Drop the database before filling it with data?
+        points_per_request
+            The maximum number of points posted to Influx per request, when not coalescing.
+        coalesce_bytes
+            Buffer the points of the calls until there are this many bytes of them, rather than
+            writing them right away.
+        coalesce_seconds
+            The maximum number of seconds points are buffered for, with ``coalesce_bytes``.
+        write_workers
+            Number of requests to Influx sent at the same time by a call.
         """
+        if write_workers < 1:
+            raise ValueError("write_workers must be greater than 0")
         # Create df client if provided
         self.n_retries = n_retries
+        self.points_per_request = points_per_request
+        self.coalesce_bytes = coalesce_bytes
+        self.coalesce_seconds = coalesce_seconds
+        self._lock = threading.Lock()
+        self._buffer: List[bytes] = []
+        self._buffered_bytes = 0
+        self._buffered_since: Optional[float] = None
+        # The data with points in the buffer, by machine name (None for sensor data)
+        self._buffered_data: Dict[Optional[str], ForwardingFailure] = {}
+        self._failures: List[ForwardingFailure] = []
+        # The tag list of each machine, with the names of its tags
+        self._machine_tag_names: Dict[str, Tuple[list, List[str]]] = {}
         self.dataframe_client = (
             influx_client_from_uri(
                 destination_influx_uri,
                 api_key=destination_influx_api_key,
                 recreate=destination_influx_recreate,
                 dataframe_client=True,
+                # A connection per writer, and for the calls of other threads
+                pool_size=max(10, write_workers),
             )
             if destination_influx_uri
             else None
         )
+        self.write_workers = write_workers
+        self._executor = (
+            ThreadPoolExecutor(max_workers=write_workers, thread_name_prefix="gordo-client-influx")
+            if write_workers > 1
+            else None
+        )
 
     def __call__(
         self,
@@ -91,12 +283,7 @@ class ForwardPredictionsIntoInflux(PredictionForwarder):
         metadata: dict = dict(),
         resampled_sensor_data: pd.DataFrame = None,
     ):
-        # clean predictions for possible inf, nan, which influx can't handle
-        if predictions is not None:
-            predictions = self._clean_df(predictions)
-        if resampled_sensor_data is not None:
-            resampled_sensor_data = self._clean_df(resampled_sensor_data)
-
+        # The inf and nan values, which influx can't handle, are skipped by encode_points
         if resampled_sensor_data is None and predictions is None:
             raise ValueError("Argument `resampled_sensor_data` or `predictions` must be passed")
         if predictions is not None:
@@ -106,24 +293,14 @@ class ForwardPredictionsIntoInflux(PredictionForwarder):
         if resampled_sensor_data is not None:
             self.send_sensor_data(resampled_sensor_data)
 
-    @staticmethod
-    def _clean_df(df: pd.DataFrame) -> pd.DataFrame:
-        """
-        Ensure dataframe doesn't have inf / nan values which influx can't handle
-
-        Parameters
-        ----------
-        df
-        """
-        return df.replace([np.inf, -np.inf], np.nan).dropna()
-
     def forward_predictions(self, predictions: pd.DataFrame, machine: Machine, metadata: dict = dict()):
         """
         Takes a multi-layed column dataframe and write points to Influx where
         each top level name is treated as the measurement name.
 
-        How the data is written via InfluxDB ``DataFrameClient`` in this method
-        determines the schema of the database.
+        How the data is written in this method determines the schema of the database:
+        a point per value, tagged with the machine, the metadata and the name of its column
+        as ``sensor_name``, with the value as its ``sensor_value`` field.
 
         Parameters
         ----------
@@ -136,6 +313,8 @@ class ForwardPredictionsIntoInflux(PredictionForwarder):
         tags = {"machine": f"{machine.name}"}
         tags.update(metadata)
 
+        tag_names = self._tag_names(machine)
+
         # The measurements to be posted to Influx
         top_lvl_names = predictions.columns.get_level_values(0).unique()
 
@@ -152,33 +331,151 @@ class ForwardPredictionsIntoInflux(PredictionForwarder):
             if isinstance(sub_df, pd.Series):
                 sub_df = pd.DataFrame(sub_df)
 
-            # Set the sub df's column names equal to the name of the tags if
-            # they match the length of the tag list.
-            tag_list = [extract_tag_name(tag) for tag in machine.dataset["tag_list"]]
-            if len(sub_df.columns) == len(tag_list):
-                sub_df.columns = tag_list
-                # sub_df.columns = [tag['name'] for tag in machine.dataset['tag_list']]
-            self._write_to_influx_with_retries(sub_df, top_lvl_name, tags)
+            # Name the sub df's columns after the tags if they match the length
+            # of the tag list.
+            columns = tag_names if len(sub_df.columns) == len(tag_names) else None
+            self._write_to_influx_with_retries(sub_df, top_lvl_name, tags, machine=machine, columns=columns)
 
-    def _write_to_influx_with_retries(self, df, measurement, tags: Dict[str, Any] = {}):
+    def _tag_names(self, machine: Machine) -> List[str]:
+        """
+        Names of the tags of the machine, computed once for its tag list.
+        """
+        tag_list = machine.dataset["tag_list"]
+        with self._lock:
+            cached = self._machine_tag_names.get(machine.name)
+        # The tag list of a machine is a new object when it is fetched again, for another revision
+        if cached is not None and cached[0] is tag_list:
+            return cached[1]
+        tag_names = [extract_tag_name(tag) for tag in tag_list]
+        with self._lock:
+            self._machine_tag_names[machine.name] = (tag_list, tag_names)
+        return tag_names
+
+    @property
+    def deferred(self) -> bool:
+        return self.coalesce_bytes is not None
+
+    def flush(self) -> List[ForwardingFailure]:
+        """
+        Write the buffered points.
+
+        Returns
+        -------
+            The data whose points couldn't be written since the previous flush.
+        """
+        self._write_buffer(self._take_buffer())
+        with self._lock:
+            failures, self._failures = self._failures, []
+        return failures
+
+    def _write_to_influx_with_retries(
+        self,
+        df,
+        measurement,
+        tags: Dict[str, Any] = {},
+        machine: Optional[Machine] = None,
+        columns: Optional[Sequence[Any]] = None,
+    ):
         """
         Write data to Influx with retries and exponential backof. Will sleep
         exponentially longer between each retry, starting at 8 seconds, capped at 5 min.
+
+        The points are encoded by :func:`gordo_client.line_protocol.encode_points` and posted
+        in bodies of ``points_per_request`` points by :meth:`_post_all`, or buffered with
+        ``coalesce_bytes``.
         """
         logger.info(f"Writing {len(df)} points to Influx for measurement: {measurement}")
 
-        df = ForwardPredictionsIntoInflux._stack_to_name_value_columns(df)
+        bodies = encode_points(df, measurement, tags=tags, columns=columns, batch_size=self.points_per_request)
+        if self.coalesce_bytes is None:
+            self._post_all(bodies)
+            return
+        for body in bodies:
+            self._write_buffer(self._buffer_points(body, df, machine))
+
+    def _buffer_points(
+        self, body: bytes, df: pd.DataFrame, machine: Optional[Machine]
+    ) -> Optional[Tuple[bytes, List[ForwardingFailure]]]:
+        """
+        Add the points of ``df`` to the buffer, taking the buffer if it is due to be written.
+        """
+        name = machine.name if machine is not None else None
+        with self._lock:
+            self._buffer.append(body)
+            self._buffered_bytes += len(body)
+            if self._buffered_since is None:
+                self._buffered_since = time.monotonic()
+            buffered = self._buffered_data.get(name)
+            start, end = df.index.min(), df.index.max()
+            if buffered is not None:
+                start, end = min(start, buffered.start), max(end, buffered.end)
+            self._buffered_data[name] = ForwardingFailure(machine=machine, start=start, end=end, error=None)
+            due = (
+                self.coalesce_bytes is None
+                or self._buffered_bytes >= self.coalesce_bytes
+                or time.monotonic() - self._buffered_since >= self.coalesce_seconds
+            )
+        return self._take_buffer() if due else None
+
+    def _take_buffer(self) -> Optional[Tuple[bytes, List[ForwardingFailure]]]:
+        """
+        The points of the buffer, with the data they are from, emptying it.
+        """
+        with self._lock:
+            if not self._buffer:
+                return None
+            taken = (b"".join(self._buffer), list(self._buffered_data.values()))
+            self._buffer, self._buffered_bytes, self._buffered_since, self._buffered_data = [], 0, None, {}
+        return taken
+
+    def _write_buffer(self, taken: Optional[Tuple[bytes, List[ForwardingFailure]]]):
+        """
+        Write points taken from the buffer, recording a failure for each data they are from if it fails.
+        """
+        if taken is None:
+            return
+        body, data = taken
+        try:
+            self._post_with_retries(body)
+        except Exception as exc:
+            with self._lock:
+                self._failures.extend(failure._replace(error=str(exc)) for failure in data)
+
+    def _post_all(self, bodies: Iterable[bytes]):
+        """
+        :meth:`_post_with_retries` every body, ``write_workers`` at a time.
 
+        The bodies are only encoded as the workers are ready to post them, and the first error
+        is raised once the bodies being posted are done.
+        """
+        if self._executor is None:
+            for body in bodies:
+                self._post_with_retries(body)
+            return
+        running: Set[Future] = set()
+        try:
+            for body in bodies:
+                # Keeps the next bodies ready without encoding them all up front
+                if len(running) >= 2 * self.write_workers:
+                    done, running = wait(running, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        future.result()
+                running.add(self._executor.submit(self._post_with_retries, body))
+            done, running = wait(running)
+            for future in done:
+                future.result()
+        finally:
+            for future in running:
+                future.cancel()
+            wait(running)
+
+    def _post_with_retries(self, body: bytes):
+        """
+        :meth:`_post_points` with the retries of :meth:`_write_to_influx_with_retries`.
+        """
         for current_attempt in itertools.count(start=1):
             try:
-                self.dataframe_client.write_points(
-                    dataframe=df,
-                    measurement=measurement,
-                    tags=tags,
-                    tag_columns=["sensor_name"],
-                    field_columns=["sensor_value"],
-                    batch_size=10000,
-                )
+                self._post_points(body)
             except OSError as exc:
                 # TODO Prometheus Gauge with current_attempt
                 if current_attempt <= self.n_retries:
@@ -199,6 +496,20 @@ class ForwardPredictionsIntoInflux(PredictionForwarder):
             else:
                 break
 
+    def _post_points(self, body: bytes):
+        """
+        Post a body of line protocol points to the database of the client, as ``write_points`` does.
+        """
+        client = self.dataframe_client
+        client.request(
+            url="write",
+            method="POST",
+            params={"db": client._database},
+            data=body,
+            expected_response_code=204,
+            headers={**client._headers, "Content-Type": "application/octet-stream"},
+        )
+
     def send_sensor_data(self, sensors: pd.DataFrame):
         """
         Write sensor-data to Influx
@@ -208,25 +519,176 @@ class ForwardPredictionsIntoInflux(PredictionForwarder):
         self._write_to_influx_with_retries(sensors, "resampled")
         logger.debug("Done writing resampled sensor values to Influx")
 
-    @staticmethod
-    def _stack_to_name_value_columns(df: pd.DataFrame) -> pd.DataFrame:
-        """
-        Stack a DataFrame with a range of tag columns to one with name and value columns
 
+class ForwardPredictionsIntoParquet(PredictionForwarder):
+    """
+    Forwarder appending the data to a Hive-partitioned Parquet dataset, in a local directory
+    or any filesystem of :func:`pyarrow.fs.FileSystem.from_uri`, such as ``s3://bucket/path``.
+
+    The predictions are written to ``predictions/machine=<name>/date=<YYYY-MM-DD>/`` and the
+    resampled sensor data to ``resampled/date=<YYYY-MM-DD>/``, both readable with
+    :func:`pyarrow.dataset.dataset` and ``partitioning="hive"``. The dates are in the ``time``
+    column, and the levels of the names of the other columns are joined with ``/``, such as
+    ``model-output/TRC1``. The ``metadata`` isn't written.
+
+    The data of each partition is buffered until there are ``rows_per_file`` rows of it, then
+    written to a new file, under a hidden name renamed once it is complete, so that readers never
+    see partial files. :meth:`flush` must be called to write the remaining rows, and returns the
+    failures to write them.
+
+    Examples
+    --------
+    >>> import tempfile
+    >>> import pyarrow.dataset as ds
+    >>> path = tempfile.mkdtemp()
+    >>> forwarder = ForwardPredictionsIntoParquet(path)
+    >>> predictions = pd.DataFrame(
+    ...     {"model-output": [1.0, 2.0]}, index=pd.date_range("2020-01-01", periods=2, freq="10T", tz="UTC")
+    ... )
+    >>> forwarder(predictions=predictions, machine=Machine(name="machine-1", project_name="project", model={}, dataset={}))
+    >>> forwarder.flush()
+    []
+    >>> ds.dataset(os.path.join(path, "predictions"), partitioning="hive").to_table().num_rows
+    2
+    """
+
+    def __init__(
+        self,
+        path: str,
+        rows_per_file: int = 1_000_000,
+        row_group_size: int = 100_000,
+        compression: str = "snappy",
+    ):
+        """
         Parameters
         ----------
-        df
-            Source dataframe with individual columns for tags.
+        path
+            Directory or URI of the dataset.
+        rows_per_file
+            Number of rows of a partition buffered before they are written to a file.
+        row_group_size
+            The maximum number of rows of the row groups of the files.
+        compression
+            Compression of the files, passed to :func:`pyarrow.parquet.write_table`.
+        """
+        if rows_per_file < 1 or row_group_size < 1:
+            raise ValueError("rows_per_file and row_group_size must be greater than 0")
+        self.filesystem, self.path = pa_fs.FileSystem.from_uri(path if "://" in path else os.path.abspath(path))
+        self.rows_per_file = rows_per_file
+        self.row_group_size = row_group_size
+        self.compression = compression
+        self._lock = threading.Lock()
+        # Frames waiting to be written by partition directory, with their machine (None for sensor data)
+        self._buffers: Dict[str, List[pd.DataFrame]] = {}
+        self._buffered_rows: Dict[str, int] = {}
+        self._buffered_machines: Dict[str, Optional[Machine]] = {}
+        self._failures: List[ForwardingFailure] = []
+
+    def __call__(
+        self,
+        *,
+        predictions: pd.DataFrame = None,
+        machine: Optional[Machine] = None,
+        metadata: dict = dict(),
+        resampled_sensor_data: pd.DataFrame = None,
+    ):
+        if resampled_sensor_data is None and predictions is None:
+            raise ValueError("Argument `resampled_sensor_data` or `predictions` must be passed")
+        if predictions is not None:
+            if machine is None:
+                raise ValueError("Argument `machine`must be provided if `predictions` is provided")
+            self._append(predictions, f"predictions/machine={quote(machine.name, safe='')}", machine)
+        if resampled_sensor_data is not None:
+            self._append(resampled_sensor_data, "resampled", None)
+
+    @property
+    def deferred(self) -> bool:
+        return True
+
+    def flush(self) -> List[ForwardingFailure]:
+        """
+        Write the buffered rows.
 
         Returns
         -------
-            Stacked dataframe with columns ``sensor_name`` and ``sensor_value``.
+            The data whose rows couldn't be written since the previous flush.
+        """
+        with self._lock:
+            partitions = list(self._buffers)
+        for partition in partitions:
+            self._write(partition)
+        with self._lock:
+            failures, self._failures = self._failures, []
+        return failures
+
+    def _append(self, df: pd.DataFrame, dataset: str, machine: Optional[Machine]):
+        """
+        Buffer the rows of ``df`` in the partitions of their dates, writing the partitions with
+        ``rows_per_file`` rows.
+        """
+        if df.empty:
+            return
+        df = df.set_axis(_flat_columns(df.columns), axis=1).rename_axis("time")
+        days = df.index.normalize()
+        full = []
+        for day in days.unique():
+            partition = f"{dataset}/date={day.date().isoformat()}"
+            rows = df[days == day]
+            with self._lock:
+                self._buffers.setdefault(partition, []).append(rows)
+                self._buffered_rows[partition] = self._buffered_rows.get(partition, 0) + len(rows)
+                self._buffered_machines[partition] = machine
+                if self._buffered_rows[partition] >= self.rows_per_file:
+                    full.append(partition)
+        for partition in full:
+            self._write(partition)
+
+    def _write(self, partition: str):
+        """
+        Write the buffered rows of the partition to a new file, recording a failure if it fails.
         """
-        # String column names are necessary for stacking
-        # (as opposed to integers when df created from np.ndarray)
-        df.columns = df.columns.astype(str)
+        with self._lock:
+            frames = self._buffers.pop(partition, None)
+            self._buffered_rows.pop(partition, None)
+            machine = self._buffered_machines.pop(partition, None)
+        if not frames:
+            return
+        df = pd.concat(frames) if len(frames) > 1 else frames[0]
+        directory = f"{self.path}/{partition}"
+        name = f"part-{uuid.uuid4().hex}.parquet"
+        # Hidden from the readers of the dataset until it is complete
+        tmp_path = f"{directory}/.{name}.tmp"
+        try:
+            self.filesystem.create_dir(directory, recursive=True)
+            pq.write_table(
+                pa.Table.from_pandas(df),
+                tmp_path,
+                filesystem=self.filesystem,
+                row_group_size=self.row_group_size,
+                compression=self.compression,
+            )
+            self.filesystem.move(tmp_path, f"{directory}/{name}")
+        except Exception as exc:
+            logger.error(f"Failed to write {len(df)} rows to {directory}. Error: {exc}")
+            with self._lock:
+                self._failures.append(
+                    ForwardingFailure(machine=machine, start=df.index.min(), end=df.index.max(), error=str(exc))
+                )
+            try:
+                self.filesystem.delete_file(tmp_path)
+            except (OSError, pa.ArrowException):
+                pass
+
 
-        df = df.stack().to_frame(name="sensor_value")
-        df = df.reset_index(level=1).rename(columns={"level_1": "sensor_name"})
-        df["sensor_value"].astype(float)
-        return df
+def _flat_columns(columns: pd.Index) -> List[str]:
+    """
+    Names of the columns with the levels of their names joined with ``/``, skipping empty levels.
+
+    Examples
+    --------
+    >>> _flat_columns(pd.MultiIndex.from_tuples([("model-output", "TRC1"), ("start", "")]))
+    ['model-output/TRC1', 'start']
+    """
+    if not isinstance(columns, pd.MultiIndex):
+        return [str(column) for column in columns]
+    return ["/".join(str(level) for level in column if level != "") for column in columns]
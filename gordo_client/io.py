@@ -1,7 +1,17 @@
-from typing import Optional, Union
+import json
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Any, NoReturn, Optional, Union
 
 import requests
 
+from gordo_client.dataframe import ARROW_STREAM_CONTENT_TYPE
+
+try:
+    import orjson
+except ImportError:  # Optional, installed with the "json" extra
+    orjson = None  # type: ignore
+
 
 class HttpUnprocessableEntity(Exception):
     """
@@ -27,6 +37,45 @@ class BadGordoRequest(Exception):
     """
 
 
+class PayloadTooLarge(BadGordoRequest):
+    """
+    Represents an error from an HTTP status code of ``413: Payload Too Large``.
+    """
+
+
+class UnsupportedMediaType(BadGordoRequest):
+    """
+    Represents an error from an HTTP status code of ``415: Unsupported Media Type``.
+    """
+
+
+class TooManyRequests(BadGordoRequest):
+    """
+    Represents an error from an HTTP status code of ``429: Too Many Requests``, which
+    may be retried after ``retry_after`` seconds if the server said so.
+    """
+
+    def __init__(self, msg: str, retry_after: Optional[float] = None):
+        self.retry_after = retry_after
+        super().__init__(msg)
+
+    def __reduce__(self):
+        return self.__class__, (str(self), self.retry_after)
+
+
+class ServerError(IOError):
+    """
+    Represents a ``5xx`` error, which may be retried after ``retry_after`` seconds if the server said so.
+    """
+
+    def __init__(self, msg: str, retry_after: Optional[float] = None):
+        self.retry_after = retry_after
+        super().__init__(msg)
+
+    def __reduce__(self):
+        return self.__class__, (str(self), self.retry_after)
+
+
 class BadGordoResponse(Exception):
     """
     Represents a general bad response (not json or model)
@@ -76,8 +125,16 @@ def _handle_response(resp: requests.Response, resource_name: Optional[str] = Non
         In case of a 410 from the server
     NotFound
         In case of a 404 from the server
+    PayloadTooLarge
+        In case of a 413 from the server
+    UnsupportedMediaType
+        In case of a 415 from the server
+    TooManyRequests
+        In case of a 429 from the server
     BadGordoRequest
         Any other 4xx error
+    ServerError
+        In case of a 5xx from the server
     IOError
         In case of network or IO errors
     """
@@ -85,34 +142,122 @@ def _handle_response(resp: requests.Response, resource_name: Optional[str] = Non
         if _is_model_response(resp):
             return resp.content
         elif _is_json_response(resp):
-            return resp.json()
+            return _json_loads(resp.content)
         resource_msg = f" while fetching resource: {resource_name}" if resource_name else ""
         raise BadGordoResponse(
             f"Bad gordo response found{resource_msg}.", resp.content, resp.status_code, resp.headers.get("content-type")
         )
 
+    _raise_for_status(
+        resp.status_code, resp.content, resource_name=resource_name, retry_after=resp.headers.get("Retry-After")
+    )
+
+
+def _raise_for_status(
+    status_code: int, content: bytes, resource_name: Optional[str] = None, retry_after: Optional[str] = None
+) -> NoReturn:
+    """
+    Raise the exception matching an unsuccessful HTTP ``status_code``.
+
+    Shared by the response handlers of the synchronous and the asyncio clients.
+
+    Parameters
+    ----------
+    status_code
+        HTTP status code of the response.
+    content
+        Raw body of the response, added to the error message.
+    resource_name
+        An optional name to add to error messages.
+    retry_after
+        The ``Retry-After`` header of the response, if any.
+    """
     if resource_name:
         msg = (
             f"We failed to get response while fetching resource: {resource_name}. "
-            f"Return code: {resp.status_code}. Return content: {resp.content!r}"
+            f"Return code: {status_code}. Return content: {content!r}"
         )
     else:
-        msg = f"Failed to get response: {resp.status_code}: {resp.content!r}"
+        msg = f"Failed to get response: {status_code}: {content!r}"
 
-    if resp.status_code == 422:
+    if status_code == 422:
         raise HttpUnprocessableEntity(msg)
-    elif resp.status_code == 410:
+    elif status_code == 410:
         raise ResourceGone(msg)
-    elif resp.status_code == 404:
+    elif status_code == 404:
         raise NotFound(msg)
-    elif 400 <= resp.status_code <= 499:
+    elif status_code == 413:
+        raise PayloadTooLarge(msg)
+    elif status_code == 415:
+        raise UnsupportedMediaType(msg)
+    elif status_code == 429:
+        raise TooManyRequests(msg, retry_after=parse_retry_after(retry_after))
+    elif 400 <= status_code <= 499:
         raise BadGordoRequest(msg)
+    elif 500 <= status_code <= 599:
+        raise ServerError(msg, retry_after=parse_retry_after(retry_after))
     raise IOError(msg)
 
 
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """
+    Seconds to wait according to a ``Retry-After`` header, either a number of seconds or
+    an HTTP date. None if it is missing or invalid.
+
+    Examples
+    --------
+    >>> parse_retry_after("120")
+    120.0
+    >>> parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT")
+    0.0
+    """
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+
+def _json_dumps(obj: Any) -> bytes:
+    """
+    Serialize ``obj`` to JSON, with ``orjson`` if it is installed.
+
+    NaN values are serialized as ``null`` by ``orjson``, and as ``NaN`` otherwise,
+    both of which are read back as NaN in a dataframe.
+    """
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(obj).encode()
+
+
+def _json_loads(content: Union[bytes, str]) -> Any:
+    """
+    Deserialize JSON ``content``, with ``orjson`` if it is installed.
+    """
+    if orjson is not None:
+        try:
+            return orjson.loads(content)
+        except orjson.JSONDecodeError:
+            # Such as NaN values, which orjson rejects
+            pass
+    return json.loads(content)
+
+
 def _is_json_response(response) -> bool:
     return response.headers.get("content-type") == "application/json"
 
 
 def _is_model_response(response) -> bool:
-    return response.headers.get("content-type") in ("application/x-tar", "application/octet-stream")
+    return response.headers.get("content-type") in (
+        "application/x-tar",
+        "application/octet-stream",
+        ARROW_STREAM_CONTENT_TYPE,
+    )
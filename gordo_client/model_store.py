@@ -0,0 +1,44 @@
+import os
+from typing import Optional
+from urllib.parse import quote
+
+MODEL_FILE_NAME = "model.pkl"
+
+
+class ModelStore:
+    """
+    Directory of the models downloaded from Gordo servers, by project, machine and revision.
+
+    The model of a machine doesn't change within a revision, so a model found in the store
+    is never downloaded again.
+
+    Examples
+    --------
+    >>> store = ModelStore("/var/cache/gordo-models")
+    >>> store.path("project", "machine-1", "1604861479899")
+    '/var/cache/gordo-models/project/machine-1/1604861479899/model.pkl'
+    """
+
+    def __init__(self, directory: str):
+        """
+        Parameters
+        ----------
+        directory
+            Root directory of the store, shared by the projects.
+        """
+        self.directory = directory
+
+    def path(self, project: str, machine: str, revision: str) -> str:
+        """
+        Path of the pickled model of ``machine``, whether it was downloaded or not.
+        """
+        return os.path.join(
+            self.directory, *(quote(part, safe="") for part in (project, machine, revision)), MODEL_FILE_NAME
+        )
+
+    def get(self, project: str, machine: str, revision: str) -> Optional[str]:
+        """
+        Path of the pickled model of ``machine``, None if it wasn't downloaded.
+        """
+        path = self.path(project, machine, revision)
+        return path if os.path.exists(path) else None
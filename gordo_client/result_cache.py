@@ -0,0 +1,145 @@
+import hashlib
+import logging
+import os
+import shutil
+import tempfile
+from datetime import datetime
+from typing import Iterable, Optional, Union
+from urllib.parse import quote, unquote
+
+import pandas as pd
+import pyarrow as pa
+
+logger = logging.getLogger(__name__)
+
+_SUFFIX = ".arrow"
+
+
+def input_hash(X: pd.DataFrame, y: Optional[pd.DataFrame] = None) -> str:
+    """
+    Hash of the input data of a prediction, changing with any of its values, dates or columns.
+
+    Examples
+    --------
+    >>> X = pd.DataFrame({"tag": [1.0, 2.0]}, index=pd.date_range("2020-01-01", periods=2, freq="10T"))
+    >>> input_hash(X) == input_hash(X.copy())
+    True
+    >>> input_hash(X) == input_hash(X * 2)
+    False
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    for df in (X, y):
+        if df is None:
+            digest.update(b"\x00")
+            continue
+        digest.update(repr(list(df.columns)).encode())
+        digest.update(pd.util.hash_pandas_object(df, index=True).values.tobytes())
+    return digest.hexdigest()
+
+
+class ResultCache:
+    """
+    Directory of the predictions of the data windows of the machines, by project, machine,
+    revision and window, stored as Arrow IPC streams.
+
+    The predictions of a window are only reused for the same input data, identified by
+    :func:`input_hash`, so windows whose data changed since are predicted again.
+
+    Examples
+    --------
+    >>> cache = ResultCache(tempfile.mkdtemp(), project="gordo-test")
+    >>> predictions = pd.DataFrame({"model-output": [1.0]}, index=pd.date_range("2020-01-01", periods=1))
+    >>> cache.set("machine-1", "1604861479899", "2020-01-01", "2020-01-02", "abc", predictions)
+    >>> cache.get("machine-1", "1604861479899", "2020-01-01", "2020-01-02", "abc").to_pandas().equals(predictions)
+    True
+    >>> cache.get("machine-1", "1604861479899", "2020-01-01", "2020-01-02", "changed") is None
+    True
+    """
+
+    def __init__(self, directory: str, project: str):
+        """
+        Parameters
+        ----------
+        directory
+            Directory of the cache, shared by the projects.
+        project
+            Name of the project.
+        """
+        self.path = os.path.join(directory, quote(project, safe=""))
+
+    def get(
+        self,
+        machine: str,
+        revision: str,
+        start: Union[str, datetime],
+        end: Union[str, datetime],
+        input_hash: str,
+    ) -> Optional[pa.Table]:
+        """
+        Cached predictions of the window for this input, None if there are none or they can't be read.
+        """
+        path = os.path.join(self._window_dir(machine, revision, start, end), input_hash + _SUFFIX)
+        try:
+            with pa.memory_map(path) as source:
+                return pa.ipc.open_stream(source).read_all()
+        except FileNotFoundError:
+            return None
+        except (OSError, pa.ArrowException) as exc:
+            logger.warning("Ignoring unreadable prediction results %s: %r", path, exc)
+            return None
+
+    def set(
+        self,
+        machine: str,
+        revision: str,
+        start: Union[str, datetime],
+        end: Union[str, datetime],
+        input_hash: str,
+        predictions: Union[pd.DataFrame, pa.Table],
+    ):
+        """
+        Cache the predictions of the window for this input, replacing the ones of another input.
+        """
+        table = pa.Table.from_pandas(predictions) if isinstance(predictions, pd.DataFrame) else predictions
+        window_dir = self._window_dir(machine, revision, start, end)
+        os.makedirs(window_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=window_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f, pa.ipc.new_stream(f, table.schema) as writer:
+                writer.write_table(table)
+            os.replace(tmp_path, os.path.join(window_dir, input_hash + _SUFFIX))
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+        for name in os.listdir(window_dir):
+            if name.endswith(_SUFFIX) and name != input_hash + _SUFFIX:
+                try:
+                    os.unlink(os.path.join(window_dir, name))
+                except FileNotFoundError:
+                    pass
+
+    def prune(self, revisions: Iterable[str], before: Optional[datetime] = None):
+        """
+        Drop the predictions of the revisions not in ``revisions``, and of the windows
+        ending before ``before``.
+        """
+        if not os.path.isdir(self.path):
+            return
+        keep = {quote(revision, safe="") for revision in revisions}
+        for machine in os.listdir(self.path):
+            machine_dir = os.path.join(self.path, machine)
+            for revision in os.listdir(machine_dir):
+                revision_dir = os.path.join(machine_dir, revision)
+                if revision not in keep:
+                    shutil.rmtree(revision_dir, ignore_errors=True)
+                    continue
+                if before is None:
+                    continue
+                for window in os.listdir(revision_dir):
+                    _, _, end = window.partition("--")
+                    if pd.Timestamp(unquote(end)) < pd.Timestamp(before):
+                        shutil.rmtree(os.path.join(revision_dir, window), ignore_errors=True)
+
+    def _window_dir(self, machine: str, revision: str, start: Union[str, datetime], end: Union[str, datetime]) -> str:
+        window = f"{pd.Timestamp(start).isoformat()}--{pd.Timestamp(end).isoformat()}"
+        return os.path.join(self.path, *(quote(part, safe="") for part in (machine, revision, window)))
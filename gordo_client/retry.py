@@ -0,0 +1,161 @@
+import random
+import threading
+from collections import deque
+from time import monotonic
+from typing import Deque, Dict, Hashable, Optional
+
+
+def backoff_delay(attempt: int, retry_after: Optional[float] = None, max_delay: float = 300.0) -> float:
+    """
+    Seconds to wait before retrying a request which failed ``attempt`` times.
+
+    The delay is drawn uniformly up to an exponential bound ("full jitter"), so the retries
+    of requests which failed together are spread out rather than hitting the server again
+    at the same moment. A ``Retry-After`` of the server is waited for at least.
+
+    Examples
+    --------
+    >>> 0 <= backoff_delay(1) <= 8
+    True
+    >>> backoff_delay(1, retry_after=120) >= 120
+    True
+    """
+    bound = min(2 ** (attempt + 2), max_delay)
+    delay = random.uniform(0, bound)
+    if retry_after is not None:
+        delay = max(delay, retry_after)
+    return delay
+
+
+class RetryBudget:
+    """
+    Limits the retries to a share of the requests sent recently, shared by all the machines.
+
+    When a backend fails, the retries of all its requests would otherwise multiply the load on
+    the server right when it can least handle it.
+
+    Examples
+    --------
+    >>> budget = RetryBudget(ratio=0.5, min_retries=1)
+    >>> budget.record_request()
+    >>> budget.record_request()
+    >>> [budget.try_acquire() for _ in range(3)]
+    [True, True, False]
+    """
+
+    def __init__(self, ratio: float = 0.2, min_retries: int = 10, window: float = 60.0):
+        """
+        Parameters
+        ----------
+        ratio
+            The maximum number of retries per request sent within ``window``.
+        min_retries
+            Retries allowed within ``window`` on top of ``ratio``, so that a client sending few
+            requests can still retry them.
+        window
+            Seconds the requests and retries are counted for.
+        """
+        if ratio < 0:
+            raise ValueError("ratio must be positive")
+        self.ratio = ratio
+        self.min_retries = min_retries
+        self.window = window
+        self._lock = threading.Lock()
+        self._requests: Deque[float] = deque()
+        self._retries: Deque[float] = deque()
+
+    def record_request(self):
+        """
+        Record a request sent, including retries.
+        """
+        with self._lock:
+            self._requests.append(monotonic())
+
+    def try_acquire(self) -> bool:
+        """
+        Whether a request may be retried, counting the retry if it may.
+        """
+        with self._lock:
+            now = monotonic()
+            for times in (self._requests, self._retries):
+                while times and times[0] < now - self.window:
+                    times.popleft()
+            if len(self._retries) >= self.min_retries + self.ratio * len(self._requests):
+                return False
+            self._retries.append(now)
+            return True
+
+
+class CircuitBreaker:
+    """
+    Stops sending requests for a key, such as a machine, after ``failure_threshold`` consecutive
+    failures, until ``reset_timeout`` seconds have passed.
+
+    Then a single trial request is let through: the circuit closes again if it succeeds,
+    and stays open for another ``reset_timeout`` if it fails.
+
+    Examples
+    --------
+    >>> breaker = CircuitBreaker(failure_threshold=2, reset_timeout=30)
+    >>> breaker.record_failure("machine-1")
+    >>> breaker.wait_time("machine-1")
+    0.0
+    >>> breaker.record_failure("machine-1")
+    >>> breaker.wait_time("machine-1") > 29
+    True
+    >>> breaker.wait_time("machine-2")
+    0.0
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        """
+        Parameters
+        ----------
+        failure_threshold
+            Number of consecutive failures opening the circuit.
+        reset_timeout
+            Seconds the circuit stays open before a trial request is let through.
+        """
+        if failure_threshold < 1:
+            raise ValueError("failure_threshold must be greater than 0")
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._failures: Dict[Hashable, int] = {}
+        # Time the circuit of a key lets a trial request through, for the open circuits
+        self._open_until: Dict[Hashable, float] = {}
+
+    def wait_time(self, key: Hashable) -> float:
+        """
+        Seconds to wait before sending a request for ``key``, 0 if it may be sent now.
+
+        Once the circuit has been open for ``reset_timeout``, the first caller gets 0 for
+        its trial request, and the others wait for another ``reset_timeout``.
+        """
+        with self._lock:
+            open_until = self._open_until.get(key)
+            if open_until is None:
+                return 0.0
+            now = monotonic()
+            if now < open_until:
+                return open_until - now
+            self._open_until[key] = now + self.reset_timeout
+            return 0.0
+
+    def is_open(self, key: Hashable) -> bool:
+        """
+        Whether requests for ``key`` are being held back.
+        """
+        with self._lock:
+            return key in self._open_until
+
+    def record_success(self, key: Hashable):
+        with self._lock:
+            self._failures.pop(key, None)
+            self._open_until.pop(key, None)
+
+    def record_failure(self, key: Hashable):
+        with self._lock:
+            self._failures[key] = self._failures.get(key, 0) + 1
+            if self._failures[key] >= self.failure_threshold:
+                self._open_until[key] = monotonic() + self.reset_timeout
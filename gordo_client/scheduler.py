@@ -0,0 +1,244 @@
+import heapq
+import itertools
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import CancelledError, Future, ThreadPoolExecutor
+from time import monotonic, sleep
+from typing import Any, Callable, Deque, Dict, Hashable, List, Optional, Set, Tuple
+
+_Task = Tuple[Future, Callable[..., Any], tuple, dict]
+
+
+class RetryLater(Exception):
+    """
+    Raised by a task to be run again after ``delay`` seconds, with its keyword arguments
+    updated with ``kwargs``.
+
+    The task doesn't hold a worker while it waits, and its future is only resolved by its
+    last run.
+    """
+
+    def __init__(self, delay: float, **kwargs):
+        self.delay = delay
+        self.kwargs = kwargs
+        super().__init__(f"Retry in {delay:.1f} seconds")
+
+
+def run_now(fn: Callable[..., Any], *args, **kwargs) -> Any:
+    """
+    Run ``fn(*args, **kwargs)`` in the current thread, sleeping through the retries it asks
+    for with :class:`RetryLater`.
+    """
+    while True:
+        try:
+            return fn(*args, **kwargs)
+        except RetryLater as retry:
+            sleep(retry.delay)
+            kwargs = {**kwargs, **retry.kwargs}
+
+
+class Scheduler:
+    """
+    Runs the tasks of several groups, such as machines, on one pool of threads.
+
+    At most ``max_workers`` tasks run at a given time, whatever their group. Pending tasks
+    are queued per group and started round-robin over the groups, so a group with many tasks
+    can't starve the others. Optionally, at most ``max_per_group`` tasks of the same group
+    run at a given time, leaving the remaining workers to the other groups.
+
+    A task raising :class:`RetryLater` is put back in the queue of its group once its delay
+    has passed, ahead of the other tasks of the group.
+
+    Examples
+    --------
+    >>> scheduler = Scheduler(max_workers=2)
+    >>> future = scheduler.submit("machine-1", sum, [1, 2, 3])
+    >>> future.result()
+    6
+    >>> scheduler.shutdown()
+    """
+
+    def __init__(self, max_workers: int, max_per_group: Optional[int] = None):
+        """
+        Parameters
+        ----------
+        max_workers
+            The maximum number of tasks running at a given time.
+        max_per_group
+            The maximum number of tasks of the same group running at a given time.
+            Only limited by ``max_workers`` if None.
+        """
+        if max_workers < 1:
+            raise ValueError("max_workers must be greater than 0")
+        if max_per_group is not None and max_per_group < 1:
+            raise ValueError("max_per_group must be greater than 0")
+        self.max_workers = max_workers
+        self.max_per_group = max_per_group
+
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="gordo-client")
+        self._lock = threading.Lock()
+        self._queues: "OrderedDict[Hashable, Deque[_Task]]" = OrderedDict()
+        self._running: Dict[Hashable, int] = {}
+        self._n_running = 0
+        # Tasks waiting to be retried, by due time, and the futures of the tasks being retried
+        self._delayed: List[Tuple[float, int, Hashable, _Task]] = []
+        self._retrying: Set[Future] = set()
+        self._sequence = itertools.count()
+        self._delayed_changed = threading.Condition(self._lock)
+        self._delayed_thread: Optional[threading.Thread] = None
+        self._closed = False
+
+    @property
+    def n_running(self) -> int:
+        """Number of tasks currently running."""
+        return self._n_running
+
+    @property
+    def n_pending(self) -> int:
+        """Number of tasks waiting for a worker."""
+        with self._lock:
+            return sum(len(queue) for queue in self._queues.values())
+
+    @property
+    def n_delayed(self) -> int:
+        """Number of tasks waiting for the delay of their retry to pass."""
+        with self._lock:
+            return len(self._delayed)
+
+    def submit(self, group: Hashable, fn: Callable[..., Any], *args, **kwargs) -> Future:
+        """
+        Schedule ``fn(*args, **kwargs)`` as a task of ``group``.
+
+        Returns
+        -------
+            Future of the result, which may be cancelled while the task is pending.
+        """
+        future: Future = Future()
+        with self._lock:
+            self._queues.setdefault(group, deque()).append((future, fn, args, kwargs))
+        self._dispatch()
+        return future
+
+    def cancel(self, future: Future) -> bool:
+        """
+        Cancel a task which is pending or waiting for its retry, like :meth:`concurrent.futures.Future.cancel`.
+
+        The future of a task waiting for its retry gets a :class:`concurrent.futures.CancelledError`.
+
+        Returns
+        -------
+            False if the task is running or done.
+        """
+        if future.cancel():
+            return True
+        with self._lock:
+            if future not in self._retrying:
+                return False
+            self._retrying.discard(future)
+        future.set_exception(CancelledError())
+        return True
+
+    def shutdown(self, wait: bool = True):
+        """
+        Cancel the pending tasks and the tasks waiting for their retry, and stop the workers
+        once the running tasks are done.
+        """
+        with self._lock:
+            queues, self._queues = self._queues, OrderedDict()
+            retrying, self._retrying = self._retrying, set()
+            self._delayed = []
+            self._closed = True
+            self._delayed_changed.notify_all()
+        for queue in queues.values():
+            for future, *_ in queue:
+                future.cancel()
+        for future in retrying:
+            future.set_exception(CancelledError())
+        self._executor.shutdown(wait=wait)
+
+    def _dispatch(self):
+        with self._lock:
+            while self._n_running < self.max_workers:
+                next_task = self._next_task()
+                if next_task is None:
+                    break
+                group, task = next_task
+                self._n_running += 1
+                self._running[group] = self._running.get(group, 0) + 1
+                self._executor.submit(self._run, group, *task)
+
+    def _next_task(self) -> Optional[Tuple[Hashable, _Task]]:
+        """
+        Pop the next task to run, from the first group in round-robin order which is below its limit.
+
+        Must be called holding the lock.
+        """
+        for group in list(self._queues):
+            queue = self._queues[group]
+            # Cancelled tasks, or tasks cancelled while waiting for their retry
+            while queue and queue[0][0].done():
+                queue.popleft()
+            if not queue:
+                del self._queues[group]
+                continue
+            if self.max_per_group is not None and self._running.get(group, 0) >= self.max_per_group:
+                continue
+            task = queue.popleft()
+            # The group has been served, its next task goes after the ones of the other groups
+            self._queues.move_to_end(group)
+            return group, task
+        return None
+
+    def _run(self, group: Hashable, future: Future, fn: Callable[..., Any], args: tuple, kwargs: dict):
+        try:
+            with self._lock:
+                # The future of a retried task is already running
+                retried = future in self._retrying
+                self._retrying.discard(future)
+            # Skipping the tasks cancelled while waiting for their retry, which are done already
+            if retried or ((future.cancelled() or not future.done()) and future.set_running_or_notify_cancel()):
+                try:
+                    result = fn(*args, **kwargs)
+                except RetryLater as retry:
+                    self._retry_later(retry.delay, group, (future, fn, args, {**kwargs, **retry.kwargs}))
+                except BaseException as exc:
+                    future.set_exception(exc)
+                else:
+                    future.set_result(result)
+        finally:
+            with self._lock:
+                self._n_running -= 1
+                self._running[group] -= 1
+                if not self._running[group]:
+                    del self._running[group]
+            self._dispatch()
+
+    def _retry_later(self, delay: float, group: Hashable, task: _Task):
+        with self._lock:
+            if self._closed:
+                task[0].set_exception(CancelledError())
+                return
+            self._retrying.add(task[0])
+            heapq.heappush(self._delayed, (monotonic() + delay, next(self._sequence), group, task))
+            if self._delayed_thread is None:
+                self._delayed_thread = threading.Thread(
+                    target=self._queue_delayed, name="gordo-client-retries", daemon=True
+                )
+                self._delayed_thread.start()
+            self._delayed_changed.notify()
+
+    def _queue_delayed(self):
+        """
+        Put the tasks whose delay has passed back in the queues of their group, until shutdown.
+        """
+        while True:
+            with self._delayed_changed:
+                while not self._closed and not (self._delayed and self._delayed[0][0] <= monotonic()):
+                    self._delayed_changed.wait(self._delayed[0][0] - monotonic() if self._delayed else None)
+                if self._closed:
+                    return
+                while self._delayed and self._delayed[0][0] <= monotonic():
+                    _, _, group, task = heapq.heappop(self._delayed)
+                    if not task[0].done():
+                        self._queues.setdefault(group, deque()).appendleft(task)
+            self._dispatch()
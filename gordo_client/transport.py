@@ -0,0 +1,318 @@
+"""
+Transports of the :class:`gordo_client.client.Client` requests, mounted on its ``requests.Session``.
+
+``HTTP2Adapter`` requires the optional ``httpx`` dependency, installed with ``pip install gordo-client[http2]``.
+"""
+
+import copy
+import os
+import socket
+import ssl
+import threading
+from collections import namedtuple
+from time import monotonic
+from typing import Dict, Iterator, List, Optional, Tuple, Union
+
+import requests
+from requests.adapters import BaseAdapter, HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+from urllib3.connection import HTTPConnection
+
+try:
+    import httpx
+except ImportError:  # Optional, installed with the "http2" extra
+    httpx = None  # type: ignore
+
+# Connection reuse of a transport, requests=int (requests sent), connections=int (connections opened).
+# Every request but the first on a connection reused it, so requests - connections were reused.
+TransportStats = namedtuple("TransportStats", "requests connections")
+
+# Connection specific headers, which are not allowed in HTTP/2
+_HOP_BY_HOP_HEADERS = {"connection", "keep-alive", "proxy-connection", "transfer-encoding", "upgrade"}
+
+
+def keepalive_socket_options(idle: float) -> List[Tuple[int, int, int]]:
+    """
+    Socket options enabling TCP keep-alive probes after ``idle`` seconds without traffic,
+    on top of the default options of ``urllib3``.
+    """
+    options = HTTPConnection.default_socket_options + [(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)]
+    # Only tunable on some platforms, such as Linux
+    if hasattr(socket, "TCP_KEEPIDLE"):
+        options.append((socket.IPPROTO_TCP, socket.TCP_KEEPIDLE, max(1, int(idle))))
+    if hasattr(socket, "TCP_KEEPINTVL"):
+        options.append((socket.IPPROTO_TCP, socket.TCP_KEEPINTVL, max(1, int(idle) // 3)))
+    return options
+
+
+class PooledAdapter(HTTPAdapter):
+    """
+    ``HTTPAdapter`` keeping up to ``pool_size`` connections per host, counting the connections
+    it opens.
+
+    The default adapter of ``requests`` keeps 10 connections per host, so with more concurrent
+    requests the extra connections are closed after every request, and opened again by the next.
+    """
+
+    __attrs__ = HTTPAdapter.__attrs__ + ["pool_size", "idle_timeout", "tcp_keepalive"]
+
+    def __init__(self, pool_size: int, idle_timeout: Optional[float] = None, tcp_keepalive: Optional[float] = None):
+        """
+        Parameters
+        ----------
+        pool_size
+            The maximum number of connections kept per host, which should be the maximum
+            number of concurrent requests.
+        idle_timeout
+            Close the pooled connections when no request was sent for this many seconds,
+            rather than risking sending the next one on a connection the server is closing.
+        tcp_keepalive
+            Enable TCP keep-alive probes after this many seconds without traffic, so that
+            firewalls and load balancers don't drop the pooled connections.
+        """
+        self.pool_size = pool_size
+        self.idle_timeout = idle_timeout
+        self.tcp_keepalive = tcp_keepalive
+        self._lock = threading.Lock()
+        self._pools: set = set()
+        # Counts of the pools the pool manager dropped
+        self._dropped = TransportStats(requests=0, connections=0)
+        self._last_used: Optional[float] = None
+        super().__init__(pool_connections=pool_size, pool_maxsize=pool_size)
+
+    def init_poolmanager(self, connections, maxsize, block=False, **pool_kwargs):
+        if self.tcp_keepalive is not None:
+            pool_kwargs["socket_options"] = keepalive_socket_options(self.tcp_keepalive)
+        super().init_poolmanager(connections, maxsize, block=block, **pool_kwargs)
+
+    def send(self, request, **kwargs):
+        if self.idle_timeout is not None:
+            with self._lock:
+                now = monotonic()
+                if self._last_used is not None and now - self._last_used > self.idle_timeout:
+                    self.poolmanager.clear()
+                self._last_used = now
+        return super().send(request, **kwargs)
+
+    def get_connection_with_tls_context(self, *args, **kwargs):
+        return self._track(super().get_connection_with_tls_context(*args, **kwargs))
+
+    def get_connection(self, *args, **kwargs):
+        return self._track(super().get_connection(*args, **kwargs))
+
+    def stats(self) -> TransportStats:
+        """
+        Connection reuse of the adapter since it was created.
+        """
+        with self._lock:
+            pools, dropped = list(self._pools), self._dropped
+        return TransportStats(
+            requests=dropped.requests + sum(pool.num_requests for pool in pools),
+            connections=dropped.connections + sum(pool.num_connections for pool in pools),
+        )
+
+    def __setstate__(self, state):
+        self._lock = threading.Lock()
+        self._pools = set()
+        self._dropped = TransportStats(requests=0, connections=0)
+        self._last_used = None
+        super().__setstate__(state)
+
+    def _track(self, pool):
+        with self._lock:
+            # Keep the counts of the pools the pool manager dropped, but not the pools themselves
+            pools = self.poolmanager.pools
+            live = {pools.get(key) for key in pools.keys()}
+            dropped = [tracked for tracked in self._pools if tracked not in live]
+            self._dropped = TransportStats(
+                requests=self._dropped.requests + sum(tracked.num_requests for tracked in dropped),
+                connections=self._dropped.connections + sum(tracked.num_connections for tracked in dropped),
+            )
+            self._pools.difference_update(dropped)
+            self._pools.add(pool)
+        return pool
+
+
+class HTTP2Adapter(BaseAdapter):
+    """
+    Adapter sending the requests of a ``requests.Session`` with ``httpx``, multiplexing them
+    over HTTP/2 connections when the server supports it.
+
+    Requests through proxies are not supported.
+    """
+
+    def __init__(self, pool_size: int, idle_timeout: Optional[float] = None):
+        """
+        Parameters
+        ----------
+        pool_size
+            The maximum number of connections kept open.
+        idle_timeout
+            Close the connections unused for this many seconds.
+        """
+        if httpx is None:
+            raise ImportError("HTTP/2 requires httpx, installed with 'pip install gordo-client[http2]'")
+        super().__init__()
+        self.pool_size = pool_size
+        self.idle_timeout = idle_timeout
+        self._lock = threading.Lock()
+        self._clients: Dict[Tuple, "httpx.Client"] = {}
+        self._requests = 0
+        self._connections = 0
+
+    def send(self, request, stream=False, timeout=None, verify=True, cert=None, proxies=None):
+        client = self._client(verify, cert)
+        headers = [(k, v) for k, v in request.headers.items() if k.lower() not in _HOP_BY_HOP_HEADERS]
+        httpx_request = client.build_request(
+            request.method,
+            request.url,
+            headers=headers,
+            content=request.body,
+            timeout=_httpx_timeout(timeout),
+            extensions={"trace": self._trace},
+        )
+        with self._lock:
+            self._requests += 1
+        try:
+            httpx_response = client.send(httpx_request, stream=True)
+        except httpx.TimeoutException as exc:
+            raise requests.exceptions.Timeout(exc, request=request)
+        except httpx.TransportError as exc:
+            raise requests.exceptions.ConnectionError(exc, request=request)
+
+        response = requests.Response()
+        response.status_code = httpx_response.status_code
+        response.headers = CaseInsensitiveDict(httpx_response.headers)
+        response.encoding = get_encoding_from_headers(response.headers)
+        response.reason = httpx_response.reason_phrase
+        response.url = request.url
+        response.request = request
+        response.connection = self
+        response.raw = _HttpxRaw(httpx_response)
+        if not stream:
+            # Read the content, releasing the stream
+            response.content
+        return response
+
+    def close(self):
+        with self._lock:
+            clients, self._clients = list(self._clients.values()), {}
+        for client in clients:
+            client.close()
+
+    def stats(self) -> TransportStats:
+        """
+        Connection reuse of the adapter since it was created.
+        """
+        with self._lock:
+            return TransportStats(requests=self._requests, connections=self._connections)
+
+    def _client(self, verify: Union[bool, str], cert) -> "httpx.Client":
+        key = (verify, cert if not isinstance(cert, list) else tuple(cert))
+        with self._lock:
+            client = self._clients.get(key)
+            if client is None:
+                limits = httpx.Limits(
+                    max_connections=self.pool_size,
+                    max_keepalive_connections=self.pool_size,
+                    keepalive_expiry=self.idle_timeout,
+                )
+                client = self._clients[key] = httpx.Client(
+                    http2=True, verify=_ssl_context(verify), cert=cert, limits=limits, trust_env=False
+                )
+            return client
+
+    def _trace(self, event_name: str, info: dict):
+        if event_name == "connection.connect_tcp.complete":
+            with self._lock:
+                self._connections += 1
+
+
+class _HttpxRaw:
+    """
+    Stand-in of the ``urllib3`` response read by ``requests.Response``, streaming an ``httpx`` response.
+    """
+
+    def __init__(self, response: "httpx.Response"):
+        self._response = response
+
+    def stream(self, chunk_size: Optional[int] = None, decode_content: bool = True) -> Iterator[bytes]:
+        try:
+            yield from self._response.iter_bytes(chunk_size)
+        finally:
+            self._response.close()
+
+    def read(self, amt: Optional[int] = None) -> bytes:
+        return b"".join(self.stream())
+
+    def close(self):
+        self._response.close()
+
+    def release_conn(self):
+        self._response.close()
+
+
+def _ssl_context(verify: Union[bool, str]) -> Union[bool, ssl.SSLContext]:
+    """
+    ``httpx`` verify argument of a ``requests`` one, which may be the path of a CA bundle or directory.
+    """
+    if not isinstance(verify, str):
+        return verify
+    if os.path.isdir(verify):
+        return ssl.create_default_context(capath=verify)
+    return ssl.create_default_context(cafile=verify)
+
+
+def _httpx_timeout(timeout) -> "httpx.Timeout":
+    """
+    ``httpx`` timeout of a ``requests`` timeout, either a float or a (connect, read) tuple.
+    """
+    if isinstance(timeout, tuple):
+        connect, read = timeout
+        return httpx.Timeout(None, connect=connect, read=read)
+    return httpx.Timeout(timeout)
+
+
+def worker_session(session: requests.Session) -> requests.Session:
+    """
+    Copy of ``session`` for a worker thread, sharing its adapters and so its connection pools,
+    which are thread safe unlike the rest of the session, such as its cookies.
+    """
+    worker = requests.Session()
+    for attr in ("auth", "stream", "verify", "cert", "max_redirects", "trust_env"):
+        setattr(worker, attr, getattr(session, attr))
+    worker.headers = copy.copy(session.headers)
+    worker.proxies = copy.copy(session.proxies)
+    worker.params = copy.copy(session.params)
+    worker.hooks = {event: list(hooks) for event, hooks in session.hooks.items()}
+    worker.cookies = session.cookies.copy()
+    worker.adapters.clear()
+    for prefix, adapter in session.adapters.items():
+        worker.mount(prefix, adapter)
+    return worker
+
+
+def is_default_adapter(adapter: BaseAdapter) -> bool:
+    """
+    Whether ``adapter`` is the adapter mounted by ``requests.Session``, rather than one mounted
+    by the user, such as an ``HTTPAdapter`` retrying the requests.
+    """
+    if type(adapter) is not HTTPAdapter:
+        return False
+    default = HTTPAdapter()
+    # Compared by repr, since Retry has no equality
+    return all(
+        repr(getattr(adapter, attr, None)) == repr(getattr(default, attr, None)) for attr in HTTPAdapter.__attrs__
+    )
+
+
+def transport_stats(session: requests.Session) -> TransportStats:
+    """
+    Sum of the connection reuse of the adapters of ``session`` which count it.
+    """
+    adapters = {id(adapter): adapter for adapter in session.adapters.values() if hasattr(adapter, "stats")}
+    stats = [adapter.stats() for adapter in adapters.values()]
+    return TransportStats(
+        requests=sum(stat.requests for stat in stats), connections=sum(stat.connections for stat in stats)
+    )
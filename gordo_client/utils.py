@@ -6,6 +6,10 @@ from influxdb import DataFrameClient, InfluxDBClient
 # Prediction result representation, name=str, predictions=dataframe, error_messages=List[str]
 PredictionResult = namedtuple("PredictionResult", "name predictions error_messages")
 
+# Result of a single prediction request, machine=Machine, start=datetime, end=datetime,
+# predictions=dataframe (None if the request failed), error_messages=List[str]
+BatchPredictionResult = namedtuple("BatchPredictionResult", "machine start end predictions error_messages")
+
 
 def _parse_influx_uri(uri: str) -> Tuple[str, str, str, str, str, str]:
     """
@@ -32,6 +36,7 @@ def influx_client_from_uri(
     recreate: bool = False,
     dataframe_client: bool = False,
     proxies: Dict[str, str] = {"https": "", "http": ""},
+    pool_size: int = 10,
 ) -> Union[InfluxDBClient, DataFrameClient]:
     """
     Get a ``InfluxDBClient`` or ``DataFrameClient`` from a ``SqlAlchemy`` like URI.
@@ -53,6 +58,8 @@ def influx_client_from_uri(
         Return ``DataFrameClient`` instead of a standard ``InfluxDBClient``
     proxies
         A mapping of any proxies to pass to the influx client
+    pool_size
+        Number of connections to Influx kept open, for the threads using the client at the same time
     """
     username, password, host, port, path, db_name = _parse_influx_uri(uri)
 
@@ -67,6 +74,7 @@ def influx_client_from_uri(
         path=path,
         ssl=bool(api_key),
         proxies=proxies,
+        pool_size=pool_size,
     )
     if api_key:
         client._headers[api_key_header] = api_key
@@ -12,4 +12,4 @@ if [ "$1" = "-h" ]; then
 fi
 
 echo Check with black
-poetry run black --check gordo_client tests
+poetry run black --check gordo_client tests benchmarks
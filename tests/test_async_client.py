@@ -0,0 +1,402 @@
+import asyncio
+import json
+import pickle
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from unittest.mock import patch
+from urllib.parse import urlsplit
+
+import pandas as pd
+import pyarrow as pa
+import pytest
+from pytz import UTC
+
+from gordo_client.dataframe import ARROW_STREAM_CONTENT_TYPE, dataframe_into_arrow_bytes
+from gordo_client.io import BadGordoResponse
+from gordo_client.schemas import Machine
+from gordo_client.utils import BatchPredictionResult, PredictionResult
+
+pytest.importorskip("aiohttp")
+
+from aiohttp import web  # noqa: E402
+from aiohttp.test_utils import TestServer  # noqa: E402
+
+from gordo_client.async_client import AsyncClient  # noqa: E402
+
+MACHINE_NAME = "07136c88-d39f-41f3-af31-369115a9eb3f-9999"
+
+
+def _read_response(name):
+    with open(Path(__file__).parent / "responses" / name) as fd:
+        return json.load(fd)
+
+
+def _json_response(name):
+    # Same content type as a Gordo server, without a charset parameter
+    return web.Response(body=json.dumps(_read_response(name)).encode(), content_type="application/json")
+
+
+@pytest.fixture
+def requests_log():
+    return []
+
+
+@pytest.fixture
+def gordo_app(requests_log):
+    """
+    Minimal stand-in for the routes of a Gordo server
+    """
+
+    async def log_request(request, handler):
+        requests_log.append((request.method, request.path, dict(request.query)))
+        return await handler(request)
+
+    async def revisions(request):
+        return _json_response("revision.json")
+
+    async def models(request):
+        return _json_response("model.json")
+
+    async def metadata(request):
+        return _json_response("metadata.json")
+
+    async def download_model(request):
+        return web.Response(body=pickle.dumps("test"), content_type="application/octet-stream")
+
+    async def prediction(request):
+        # Compressed bodies are decompressed by aiohttp
+        body = await request.json()
+        assert "X" in body
+        return _json_response("anomaly.json")
+
+    app = web.Application(middlewares=[web.middleware(log_request)])
+    app.router.add_get("/gordo/v0/gordo-test/revisions", revisions)
+    app.router.add_get("/gordo/v0/gordo-test/models", models)
+    app.router.add_get("/gordo/v0/gordo-test/{name}/metadata", metadata)
+    app.router.add_get("/gordo/v0/gordo-test/{name}/download-model", download_model)
+    app.router.add_post("/gordo/v0/gordo-test/{name}/anomaly/prediction", prediction)
+    return app
+
+
+@pytest.fixture
+def run_with_client(gordo_app, data_provider):
+    """
+    Run ``func(client)`` against a running ``gordo_app``
+    """
+
+    def run(func, **client_kwargs):
+        async def _run():
+            server = TestServer(gordo_app)
+            await server.start_server()
+            try:
+                client_kwargs.setdefault("data_provider", data_provider)
+                async with AsyncClient(
+                    project="gordo-test", host=server.host, port=server.port, scheme="http", **client_kwargs
+                ) as client:
+                    return await func(client)
+            finally:
+                await server.close()
+
+        return asyncio.run(_run())
+
+    return run
+
+
+def test_get_revisions(run_with_client):
+    response = run_with_client(lambda client: client.get_revisions())
+    assert response == _read_response("revision.json")
+
+
+def test_get_revisions_cached(run_with_client, requests_log):
+    async def get_twice(client):
+        await client.get_revisions()
+        return await client.get_revisions()
+
+    run_with_client(get_twice)
+    assert len(requests_log) == 1
+
+
+@pytest.mark.parametrize("revision", [None, "1604861479899"])
+def test_get_machine_names(revision, run_with_client):
+    response = run_with_client(lambda client: client.get_machine_names(revision=revision))
+    assert response == [MACHINE_NAME]
+
+
+@pytest.mark.parametrize("revision, targets", [(None, None), ("1604861479899", [MACHINE_NAME])])
+def test_get_metadata(revision, targets, run_with_client):
+    response = run_with_client(lambda client: client.get_metadata(revision=revision, targets=targets))
+    assert response == {MACHINE_NAME: Machine(**_read_response("metadata.json")["metadata"]).metadata}
+
+
+def test_disk_cache(tmpdir, run_with_client, requests_log, data_provider):
+    async def run_twice(client):
+        metadata = await client.get_metadata()
+        del requests_log[:]
+        # A later run, with a new client
+        url = urlsplit(client.base_url)
+        async with AsyncClient(
+            project="gordo-test",
+            host=url.hostname,
+            port=url.port,
+            scheme="http",
+            data_provider=data_provider,
+            cache_dir=str(tmpdir),
+        ) as later_client:
+            assert await later_client.get_metadata() == metadata
+
+    run_with_client(run_twice, cache_dir=str(tmpdir))
+    assert [path for _, path, _ in requests_log] == ["/gordo/v0/gordo-test/revisions"]
+
+
+def test_download_model(run_with_client):
+    response = run_with_client(lambda client: client.download_model(targets=[MACHINE_NAME, "other-machine"]))
+    assert response == {MACHINE_NAME: "test", "other-machine": "test"}
+
+
+@pytest.mark.parametrize("revision", [None, "1604861479899"])
+def test_download_model_revision(revision, run_with_client, requests_log):
+    response = run_with_client(lambda client: client.download_model(revision=revision, targets=[MACHINE_NAME]))
+
+    assert response == {MACHINE_NAME: "test"}
+    # The latest revision by default
+    downloads = [query for _, path, query in requests_log if path.endswith("/download-model")]
+    assert downloads == [{"revision": revision or _read_response("revision.json")["latest"]}]
+
+
+def test_bad_gordo_response(gordo_app, run_with_client):
+    async def sign_in(request):
+        return web.Response(text="<title>Sign in to your account</title>", content_type="text/html")
+
+    gordo_app.router.add_get("/gordo/v0/gordo-test/{name}/unknown", sign_in)
+
+    async def get_unknown(client):
+        return await client._get(f"{client.server_endpoint}/machine/unknown", resource_name="Unknown")
+
+    with pytest.raises(BadGordoResponse) as exc:
+        run_with_client(get_unknown)
+    assert exc.value.content == b"<title>Sign in to your account</title>"
+
+
+def test_predict_single_machine(run_with_client, machine, requests_log):
+    end = datetime.now(tz=UTC)
+    start = end - timedelta(days=7)
+
+    response = run_with_client(
+        lambda client: client.predict_single_machine(start=start, end=end, revision="1604861479899", machine=machine),
+        batch_size=100,
+    )
+
+    assert isinstance(response, PredictionResult)
+    assert response.error_messages == []
+    assert not response.predictions.empty
+    posts = [request for request in requests_log if request[0] == "POST"]
+    assert len(posts) > 1
+    assert all(query == {"format": "json", "revision": "1604861479899"} for _, _, query in posts)
+
+
+def test_predict_request_compression(run_with_client, machine):
+    end = datetime.now(tz=UTC)
+    start = end - timedelta(days=1)
+
+    async def predict(client):
+        result = await client.predict_single_machine(start=start, end=end, revision="1604861479899", machine=machine)
+        return result, client.request_compression
+
+    response, request_compression = run_with_client(predict, request_compression="gzip", compression_min_size=0)
+
+    assert response.error_messages == []
+    # Not disabled by a rejection of the server
+    assert request_compression == "gzip"
+
+
+def test_predict_request_compression_unsupported(gordo_app, run_with_client, machine):
+    encodings = []
+
+    async def unsupported(request):
+        encodings.append(request.headers.get("Content-Encoding"))
+        return web.Response(status=415, text="Unsupported Media Type")
+
+    gordo_app.router.add_post("/gordo/v0/gordo-test/{name}/prediction", unsupported)
+    end = datetime.now(tz=UTC)
+    start = end - timedelta(days=1)
+
+    async def predict(client):
+        client.prediction_path = "/prediction"
+        response = await client.predict_single_machine(start=start, end=end, revision="1604861479899", machine=machine)
+        return response, client._rejected_features
+
+    response, rejected_features = run_with_client(predict, request_compression="gzip", compression_min_size=0)
+
+    assert "Failed with bad request" in response.error_messages[0]
+    # Sent once more uncompressed, which didn't help, so compression is kept for the others
+    assert encodings == ["gzip", None]
+    assert rejected_features == set()
+
+
+def test_predict_failure_is_reported(gordo_app, run_with_client, machine):
+    async def bad_request(request):
+        return web.Response(status=400, text="bad request")
+
+    gordo_app.router.add_post("/gordo/v0/gordo-test/{name}/prediction", bad_request)
+    end = datetime.now(tz=UTC)
+    start = end - timedelta(days=1)
+    machine = machine.copy(update={"name": "bad-machine"})
+
+    async def predict(client):
+        client.prediction_path = "/prediction"
+        return await client.predict_single_machine(start=start, end=end, revision="1604861479899", machine=machine)
+
+    response = run_with_client(predict)
+
+    assert response.predictions.empty
+    assert len(response.error_messages) == 1
+    assert "Failed with bad request" in response.error_messages[0]
+
+
+def test_predict_retry_after(gordo_app, run_with_client, machine):
+    statuses = [429, 200]
+
+    async def busy(request):
+        if statuses.pop(0) == 429:
+            return web.Response(status=429, text="busy", headers={"Retry-After": "0"})
+        return _json_response("anomaly.json")
+
+    gordo_app.router.add_post("/gordo/v0/gordo-test/{name}/prediction", busy)
+    end = datetime.now(tz=UTC)
+    start = end - timedelta(days=1)
+
+    async def predict(client):
+        client.prediction_path = "/prediction"
+        return await client.predict_single_machine(start=start, end=end, revision="1604861479899", machine=machine)
+
+    with patch("gordo_client.async_client.backoff_delay", return_value=0) as backoff_delay:
+        response = run_with_client(predict, n_retries=1)
+
+    assert response.error_messages == []
+    backoff_delay.assert_called_once_with(1, 0.0)
+
+
+@pytest.mark.parametrize("circuit_breaker_max_wait", [0, 60])
+def test_predict_circuit_breaker(circuit_breaker_max_wait, run_with_client, machine, requests_log):
+    end = datetime.now(tz=UTC)
+    start = end - timedelta(days=1)
+
+    async def predict(client):
+        client.circuit_breaker.record_failure(machine.name)
+        return await client.predict_single_machine(start=start, end=end, revision="1604861479899", machine=machine)
+
+    response = run_with_client(
+        predict,
+        n_retries=0,
+        circuit_breaker_threshold=1,
+        circuit_breaker_reset=0.2,
+        circuit_breaker_max_wait=circuit_breaker_max_wait,
+    )
+
+    posts = [request for request in requests_log if request[0] == "POST"]
+    if circuit_breaker_max_wait:
+        # Held back until the trial request, without using up the attempts of the batches
+        assert response.error_messages == []
+        assert posts
+    else:
+        assert "Circuit breaker open" in response.error_messages[0]
+        assert posts == []
+
+
+def test_predict_iter(run_with_client, machine, requests_log):
+    end = datetime.now(tz=UTC)
+    start = end - timedelta(days=7)
+
+    async def predict_iter(client):
+        async def get_machines(revision=None, machine_names=None):
+            return [machine]
+
+        client._get_machines = get_machines
+        return [batch async for batch in client.predict_iter(start=start, end=end, revision="1604861479899")]
+
+    batches = run_with_client(predict_iter, batch_size=100, parallelism=2)
+
+    assert len(batches) == len([request for request in requests_log if request[0] == "POST"])
+    for batch in batches:
+        assert isinstance(batch, BatchPredictionResult)
+        assert batch.machine == machine
+        assert batch.predictions is not None
+        assert batch.error_messages == []
+
+
+def test_predict_bounds_machines(run_with_client, machine, requests_log):
+    end = datetime.now(tz=UTC)
+    start = end - timedelta(days=1)
+    machines = [machine.copy(update={"name": f"machine-{i}"}) for i in range(4)]
+    fetching = []
+    max_fetching = 0
+
+    async def predict(client):
+        async def get_machines(revision=None, machine_names=None):
+            return machines
+
+        def raw_data(*args, **kwargs):
+            nonlocal max_fetching
+            fetching.append(1)
+            max_fetching = max(max_fetching, len(fetching))
+            try:
+                time.sleep(0.05)
+                return AsyncClient._raw_data(client, *args, **kwargs)
+            finally:
+                fetching.pop()
+
+        client._get_machines = get_machines
+        client._raw_data = raw_data
+        return await client.predict(start=start, end=end, revision="1604861479899")
+
+    results = run_with_client(predict, batch_size=10, parallelism=2)
+
+    assert [name for name, _, _ in results] == [machine.name for machine in machines]
+    assert all(error_messages == [] for _, _, error_messages in results)
+    # The data of at most parallelism machines is fetched and held at a given time
+    assert max_fetching <= 2
+
+
+@pytest.mark.parametrize("server_supports_arrow", [True, False])
+def test_predict_arrow(server_supports_arrow, gordo_app, run_with_client, machine, requests_log):
+    async def prediction(request):
+        form = await request.post()
+        content = form["X"].file.read()
+        if request.query["format"] != "arrow":
+            assert content.startswith(b"PAR1")
+            return _json_response("anomaly.json")
+        if not server_supports_arrow:
+            return web.Response(status=400, text="Unknown format")
+        predictions = pd.DataFrame({"model-output": [1.0, 2.0]}, index=pd.date_range("2020-01-01", periods=2, tz=UTC))
+        return web.Response(body=dataframe_into_arrow_bytes(predictions), content_type=ARROW_STREAM_CONTENT_TYPE)
+
+    gordo_app.router.add_post("/gordo/v0/gordo-test/{name}/prediction", prediction)
+    end = datetime.now(tz=UTC)
+    start = end - timedelta(days=1)
+
+    async def predict(client):
+        client.prediction_path = "/prediction"
+        response = await client.predict_single_machine(start=start, end=end, revision="1604861479899", machine=machine)
+        return response, client._rejected_features
+
+    response, rejected_features = run_with_client(predict, use_arrow=True)
+
+    assert response.error_messages == []
+    assert not response.predictions.empty
+    assert rejected_features == (set() if server_supports_arrow else {"arrow"})
+
+
+def test_predict_result_format_arrow(run_with_client, machine):
+    end = datetime.now(tz=UTC)
+    start = end - timedelta(days=1)
+
+    response = run_with_client(
+        lambda client: client.predict_single_machine(start=start, end=end, revision="1604861479899", machine=machine),
+        batch_size=50,
+        result_format="arrow",
+    )
+
+    assert response.error_messages == []
+    assert isinstance(response.predictions, pa.Table)
+    assert response.predictions.num_rows > 0
@@ -0,0 +1,45 @@
+import pytest
+
+from gordo_client.batch_size import AdaptiveBatchSize
+
+
+def test_initial_size():
+    batch_sizes = AdaptiveBatchSize(initial_size=500, target_seconds=1.0, max_size=100)
+    assert batch_sizes.get("machine-1") == 100
+
+
+def test_grows_by_at_most_max_step():
+    batch_sizes = AdaptiveBatchSize(initial_size=100, target_seconds=1.0, max_step=1.5)
+    batch_sizes.record_success("machine-1", n_rows=100, n_bytes=1000, seconds=0.01)
+    assert batch_sizes.get("machine-1") == 150
+    assert batch_sizes.get("machine-2") == 100
+
+
+def test_smallest_target_wins():
+    batch_sizes = AdaptiveBatchSize(initial_size=100, target_bytes=1000, target_seconds=1.0)
+    batch_sizes.record_success("machine-1", n_rows=100, n_bytes=1250, seconds=0.5)
+    assert batch_sizes.get("machine-1") == 80
+
+
+def test_failure_shrinks():
+    batch_sizes = AdaptiveBatchSize(initial_size=1000, target_bytes=1000, min_size=300)
+    batch_sizes.record_failure("machine-1", n_rows=800)
+    assert batch_sizes.get("machine-1") == 400
+    batch_sizes.record_failure("machine-1", n_rows=800)
+    assert batch_sizes.get("machine-1") == 300
+
+
+@pytest.mark.parametrize(
+    "kwargs",
+    [
+        {},
+        {"target_bytes": 0},
+        {"target_seconds": -1.0},
+        {"target_bytes": 1000, "min_size": 0},
+        {"target_bytes": 1000, "min_size": 10, "max_size": 5},
+        {"target_bytes": 1000, "max_step": 1.0},
+    ],
+)
+def test_invalid_parameters(kwargs):
+    with pytest.raises(ValueError):
+        AdaptiveBatchSize(initial_size=100, **kwargs)
@@ -0,0 +1,34 @@
+from datetime import datetime, timedelta
+
+import pytest
+from pytz import UTC
+
+from benchmarks.provider import SyntheticDataProvider
+from benchmarks.run import Case, run_case
+from benchmarks.server import StandInServer
+
+
+@pytest.mark.parametrize("format", ["json", "parquet", "arrow"])
+def test_run_case(format):
+    start = datetime(2020, 1, 1, tzinfo=UTC)
+    case = Case(batch_size=100, parallelism=2, format=format, n_tags=3)
+
+    with StandInServer(machines={"machine-1": ["tag-1", "tag-2", "tag-3"]}) as server:
+        rows, errors, seconds, cpu_seconds, max_rss_mb = run_case(
+            case, server.host, server.port, server.project, start, start + timedelta(days=2)
+        )
+
+    assert errors == 0
+    # One row every 10 minutes, and the extra rows fetched for the model offset
+    assert rows >= 2 * 24 * 6
+    assert server.n_predictions == -(-rows // case.batch_size)
+    assert seconds > 0 and max_rss_mb > 0
+
+
+def test_synthetic_data_provider_dry_run():
+    start = datetime(2020, 1, 1, tzinfo=UTC)
+    provider = SyntheticDataProvider()
+
+    series = list(provider.load_series(start, start + timedelta(days=1), ["tag-1", "tag-2"], dry_run=True))
+
+    assert [(s.name, len(s), tag) for s, tag in series] == [("tag-1", 0, "tag-1"), ("tag-2", 0, "tag-2")]
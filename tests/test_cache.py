@@ -0,0 +1,75 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from gordo_client.cache import CacheStats, SingleFlightCache
+
+
+def test_concurrent_misses_load_once():
+    cache = SingleFlightCache(maxsize=8, ttl=60)
+    started = threading.Event()
+    release = threading.Event()
+    loads = []
+
+    def load():
+        loads.append(1)
+        started.set()
+        release.wait(5)
+        return "value"
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        first = executor.submit(cache.get, "key", load)
+        started.wait(5)
+        others = [executor.submit(cache.get, "key", load) for _ in range(3)]
+        while cache.stats().coalesced < 3:
+            pass
+        release.set()
+        assert [future.result() for future in [first, *others]] == ["value"] * 4
+
+    assert len(loads) == 1
+    assert cache.stats() == CacheStats(hits=0, misses=1, coalesced=3, size=1, maxsize=8)
+
+
+def test_different_keys_load_in_parallel():
+    cache = SingleFlightCache(maxsize=8, ttl=60)
+    # Only passes if both loads run at the same time
+    barrier = threading.Barrier(2, timeout=5)
+
+    def load(key):
+        barrier.wait()
+        return key
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        futures = [executor.submit(cache.get, key, lambda key=key: load(key)) for key in ("a", "b")]
+        assert [future.result() for future in futures] == ["a", "b"]
+
+
+def test_failed_load_is_not_cached():
+    cache = SingleFlightCache(maxsize=8, ttl=60)
+
+    def fail():
+        raise IOError("unavailable")
+
+    with pytest.raises(IOError):
+        cache.get("key", fail)
+    assert cache.get("key", lambda: "value") == "value"
+    assert cache.stats().misses == 2
+
+
+def test_aget():
+    cache = SingleFlightCache(maxsize=8, ttl=60)
+    loads = []
+
+    async def load():
+        loads.append(1)
+        await asyncio.sleep(0.01)
+        return "value"
+
+    async def get_concurrently():
+        return await asyncio.gather(*(cache.aget("key", load) for _ in range(3)))
+
+    assert asyncio.run(get_concurrently()) == ["value"] * 3
+    assert len(loads) == 1
+    assert cache.stats() == CacheStats(hits=0, misses=1, coalesced=2, size=1, maxsize=8)
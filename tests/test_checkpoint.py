@@ -0,0 +1,25 @@
+from datetime import datetime
+
+import pandas as pd
+from pytz import UTC
+
+from gordo_client.checkpoint import FORWARDED, PREDICTED, CheckpointStore
+
+
+def test_checkpoints_persisted(tmpdir):
+    path = str(tmpdir / "checkpoints.sqlite")
+    start = datetime(2020, 1, 1, tzinfo=UTC)
+    end = datetime(2020, 1, 2, tzinfo=UTC)
+    store = CheckpointStore(path)
+    store.record("project", "machine-1", "1", start, end, status=PREDICTED)
+    store.close()
+
+    store = CheckpointStore(path)
+    # The same window, whether from a datetime or a Timestamp
+    store.record("project", "machine-1", "1", pd.Timestamp(start), pd.Timestamp(end), status=FORWARDED)
+
+    window = (start.isoformat(), end.isoformat())
+    assert store.completed("project", "machine-1", "1") == {window}
+    assert store.completed("project", "machine-1", "1", statuses=[FORWARDED]) == {window}
+    assert store.completed("project", "machine-1", "2") == set()
+    assert store.completed("other-project", "machine-1", "1") == set()
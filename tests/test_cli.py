@@ -59,3 +59,79 @@ def test_iso_date_click_param(date):
 def test_iso_date_click_param_not_date(date):
     with pytest.raises(BadParameter):
         IsoFormatDateTime()(date)
+
+
+def test_download_model(runner, tmpdir, mocked_responses):
+    mocked_responses.add(
+        "GET",
+        "https://localhost:443/gordo/v0/gordo-test/revisions",
+        json={"available-revisions": ["1604861479899"], "latest": "1604861479899", "revision": "1604861479899"},
+    )
+    mocked_responses.add(
+        "GET",
+        "https://localhost:443/gordo/v0/gordo-test/machine-1/download-model",
+        body=b"model",
+        content_type="application/octet-stream",
+    )
+
+    result = runner.invoke(
+        gordo_client,
+        [
+            "--project",
+            "gordo-test",
+            "download-model",
+            str(tmpdir.mkdir("output")),
+            "--target",
+            "machine-1",
+            "--model-store",
+            str(tmpdir.join("store")),
+        ],
+    )
+
+    assert result.exit_code == 0, result.output
+    assert tmpdir.join("output", "machine-1", "model.pkl").read_binary() == b"model"
+    assert tmpdir.join("store", "gordo-test", "machine-1", "1604861479899", "model.pkl").read_binary() == b"model"
+
+
+def test_predict_checkpoint_requires_influx(runner, tmpdir):
+    result = runner.invoke(
+        gordo_client,
+        [
+            "--project",
+            "gordo-test",
+            "predict",
+            "2020-01-01T00:00:00+00:00",
+            "2020-01-02T00:00:00+00:00",
+            "--checkpoint-path",
+            str(tmpdir.join("checkpoints.sqlite")),
+        ],
+    )
+
+    assert result.exit_code == 2
+    assert "--checkpoint-path requires --influx-uri or --output-dataset" in result.output
+
+
+@pytest.mark.parametrize(
+    "args,error",
+    [
+        (["2020-01-01T00:00:00+00:00"], "Missing argument 'END'"),
+        (["2020-01-01T00:00:00+00:00", "--follow"], "--follow requires --influx-uri or --output-dataset"),
+        (
+            [
+                "2020-01-01T00:00:00+00:00",
+                "2020-01-02T00:00:00+00:00",
+                "--output-dataset",
+                "lake",
+                "--influx-uri",
+                "uri",
+            ],
+            "--output-dataset can't be given with --influx-uri",
+        ),
+        (["2020-01-01T00:00:00+00:00", "2020-01-02T00:00:00+00:00", "--follow"], "END can't be given with --follow"),
+    ],
+)
+def test_predict_follow_usage(runner, args, error):
+    result = runner.invoke(gordo_client, ["--project", "gordo-test", "predict", *args])
+
+    assert result.exit_code == 2
+    assert error in result.output
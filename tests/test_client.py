@@ -1,16 +1,24 @@
+import gzip
 import json
 import pickle
+import time
 from dataclasses import dataclass, field
 from datetime import datetime, timedelta
 from pathlib import Path
 from typing import Dict, Optional, Union
+from unittest.mock import patch
 
+import pandas as pd
+import pyarrow as pa
 import pytest
+import requests
 from pytz import UTC
 
+from gordo_client.cache import CacheStats
+from gordo_client.dataframe import dataframe_from_dict, dataframe_into_arrow_bytes
 from gordo_client.io import BadGordoResponse, ResourceGone
 from gordo_client.schemas import Machine
-from gordo_client.utils import PredictionResult
+from gordo_client.utils import BatchPredictionResult, PredictionResult
 from gordo_client import Client
 
 
@@ -193,3 +201,866 @@ def test_predict_single_machine_all_columns(data_provider, mocked_responses, mac
     response = client.predict_single_machine(start=start, end=end, revision=revision, machine=machine)
 
     assert isinstance(response, PredictionResult)
+
+
+def test_predict_iter(client, mocked_responses, machine):
+    revision = "1604861479899"
+    end = datetime.now(tz=UTC)
+    start = end - timedelta(days=7)
+    _mock_response(
+        mocked_responses,
+        "/gordo/v0/gordo-test/gordo-test/anomaly/prediction?format=json&revision=1604861479899",
+        "anomaly",
+    )
+    client.batch_size = 100
+
+    with patch.object(client, "_get_machines", return_value=[machine]):
+        batches = list(client.predict_iter(start=start, end=end, revision=revision))
+
+    assert len(batches) > 1
+    for batch in batches:
+        assert isinstance(batch, BatchPredictionResult)
+        assert batch.machine == machine
+        assert batch.start <= batch.end
+        assert batch.predictions is not None
+        assert batch.error_messages == []
+    assert len(set(batch.start for batch in batches)) == len(batches)
+
+
+def test_predict_iter_stops_early(client, machine):
+    end = datetime.now(tz=UTC)
+    start = end - timedelta(days=7)
+    client.batch_size = 10
+
+    failed = PredictionResult(name=machine.name, predictions=None, error_messages=["failed"])
+    with patch.object(client, "_get_machines", return_value=[machine]), patch.object(
+        client, "_send_prediction_request", return_value=failed
+    ) as send_prediction_request:
+        batches = client.predict_iter(start=start, end=end, revision="1604861479899")
+        first = next(batches)
+        batches.close()
+
+    assert first.error_messages == ["failed"]
+    # Only the batches submitted before the consumer stopped have been sent
+    assert send_prediction_request.call_count <= 2 * client.parallelism
+
+
+def test_predict_machine_parallelism(data_provider, machine):
+    client = Client(project="gordo-test", data_provider=data_provider, parallelism=4, machine_parallelism=1)
+    end = datetime.now(tz=UTC)
+    start = end - timedelta(days=7)
+    client.batch_size = 100
+    running = []
+    max_running = []
+
+    def send_prediction_request(X, y, chunk, machine, start, end, revision):
+        running.append(machine.name)
+        max_running.append(running.count(machine.name))
+        time.sleep(0.01)
+        running.remove(machine.name)
+        return PredictionResult(name=machine.name, predictions=X.iloc[chunk], error_messages=[])
+
+    machines = [machine.copy(update={"name": f"machine-{i}"}) for i in range(3)]
+    with patch.object(client, "_get_machines", return_value=machines), patch.object(
+        client, "_send_prediction_request", side_effect=send_prediction_request
+    ):
+        results = client.predict(start=start, end=end, revision="1604861479899")
+
+    assert [name for name, _, _ in results] == ["machine-0", "machine-1", "machine-2"]
+    assert all(not predictions.empty and not errors for _, predictions, errors in results)
+    assert max(max_running) == 1
+
+
+def _echo_prediction_request(X, y, chunk, machine, start, end, revision):
+    return PredictionResult(name=machine.name, predictions=X.iloc[chunk], error_messages=[])
+
+
+def test_predict_data_window(data_provider, machine):
+    client = Client(project="gordo-test", data_provider=data_provider, data_window="1D")
+    start = datetime(2020, 1, 1, 12, 5, tzinfo=UTC)
+    end = start + timedelta(days=7)
+
+    with patch.object(client, "_get_machines", return_value=[machine]), patch.object(
+        client, "_send_prediction_request", side_effect=_echo_prediction_request
+    ), patch.object(client, "_raw_data", wraps=client._raw_data) as raw_data:
+        ((name, predictions, error_messages),) = client.predict(start=start, end=end, revision="1604861479899")
+
+    assert raw_data.call_count == 8
+    assert error_messages == []
+    assert predictions.index.is_unique
+    assert predictions.index.is_monotonic_increasing
+    assert predictions.index.max() <= end
+
+
+def test_predict_checkpoint_resume(tmpdir, data_provider, machine):
+    checkpoint_path = str(tmpdir / "checkpoints.sqlite")
+    start = datetime(2020, 1, 1, 12, 5, tzinfo=UTC)
+    end = start + timedelta(days=7)
+
+    def fail_after_day_4(X, y, chunk, machine, start, end, revision):
+        if end >= datetime(2020, 1, 5, tzinfo=UTC):
+            return PredictionResult(name=machine.name, predictions=None, error_messages=["Evicted"])
+        return _echo_prediction_request(X, y, chunk, machine, start, end, revision)
+
+    def run(send_prediction_request):
+        client = Client(
+            project="gordo-test",
+            data_provider=data_provider,
+            data_window="1D",
+            checkpoint_path=checkpoint_path,
+            prediction_forwarder=lambda **kwargs: None,
+        )
+        with patch.object(client, "_get_machines", return_value=[machine]), patch.object(
+            client, "_send_prediction_request", side_effect=send_prediction_request
+        ), patch.object(client, "_raw_data", wraps=client._raw_data) as raw_data:
+            ((_, predictions, error_messages),) = client.predict(start=start, end=end, revision="1604861479899")
+        return predictions, error_messages, raw_data.call_count
+
+    _, error_messages, n_windows = run(fail_after_day_4)
+    assert error_messages
+    assert n_windows == 8
+
+    # Only the windows with a batch ending from the 5th of January on are predicted again
+    predictions, error_messages, n_windows = run(_echo_prediction_request)
+    assert error_messages == []
+    assert n_windows == 5
+    assert predictions.index.min() >= datetime(2020, 1, 4, 12, tzinfo=UTC)
+
+    _, _, n_windows = run(_echo_prediction_request)
+    assert n_windows == 0
+
+
+def test_predict_checkpoint_requires_forwarder(tmpdir):
+    with pytest.raises(ValueError):
+        Client(project="gordo-test", checkpoint_path=str(tmpdir / "checkpoints.sqlite"))
+
+
+def test_predict_checkpoint_predicted(tmpdir, data_provider, machine):
+    checkpoint_path = str(tmpdir / "checkpoints.sqlite")
+    start = datetime(2020, 1, 1, tzinfo=UTC)
+    end = start + timedelta(days=2)
+    client = Client(
+        project="gordo-test",
+        data_provider=data_provider,
+        data_window="1D",
+        checkpoint_path=checkpoint_path,
+        prediction_forwarder=lambda **kwargs: None,
+    )
+    # A run which died after its first window was predicted, but not forwarded
+    client.checkpoints.record(
+        "gordo-test", machine.name, "1604861479899", start, start + timedelta(days=1), status="predicted"
+    )
+
+    with patch.object(client, "_get_machines", return_value=[machine]), patch.object(
+        client, "_send_prediction_request", side_effect=_echo_prediction_request
+    ):
+        ((_, predictions, error_messages),) = client.predict(start=start, end=end, revision="1604861479899")
+
+    # Its predictions only lived in the memory of that run, so the window is predicted again
+    assert error_messages == []
+    assert predictions.index.min() < start + timedelta(hours=1)
+    assert client.checkpoints.completed("gordo-test", machine.name, "1604861479899", statuses=["forwarded"]) == {
+        (start.isoformat(), (start + timedelta(days=1)).isoformat()),
+        ((start + timedelta(days=1)).isoformat(), end.isoformat()),
+    }
+
+
+def test_predict_result_cache(tmpdir, machine):
+    index = pd.date_range("2020-01-01", "2020-01-06", freq="10T", tz=UTC)
+    data = pd.DataFrame({"TRC1": range(len(index)), "TRC2": range(len(index))}, index=index, dtype=float)
+
+    def raw_data(machine, start, end):
+        X = data[(data.index >= start) & (data.index <= end)]
+        return X, X
+
+    def run(start, end):
+        client = Client(project="gordo-test", data_window="1D", result_cache_dir=str(tmpdir))
+        with patch.object(client, "_get_machines", return_value=[machine]), patch.object(
+            client, "_raw_data", side_effect=raw_data
+        ), patch.object(client, "_send_prediction_request", side_effect=_echo_prediction_request) as send:
+            ((_, predictions, error_messages),) = client.predict(start=start, end=end, revision="1604861479899")
+        assert error_messages == []
+        expected = data[(data.index >= start) & (data.index <= end)]
+        pd.testing.assert_frame_equal(predictions, expected, check_freq=False)
+        return sorted(call.kwargs["start"] for call in send.call_args_list)
+
+    assert len(run(datetime(2020, 1, 1, tzinfo=UTC), datetime(2020, 1, 4, 12, tzinfo=UTC))) == 4
+
+    # The window of the 3rd of January is aligned with the earlier run, and its data didn't change
+    later_start, later_end = datetime(2020, 1, 2, 6, tzinfo=UTC), datetime(2020, 1, 5, tzinfo=UTC)
+    assert run(later_start, later_end) == [later_start, datetime(2020, 1, 4, tzinfo=UTC)]
+
+    # Only the window whose data changed is predicted again
+    data.loc["2020-01-03 12:00", "TRC1"] = -1.0
+    assert run(later_start, later_end) == [datetime(2020, 1, 3, tzinfo=UTC)]
+
+
+def test_predict_result_cache_forwarded(tmpdir, machine):
+    start = datetime(2020, 1, 1, tzinfo=UTC)
+    end = start + timedelta(days=1)
+    index = pd.date_range(start, end, freq="10T")
+    data = pd.DataFrame({"TRC1": range(len(index)), "TRC2": range(len(index))}, index=index, dtype=float)
+
+    def run(checkpoint_path):
+        forwarded = []
+        client = Client(
+            project="gordo-test",
+            data_window="1D",
+            result_cache_dir=str(tmpdir.join("results")),
+            checkpoint_path=checkpoint_path,
+            prediction_forwarder=lambda predictions=None, **kwargs: forwarded.append(predictions),
+        )
+        with patch.object(client, "_get_machines", return_value=[machine]), patch.object(
+            client, "_raw_data", return_value=(data, data)
+        ), patch.object(client, "_send_prediction_request", side_effect=_echo_prediction_request) as send:
+            ((_, predictions, error_messages),) = client.predict(start=start, end=end, revision="1604861479899")
+        assert error_messages == []
+        assert client.checkpoints.completed("gordo-test", machine.name, "1604861479899", statuses=["forwarded"])
+        return predictions, forwarded, send.call_count
+
+    predictions, _, n_requests = run(str(tmpdir.join("first.sqlite")))
+    assert n_requests
+
+    # The cached predictions are forwarded like the predictions of the server
+    cached_predictions, forwarded, n_requests = run(str(tmpdir.join("second.sqlite")))
+    assert n_requests == 0
+    pd.testing.assert_frame_equal(cached_predictions, predictions, check_freq=False)
+    pd.testing.assert_frame_equal(pd.concat(forwarded), predictions, check_freq=False)
+
+
+def test_result_cache_requires_data_window(tmpdir):
+    with pytest.raises(ValueError):
+        Client(project="gordo-test", result_cache_dir=str(tmpdir))
+
+
+def test_predict_follow(machine):
+    index = pd.date_range("2020-01-01", "2020-01-02", freq="10T", tz=UTC)
+    data = pd.DataFrame({"TRC1": range(len(index)), "TRC2": range(len(index))}, index=index, dtype=float)
+    client = Client(project="gordo-test")
+    start = datetime(2020, 1, 1, tzinfo=UTC)
+    now = [datetime(2020, 1, 1, 1, 5, tzinfo=UTC), datetime(2020, 1, 1, 1, 5, tzinfo=UTC)]
+    now += [datetime(2020, 1, 1, 2, 5, tzinfo=UTC), datetime(2020, 1, 1, 3, 5, tzinfo=UTC)]
+    failures = [False, True, False]
+
+    def raw_data(machine, start, end):
+        X = data[(data.index >= start - timedelta(hours=1)) & (data.index <= end)]
+        return X, X
+
+    def send_prediction_request(X, y, chunk, machine, start, end, revision):
+        if failures.pop(0):
+            return PredictionResult(name=machine.name, predictions=None, error_messages=["Server down"])
+        return _echo_prediction_request(X, y, chunk, machine, start, end, revision)
+
+    marks = {}
+    with patch.object(client, "_get_machines", return_value=[machine]), patch.object(
+        client, "_raw_data", side_effect=raw_data
+    ), patch.object(client, "_send_prediction_request", side_effect=send_prediction_request), patch(
+        "gordo_client.client._utcnow", side_effect=now
+    ), patch(
+        "gordo_client.client.sleep"
+    ) as sleep:
+        batches = list(
+            client.predict_follow(start, interval=60, revision="1604861479899", high_water_marks=marks, ticks=4)
+        )
+
+    assert sleep.call_count == 3
+    assert [(str(batch.start), str(batch.end), bool(batch.error_messages)) for batch in batches] == [
+        ("2020-01-01 00:00:00+00:00", "2020-01-01 00:50:00+00:00", False),
+        # Nothing new on the second tick, then the failed interval is sent again along with the new data
+        ("2020-01-01 01:00:00+00:00", "2020-01-01 01:50:00+00:00", True),
+        ("2020-01-01 01:00:00+00:00", "2020-01-01 02:50:00+00:00", False),
+    ]
+    assert marks == {machine.name: datetime(2020, 1, 1, 3, tzinfo=UTC)}
+
+
+def test_predict_follow_partial_failure(machine):
+    index = pd.date_range("2020-01-01", "2020-01-02", freq="10T", tz=UTC)
+    data = pd.DataFrame({"TRC1": range(len(index)), "TRC2": range(len(index))}, index=index, dtype=float)
+    client = Client(project="gordo-test", batch_size=2)
+    start = datetime(2020, 1, 1, tzinfo=UTC)
+
+    def send_prediction_request(X, y, chunk, machine, start, end, revision):
+        if start >= datetime(2020, 1, 1, 0, 20, tzinfo=UTC):
+            return PredictionResult(name=machine.name, predictions=None, error_messages=["Server down"])
+        return _echo_prediction_request(X, y, chunk, machine, start, end, revision)
+
+    marks = {}
+    with patch.object(client, "_get_machines", return_value=[machine]), patch.object(
+        client, "_raw_data", return_value=(data, data)
+    ), patch.object(client, "_send_prediction_request", side_effect=send_prediction_request), patch(
+        "gordo_client.client._utcnow", return_value=datetime(2020, 1, 1, 1, 5, tzinfo=UTC)
+    ):
+        batches = list(client.predict_follow(start, revision="1604861479899", high_water_marks=marks, ticks=1))
+
+    assert any(batch.error_messages for batch in batches)
+    # Complete up to the first failed batch
+    assert marks == {machine.name: datetime(2020, 1, 1, 0, 20, tzinfo=UTC)}
+
+
+def test_predict_follow_revision_gone(machine):
+    index = pd.date_range("2020-01-01", "2020-01-02", freq="10T", tz=UTC)
+    data = pd.DataFrame({"TRC1": range(len(index)), "TRC2": range(len(index))}, index=index, dtype=float)
+    client = Client(project="gordo-test")
+    start = datetime(2020, 1, 1, tzinfo=UTC)
+    revisions = ["1604861479899", "1604861479999"]
+
+    def send_prediction_request(X, y, chunk, machine, start, end, revision):
+        if revision == "1604861479899":
+            raise ResourceGone("Gone")
+        return _echo_prediction_request(X, y, chunk, machine, start, end, revision)
+
+    marks = {}
+    with patch.object(client, "_get_machines", return_value=[machine]), patch.object(
+        client, "_fetch_revisions", side_effect=lambda: {"latest": revisions.pop(0)}
+    ), patch.object(client, "_raw_data", return_value=(data, data)), patch.object(
+        client, "_send_prediction_request", side_effect=send_prediction_request
+    ), patch(
+        "gordo_client.client._utcnow", return_value=datetime(2020, 1, 1, 1, 5, tzinfo=UTC)
+    ), patch(
+        "gordo_client.client.sleep"
+    ):
+        batches = list(client.predict_follow(start, high_water_marks=marks, ticks=2))
+
+    # The tick whose revision was removed is sent again with the new latest revision
+    assert batches
+    assert all(not batch.error_messages for batch in batches)
+    assert marks == {machine.name: datetime(2020, 1, 1, 1, tzinfo=UTC)}
+
+    with patch.object(client, "_get_machines", return_value=[machine]), patch.object(
+        client, "_raw_data", return_value=(data, data)
+    ), patch.object(client, "_send_prediction_request", side_effect=ResourceGone("Gone")):
+        with pytest.raises(ResourceGone):
+            list(client.predict_follow(start, revision="1604861479899", ticks=1))
+
+
+def test_data_windows(machine):
+    client = Client(project="gordo-test", data_window="1D")
+    machine.metadata.build_metadata.model.model_offset = 2
+    start = datetime(2020, 1, 1, tzinfo=UTC)
+    end = datetime(2020, 1, 3, 6, tzinfo=UTC)
+
+    windows = client._data_windows(machine, start, end)
+
+    assert windows == [
+        (start, datetime(2020, 1, 2, tzinfo=UTC), None, True),
+        (
+            datetime(2020, 1, 2, tzinfo=UTC),
+            datetime(2020, 1, 3, tzinfo=UTC),
+            datetime(2020, 1, 1, 23, 40, tzinfo=UTC),
+            True,
+        ),
+        (datetime(2020, 1, 3, tzinfo=UTC), end, datetime(2020, 1, 2, 23, 40, tzinfo=UTC), False),
+    ]
+
+
+def test_data_windows_disabled(client, machine):
+    start = datetime(2020, 1, 1, tzinfo=UTC)
+    end = datetime(2020, 1, 3, 6, tzinfo=UTC)
+    assert client._data_windows(machine, start, end) == [(start, end, None, False)]
+
+
+def test_predict_adaptive_batch_size(data_provider, mocked_responses, machine):
+    client = Client(project="gordo-test", data_provider=data_provider, batch_size=400, target_request_bytes=10**9)
+    end = datetime.now(tz=UTC)
+    start = end - timedelta(days=7)
+    fetched = []
+    sent = []
+
+    def raw_data(*args, **kwargs):
+        X, y = Client._raw_data(client, *args, **kwargs)
+        fetched.append(len(X))
+        return X, y
+
+    def prediction(request):
+        n_rows = len(dataframe_from_dict(json.loads(request.body)["X"]))
+        sent.append(n_rows)
+        if n_rows > 20:
+            return 413, {}, "Payload too large"
+        return 200, {"Content-Type": "application/json"}, gordo_responses["anomaly"].json
+
+    mocked_responses.add_callback(
+        "POST", "https://localhost:443/gordo/v0/gordo-test/gordo-test/anomaly/prediction", callback=prediction
+    )
+
+    with patch.object(client, "_get_machines", return_value=[machine]), patch.object(
+        client, "_raw_data", side_effect=raw_data
+    ):
+        ((name, predictions, error_messages),) = client.predict(start=start, end=end, revision="1604861479899")
+
+    assert error_messages == []
+    # Every row was eventually accepted, in batches which fit the server
+    assert sum(n_rows for n_rows in sent if n_rows <= 20) == sum(fetched)
+    assert max(sent) > 20
+    assert client.batch_sizes.get(machine.name) > 1
+
+
+def test_predict_adaptive_batch_size_shrinks_on_server_error(data_provider, mocked_responses, machine):
+    client = Client(
+        project="gordo-test", data_provider=data_provider, batch_size=400, target_request_seconds=60.0, n_retries=0
+    )
+    end = datetime.now(tz=UTC)
+    start = end - timedelta(days=1)
+    mocked_responses.add(
+        "POST", "https://localhost:443/gordo/v0/gordo-test/gordo-test/anomaly/prediction", status=503, body="busy"
+    )
+
+    with patch.object(client, "_get_machines", return_value=[machine]):
+        ((name, predictions, error_messages),) = client.predict(start=start, end=end, revision="1604861479899")
+
+    assert error_messages
+    assert client.batch_sizes.get(machine.name) < 400
+
+
+def _arrow_prediction(request):
+    if "format=arrow" not in request.url:
+        return 400, {}, "Unknown format"
+    assert b"\xff\xff\xff\xff" in request.body
+    predictions = pd.DataFrame({"model-output": [1.0, 2.0]}, index=pd.date_range("2020-01-01", periods=2, tz=UTC))
+    return 200, {"Content-Type": "application/vnd.apache.arrow.stream"}, dataframe_into_arrow_bytes(predictions)
+
+
+@pytest.mark.parametrize("server_supports_arrow", [True, False])
+def test_predict_arrow(server_supports_arrow, data_provider, mocked_responses, machine):
+    client = Client(project="gordo-test", data_provider=data_provider, use_arrow=True)
+    end = datetime.now(tz=UTC)
+    start = end - timedelta(days=1)
+
+    def prediction(request):
+        if server_supports_arrow:
+            return _arrow_prediction(request)
+        if "format=arrow" in request.url:
+            return 400, {}, "Unknown format"
+        assert "format=parquet" in request.url
+        return 200, {"Content-Type": "application/json"}, gordo_responses["anomaly"].json
+
+    mocked_responses.add_callback(
+        "POST", "https://localhost:443/gordo/v0/gordo-test/gordo-test/anomaly/prediction", callback=prediction
+    )
+
+    response = client.predict_single_machine(start=start, end=end, revision="1604861479899", machine=machine)
+
+    assert response.error_messages == []
+    assert not response.predictions.empty
+    assert client._rejected_features == (set() if server_supports_arrow else {"arrow"})
+    assert client.format == "arrow"
+
+
+@pytest.mark.parametrize("use_compression", [False, True])
+def test_predict_arrow_bad_request(use_compression, data_provider, mocked_responses, machine):
+    client = Client(
+        project="gordo-test",
+        data_provider=data_provider,
+        use_arrow=True,
+        request_compression="gzip" if use_compression else None,
+        compression_min_size=0,
+    )
+    end = datetime.now(tz=UTC)
+    start = end - timedelta(days=1)
+    mocked_responses.add(
+        "POST", "https://localhost:443/gordo/v0/gordo-test/gordo-test/anomaly/prediction", status=400, body="Bad"
+    )
+
+    response = client.predict_single_machine(start=start, end=end, revision="1604861479899", machine=machine)
+
+    assert "Failed with bad request" in response.error_messages[0]
+    # The batch was sent once more as uncompressed parquet, which didn't help, so Arrow is kept for the others
+    assert [
+        (call.request.url.split("format=")[1].split("&")[0], call.request.headers.get("Content-Encoding"))
+        for call in mocked_responses.calls
+    ] == [("arrow", "gzip" if use_compression else None), ("parquet", None)]
+    assert client._rejected_features == set()
+
+
+def test_predict_result_format_arrow(data_provider, mocked_responses, machine):
+    client = Client(
+        project="gordo-test", data_provider=data_provider, batch_size=50, use_arrow=True, result_format="arrow"
+    )
+    end = datetime.now(tz=UTC)
+    start = end - timedelta(days=1)
+    mocked_responses.add_callback(
+        "POST", "https://localhost:443/gordo/v0/gordo-test/gordo-test/anomaly/prediction", callback=_arrow_prediction
+    )
+
+    with patch.object(client, "_get_machines", return_value=[machine]):
+        ((name, predictions, error_messages),) = client.predict(start=start, end=end, revision="1604861479899")
+
+    n_requests = len(mocked_responses.calls)
+    assert error_messages == []
+    assert isinstance(predictions, pa.Table)
+    assert n_requests > 1
+    # The record batches of the responses are concatenated, not copied into a single chunk
+    assert predictions.num_rows == 2 * n_requests
+    assert predictions.column("model-output").num_chunks == n_requests
+
+
+def test_predict_result_format_arrow_no_predictions(client, machine):
+    client.result_format = "arrow"
+    end = datetime.now(tz=UTC)
+    failed = PredictionResult(name=machine.name, predictions=None, error_messages=["failed"])
+
+    with patch.object(client, "_send_prediction_request", return_value=failed):
+        response = client.predict_single_machine(
+            machine=machine, start=end - timedelta(days=1), end=end, revision="1604861479899"
+        )
+
+    assert isinstance(response.predictions, pa.Table)
+    assert response.predictions.num_rows == 0
+    assert response.error_messages
+
+
+def test_invalid_result_format():
+    with pytest.raises(ValueError):
+        Client(project="gordo-test", result_format="polars")
+
+
+def test_cache_stats(client, mocked_responses):
+    _mock_response(mocked_responses, "/gordo/v0/gordo-test/revisions", "revision")
+
+    client.get_revisions()
+    client.get_revisions()
+
+    assert len(mocked_responses.calls) == 1
+    assert client.cache_stats()["revisions"] == CacheStats(hits=1, misses=1, coalesced=0, size=1, maxsize=1)
+
+
+def test_disk_cache(tmpdir, data_provider, mocked_responses):
+    revisions = gordo_responses["revision"].json
+    machine_name = "07136c88-d39f-41f3-af31-369115a9eb3f-9999"
+
+    def revisions_callback(request):
+        if request.headers.get("If-None-Match") == '"v1"':
+            return 304, {}, ""
+        return 200, {"ETag": '"v1"'}, revisions
+
+    mocked_responses.add_callback(
+        "GET",
+        "https://localhost:443/gordo/v0/gordo-test/revisions",
+        callback=revisions_callback,
+        content_type="application/json",
+    )
+    _mock_response(mocked_responses, "/gordo/v0/gordo-test/models", "model")
+    _mock_response(mocked_responses, f"/gordo/v0/gordo-test/{machine_name}/metadata", "metadata")
+
+    metadata = Client(project="gordo-test", data_provider=data_provider, cache_dir=str(tmpdir)).get_metadata()
+    assert len(mocked_responses.calls) == 3
+
+    # A later run only revalidates the revisions
+    client = Client(project="gordo-test", data_provider=data_provider, cache_dir=str(tmpdir))
+    assert client.get_metadata() == metadata
+    assert len(mocked_responses.calls) == 4
+    assert mocked_responses.calls[3].response.status_code == 304
+
+
+def test_disk_cache_prunes_revisions(tmpdir, data_provider, mocked_responses):
+    client = Client(project="gordo-test", data_provider=data_provider, cache_dir=str(tmpdir))
+    client.disk_cache.set(("1500000000000", "models"), {"models": ["old-machine"]})
+    client.disk_cache.set(("1604861479899", "models"), {"models": ["machine"]})
+    _mock_response(mocked_responses, "/gordo/v0/gordo-test/revisions", "revision")
+
+    assert client.get_machine_names() == ["machine"]
+    assert client.disk_cache.get(("1500000000000", "models")) is None
+
+
+def test_download_model_files_store(tmpdir, data_provider, mocked_responses):
+    machine_name = "07136c88-d39f-41f3-af31-369115a9eb3f-9999"
+    _mock_response(mocked_responses, f"/gordo/v0/gordo-test/{machine_name}/download-model", "model_download")
+    client = Client(project="gordo-test", data_provider=data_provider, model_store=str(tmpdir.join("store")))
+
+    for output_dir in ("first", "second"):
+        paths = client.download_model_files(
+            str(tmpdir.join(output_dir)), revision="1604861479899", targets=[machine_name]
+        )
+        assert paths == {machine_name: str(tmpdir.join(output_dir, machine_name, "model.pkl"))}
+        with open(paths[machine_name], "rb") as f:
+            assert f.read() == gordo_responses["model_download"].body
+
+    # The second download comes from the store
+    assert len(mocked_responses.calls) == 1
+    assert client.download_model(revision="1604861479899", targets=[machine_name]) == {machine_name: "test"}
+
+
+@pytest.mark.parametrize("model_changed", [False, True])
+def test_download_model_files_resume(model_changed, tmpdir, client, mocked_responses):
+    machine_name = "07136c88-d39f-41f3-af31-369115a9eb3f-9999"
+    body = gordo_responses["model_download"].body
+    path = tmpdir.join(machine_name, "model.pkl")
+    interrupted = True
+
+    def download(request):
+        if interrupted:
+            return 200, {"ETag": '"v1"'}, body
+        assert request.headers["Range"] == "bytes=5-"
+        assert request.headers["If-Range"] == '"v1"'
+        if model_changed:
+            return 200, {"ETag": '"v2"'}, body
+        return 206, {"ETag": '"v1"'}, body[5:]
+
+    mocked_responses.add_callback(
+        "GET",
+        f"https://localhost:443/gordo/v0/gordo-test/{machine_name}/download-model",
+        callback=download,
+        content_type="application/octet-stream",
+    )
+
+    def iter_content(resp, chunk_size):
+        if chunk_size != 5:
+            # Read by responses itself
+            yield from resp.raw.stream(chunk_size)
+            return
+        yield resp.content[:5]
+        raise requests.ConnectionError("Connection reset")
+
+    # The partial download of the first call is kept for the revision, with the ETag of the model
+    with patch("gordo_client.client.MODEL_CHUNK_SIZE", 5), patch.object(
+        requests.Response, "iter_content", iter_content
+    ):
+        with pytest.raises(requests.ConnectionError):
+            client.download_model_files(str(tmpdir), revision="1604861479899", targets=[machine_name])
+    assert tmpdir.join(machine_name, "model.1604861479899.part").read_binary() == body[:5]
+
+    interrupted = False
+    client.download_model_files(str(tmpdir), revision="1604861479899", targets=[machine_name])
+
+    assert path.read_binary() == body
+    assert tmpdir.join(machine_name).listdir() == [path]
+
+
+@pytest.mark.parametrize("server_supports_compression", [True, False])
+@pytest.mark.parametrize("use_arrow", [False, True])
+def test_predict_request_compression(server_supports_compression, use_arrow, data_provider, mocked_responses, machine):
+    client = Client(
+        project="gordo-test",
+        data_provider=data_provider,
+        use_arrow=use_arrow,
+        request_compression="gzip",
+        compression_min_size=0,
+    )
+    end = datetime.now(tz=UTC)
+    start = end - timedelta(days=1)
+
+    def prediction(request):
+        if request.headers.get("Content-Encoding") == "gzip":
+            if not server_supports_compression:
+                return 400, {}, "Unreadable body"
+            request.body = gzip.decompress(request.body)
+        else:
+            assert not server_supports_compression
+        if "format=arrow" in request.url:
+            return _arrow_prediction(request)
+        # An uncompressed Arrow body is only retried as parquet
+        assert "format=parquet" in request.url if use_arrow else json.loads(request.body)["X"]
+        return 200, {"Content-Type": "application/json"}, gordo_responses["anomaly"].json
+
+    mocked_responses.add_callback(
+        "POST", "https://localhost:443/gordo/v0/gordo-test/gordo-test/anomaly/prediction", callback=prediction
+    )
+
+    response = client.predict_single_machine(start=start, end=end, revision="1604861479899", machine=machine)
+
+    assert response.error_messages == []
+    if server_supports_compression:
+        assert client._rejected_features == set()
+    else:
+        assert client._rejected_features == ({"compression", "arrow"} if use_arrow else {"compression"})
+    assert client.request_compression == "gzip"
+    assert client.format == ("arrow" if use_arrow else "json")
+
+
+@pytest.mark.parametrize("status", [400, 415])
+def test_predict_request_compression_bad_request(status, data_provider, mocked_responses, machine):
+    client = Client(
+        project="gordo-test", data_provider=data_provider, request_compression="gzip", compression_min_size=0
+    )
+    end = datetime.now(tz=UTC)
+    start = end - timedelta(days=1)
+    mocked_responses.add(
+        "POST", "https://localhost:443/gordo/v0/gordo-test/gordo-test/anomaly/prediction", status=status, body="Bad"
+    )
+
+    response = client.predict_single_machine(start=start, end=end, revision="1604861479899", machine=machine)
+
+    assert "Failed with bad request" in response.error_messages[0]
+    # The batch was sent once more uncompressed, which didn't help, so compression is kept for the others
+    assert [call.request.headers.get("Content-Encoding") for call in mocked_responses.calls[-2:]] == ["gzip", None]
+    assert client._rejected_features == set()
+
+
+def test_predict_request_compression_min_size(client, machine):
+    X = pd.DataFrame({"tag-1": [1.0]}, index=pd.date_range("2020-01-01", periods=1, tz=UTC))
+
+    assert "Content-Encoding" not in client._encode_payload("json", "gzip", X, None)["headers"]
+    client.compression_min_size = 0
+    assert client._encode_payload("json", "gzip", X, None)["headers"]["Content-Encoding"] == "gzip"
+
+
+def test_predict_retry_after(data_provider, mocked_responses, machine):
+    client = Client(project="gordo-test", data_provider=data_provider, n_retries=1)
+    end = datetime.now(tz=UTC)
+    start = end - timedelta(days=1)
+    statuses = [503, 200]
+
+    def prediction(request):
+        status = statuses.pop(0)
+        if status == 503:
+            return 503, {"Retry-After": "0"}, "busy"
+        return 200, {"Content-Type": "application/json"}, gordo_responses["anomaly"].json
+
+    mocked_responses.add_callback(
+        "POST", "https://localhost:443/gordo/v0/gordo-test/gordo-test/anomaly/prediction", callback=prediction
+    )
+
+    with patch("gordo_client.client.backoff_delay", return_value=0) as backoff_delay:
+        response = client.predict_single_machine(start=start, end=end, revision="1604861479899", machine=machine)
+
+    assert response.error_messages == []
+    backoff_delay.assert_called_once_with(1, 0.0)
+
+
+def test_predict_circuit_breaker(data_provider, mocked_responses, machine):
+    client = Client(
+        project="gordo-test",
+        data_provider=data_provider,
+        n_retries=0,
+        circuit_breaker_threshold=1,
+        circuit_breaker_reset=0.2,
+        circuit_breaker_max_wait=0,
+    )
+    end = datetime.now(tz=UTC)
+    start = end - timedelta(days=1)
+    url = "https://localhost:443/gordo/v0/gordo-test/gordo-test/anomaly/prediction"
+    mocked_responses.add("POST", url, status=503, body="busy")
+
+    response = client.predict_single_machine(start=start, end=end, revision="1604861479899", machine=machine)
+    assert "busy" in response.error_messages[0]
+    assert client.circuit_breaker.is_open(machine.name)
+
+    # Held back without sending a request
+    n_calls = len(mocked_responses.calls)
+    response = client.predict_single_machine(start=start, end=end, revision="1604861479899", machine=machine)
+    assert "Circuit breaker open" in response.error_messages[0]
+    assert len(mocked_responses.calls) == n_calls
+
+    # Held back until the trial request succeeds, without using up the attempts of the batches
+    mocked_responses.replace("POST", url, body=gordo_responses["anomaly"].json, content_type="application/json")
+    client.circuit_breaker_max_wait = 60
+    response = client.predict_single_machine(start=start, end=end, revision="1604861479899", machine=machine)
+    assert response.error_messages == []
+    assert not client.circuit_breaker.is_open(machine.name)
+
+
+def test_predict_retry_budget(data_provider, mocked_responses, machine):
+    client = Client(project="gordo-test", data_provider=data_provider, n_retries=3, retry_budget_ratio=0)
+    client.retry_budget.min_retries = 0
+    end = datetime.now(tz=UTC)
+    start = end - timedelta(days=1)
+    mocked_responses.add(
+        "POST", "https://localhost:443/gordo/v0/gordo-test/gordo-test/anomaly/prediction", status=503, body="busy"
+    )
+
+    response = client.predict_single_machine(start=start, end=end, revision="1604861479899", machine=machine)
+
+    assert "retry budget exhausted" in response.error_messages[0]
+
+
+def test_predict_prediction_path_per_machine(data_provider, mocked_responses, machine):
+    client = Client(project="gordo-test", data_provider=data_provider)
+    end = datetime.now(tz=UTC)
+    start = end - timedelta(days=1)
+    plain_machine = machine.copy(update={"name": "plain-machine"})
+    base_url = "https://localhost:443/gordo/v0/gordo-test"
+    mocked_responses.add("POST", f"{base_url}/plain-machine/anomaly/prediction", status=422, body="Not anomaly")
+    for name in ("plain-machine/prediction", "gordo-test/anomaly/prediction"):
+        mocked_responses.add(
+            "POST", f"{base_url}/{name}", body=gordo_responses["anomaly"].json, content_type="application/json"
+        )
+
+    for target in (plain_machine, machine, plain_machine):
+        response = client.predict_single_machine(start=start, end=end, revision="1604861479899", machine=target)
+        assert response.error_messages == []
+
+    urls = [call.request.url.split("?")[0] for call in mocked_responses.calls]
+    # The fallback of one machine doesn't change the path of the others, nor is it tried again
+    assert urls == [
+        f"{base_url}/plain-machine/anomaly/prediction",
+        f"{base_url}/plain-machine/prediction",
+        f"{base_url}/gordo-test/anomaly/prediction",
+        f"{base_url}/plain-machine/prediction",
+    ]
+
+
+def test_predict_infer_prediction_path(data_provider, mocked_responses, machine):
+    client = Client(project="gordo-test", data_provider=data_provider, infer_prediction_path=True)
+    end = datetime.now(tz=UTC)
+    start = end - timedelta(days=1)
+    mocked_responses.add(
+        "POST",
+        "https://localhost:443/gordo/v0/gordo-test/gordo-test/prediction",
+        body=gordo_responses["anomaly"].json,
+        content_type="application/json",
+    )
+
+    # The PCA model of the machine isn't an anomaly detector
+    response = client.predict_single_machine(start=start, end=end, revision="1604861479899", machine=machine)
+
+    assert response.error_messages == []
+    assert len(mocked_responses.calls) == 1
+
+
+@pytest.mark.parametrize("forwarding_fails", [False, True])
+def test_predict_queued_forwarder(tmpdir, forwarding_fails, data_provider, mocked_responses, machine):
+    forwarded = []
+
+    def forwarder(predictions=None, machine=None, metadata=None, resampled_sensor_data=None):
+        if forwarding_fails:
+            raise OSError("Influx down")
+        forwarded.append(predictions)
+
+    client = Client(
+        project="gordo-test",
+        data_provider=data_provider,
+        prediction_forwarder=forwarder,
+        forwarding_workers=2,
+        checkpoint_path=str(tmpdir / "checkpoints.sqlite"),
+    )
+    end = datetime.now(tz=UTC)
+    start = end - timedelta(days=1)
+    mocked_responses.add(
+        "POST",
+        "https://localhost:443/gordo/v0/gordo-test/gordo-test/anomaly/prediction",
+        body=gordo_responses["anomaly"].json,
+        content_type="application/json",
+    )
+
+    with patch.object(client, "_get_machines", return_value=[machine]):
+        ((name, predictions, error_messages),) = client.predict(start=start, end=end, revision="1604861479899")
+
+    completed = client.checkpoints.completed("gordo-test", machine.name, "1604861479899")
+    if forwarding_fails:
+        assert len(error_messages) == 1
+        assert "Failed to forward predictions" in error_messages[0]
+        assert "Influx down" in error_messages[0]
+        assert completed == set()
+    else:
+        assert error_messages == []
+        assert len(forwarded) == 1
+        assert len(completed) == 1
+
+
+def test_client_close(tmpdir):
+    client = Client(
+        project="gordo-test",
+        prediction_forwarder=lambda **kwargs: None,
+        forwarding_workers=1,
+        checkpoint_path=str(tmpdir / "checkpoints.sqlite"),
+    )
+    client.prediction_forwarder(predictions=None)
+    assert len(client.prediction_forwarder._workers) == 1
+
+    with patch.object(client._transport, "close") as close_transport, client:
+        pass
+
+    close_transport.assert_called_once()
+    assert client.scheduler._closed
+    assert client.prediction_forwarder._workers == []
+    with pytest.raises(RuntimeError):
+        client.scheduler._executor.submit(print)
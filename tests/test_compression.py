@@ -0,0 +1,41 @@
+import gzip
+
+import pytest
+
+from gordo_client.compression import check_encoding, compress, compressed_body, multipart_body
+
+
+@pytest.mark.parametrize("encoding", ["gzip", "zstd"])
+def test_compressed_body(encoding):
+    if encoding == "zstd":
+        zstandard = pytest.importorskip("zstandard")
+        decompress = zstandard.ZstdDecompressor().decompress
+    else:
+        decompress = gzip.decompress
+    body = b'{"X": [1.0, 2.0, 3.0]}' * 100
+
+    compressed, headers = compressed_body(body, "application/json", encoding, min_size=1024)
+
+    assert headers == {"Content-Type": "application/json", "Content-Encoding": encoding}
+    assert len(compressed) < len(body) / 10
+    assert decompress(compressed) == body
+
+
+def test_compressed_body_disabled():
+    assert compressed_body(b"body", "application/json", None) == (b"body", {"Content-Type": "application/json"})
+
+
+def test_check_encoding():
+    check_encoding(None)
+    check_encoding("gzip")
+    with pytest.raises(ValueError):
+        check_encoding("br")
+
+
+def test_multipart_body():
+    body, content_type = multipart_body({"X": b"data", "y": None})
+
+    assert content_type.startswith("multipart/form-data; boundary=")
+    assert b'name="X"; filename="X"' in body
+    assert b'name="y"' not in body
+    assert gzip.decompress(compress(body, "gzip")) == body
@@ -0,0 +1,78 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from gordo_client import io
+from gordo_client.dataframe import dataframe_from_dict, dataframe_to_dict
+
+
+def _nested_to_dict(df: pd.DataFrame) -> dict:
+    """
+    Reference layout, built with pandas' own ``to_dict``
+    """
+    data = df.copy()
+    if isinstance(data.index, pd.DatetimeIndex):
+        data.index = data.index.astype(str)
+    if isinstance(df.columns, pd.MultiIndex):
+        return {
+            col: data[col].to_dict() if isinstance(data[col], pd.DataFrame) else pd.DataFrame(data[col]).to_dict()
+            for col in data.columns.get_level_values(0)
+        }
+    return data.to_dict()
+
+
+@pytest.mark.parametrize(
+    "columns",
+    [
+        pd.MultiIndex.from_tuples([("model-input", "tag-1"), ("model-input", "tag-2"), ("model-output", "tag-1")]),
+        pd.MultiIndex.from_tuples([("model-input", "tag-1"), ("total-anomaly-scaled", "")]),
+        pd.Index(["tag-1", "tag-2", "tag-3"]),
+    ],
+)
+@pytest.mark.parametrize(
+    "index", [pd.date_range("2020-01-01", periods=4, freq="10T", tz="UTC"), pd.RangeIndex(4)], ids=["dates", "ints"]
+)
+def test_dataframe_to_dict_layout(columns, index):
+    df = pd.DataFrame(np.arange(4 * len(columns), dtype=float).reshape(4, -1), columns=columns, index=index)
+    df.iloc[1, 0] = np.nan
+
+    serialized = dataframe_to_dict(df)
+
+    assert str(serialized) == str(_nested_to_dict(df))
+
+
+def test_dataframe_round_trip_json():
+    columns = pd.MultiIndex.from_tuples([("model-input", "tag-1"), ("model-output", "tag-1")])
+    index = pd.date_range("2020-01-01", periods=3, freq="10T", tz="UTC")
+    df = pd.DataFrame([[1.0, 2.0], [np.nan, 4.0], [5.0, 6.0]], columns=columns, index=index)
+
+    result = dataframe_from_dict(io._json_loads(io._json_dumps(dataframe_to_dict(df))))
+
+    pd.testing.assert_frame_equal(result, df, check_freq=False)
+
+
+def test_dataframe_from_dict_mixed_timezones():
+    data = {"tag-1": {"2020-01-01T01:00:00+01:00": 1.0, "2020-01-01T00:30:00+00:00": 2.0}}
+
+    df = dataframe_from_dict(data)
+
+    assert [timestamp.isoformat() for timestamp in df.index] == [
+        "2020-01-01T01:00:00+01:00",
+        "2020-01-01T00:30:00+00:00",
+    ]
+
+
+def test_dataframe_from_dict_int_index():
+    df = dataframe_from_dict({"tag-1": {"2": 1.0, "1": 2.0}})
+    assert df.index.tolist() == [1, 2]
+
+
+@pytest.mark.parametrize("use_orjson", [True, False])
+def test_json_backends(use_orjson, monkeypatch):
+    if not use_orjson:
+        monkeypatch.setattr(io, "orjson", None)
+    elif io.orjson is None:
+        pytest.skip("orjson is not installed")
+
+    assert io._json_loads(io._json_dumps({"a": [1, 2.5, "b"], 1: None})) == {"a": [1, 2.5, "b"], "1": None}
+    assert np.isnan(io._json_loads(b'{"a": NaN}')["a"])
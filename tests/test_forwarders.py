@@ -1,15 +1,24 @@
 """Tests for gordo_client."""
 
 import logging
+import threading
+import time
 from typing import List
 from unittest.mock import MagicMock, patch
 
 import numpy as np
 import pandas as pd
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
 import pytest
 from gordo_core import sensor_tag
 
-from gordo_client.forwarders import ForwardPredictionsIntoInflux
+from gordo_client.forwarders import (
+    ForwardingFailure,
+    ForwardPredictionsIntoInflux,
+    ForwardPredictionsIntoParquet,
+    QueuedForwarder,
+)
 from gordo_client.schemas import Machine
 from gordo_client.utils import influx_client_from_uri
 
@@ -28,12 +37,9 @@ def test_write_to_influx_with_retries(mock_influx_dataframe_client, caplog):
         return False
 
     with pytest.raises(OSError):
-        with patch.object(
-            ForwardPredictionsIntoInflux, "_stack_to_name_value_columns"
-        ) as _stack_to_name_value_columns, patch("time.sleep"), caplog.at_level(logging.INFO):
-            _stack_to_name_value_columns.side_effect = lambda v: v
-            df = pd.DataFrame()
-            mock_influx_dataframe_client.write_points.side_effect = OSError("Connection refused")
+        with patch("time.sleep"), caplog.at_level(logging.INFO):
+            df = get_test_data(["tag-1", "tag-2"])
+            mock_influx_dataframe_client.request.side_effect = OSError("Connection refused")
             forwarder = ForwardPredictionsIntoInflux(
                 destination_influx_uri="root:root@localhost:8086/testdb", n_retries=2
             )
@@ -145,3 +151,255 @@ def test_influx_send_data(influxdb, influxdb_uri, sensors, sensors_str):
     for key in sensors_str:
         results_mask = resampled_results["sensor_name"] == key
         assert np.allclose(df[key].values, resampled_results[results_mask]["sensor_value"].values)
+
+
+def test_queued_forwarder_backpressure():
+    release = threading.Event()
+    forwarded = []
+
+    def slow_forwarder(**kwargs):
+        release.wait(timeout=10)
+        forwarded.append(kwargs["predictions"])
+
+    forwarder = QueuedForwarder(slow_forwarder, n_workers=1, max_queued=1)
+    # One call being forwarded, and one queued
+    forwarder(predictions=pd.DataFrame({"value": [1.0]}))
+    time.sleep(0.1)
+    forwarder(predictions=pd.DataFrame({"value": [2.0]}))
+    blocked = threading.Thread(target=forwarder, kwargs=dict(predictions=pd.DataFrame({"value": [3.0]})))
+    blocked.start()
+    time.sleep(0.1)
+
+    assert blocked.is_alive()
+    release.set()
+    blocked.join(timeout=10)
+    assert forwarder.close() == []
+    assert [df["value"][0] for df in forwarded] == [1.0, 2.0, 3.0]
+
+
+def test_queued_forwarder_failures(machine):
+    def failing_forwarder(**kwargs):
+        raise OSError("Connection refused")
+
+    forwarder = QueuedForwarder(failing_forwarder, n_workers=2)
+    predictions = pd.DataFrame({"value": [1.0, 2.0]}, index=pd.date_range("2020-01-01", periods=2, freq="10T"))
+    forwarder(predictions=predictions, machine=machine)
+
+    assert forwarder.flush() == [
+        ForwardingFailure(
+            machine=machine, start=predictions.index[0], end=predictions.index[1], error="Connection refused"
+        )
+    ]
+    assert forwarder.flush() == []
+    forwarder.close()
+
+
+def test_write_to_influx_in_batches(mock_influx_dataframe_client):
+    forwarder = ForwardPredictionsIntoInflux(
+        destination_influx_uri="root:root@localhost:8086/testdb", points_per_request=3
+    )
+    mock_influx_dataframe_client._database = "testdb"
+    mock_influx_dataframe_client._headers = {"Accept": "application/x-msgpack"}
+    forwarder.dataframe_client = mock_influx_dataframe_client
+
+    forwarder._write_to_influx_with_retries(get_test_data(["tag-1", "tag-2"]), "resampled", tags={"machine": "m-1"})
+
+    bodies = [call.kwargs["data"] for call in mock_influx_dataframe_client.request.call_args_list]
+    assert [body.count(b"\n") for body in bodies] == [3, 3, 2]
+    assert bodies[0].startswith(b"resampled,machine=m-1,sensor_name=tag-1 sensor_value=0i ")
+    call = mock_influx_dataframe_client.request.call_args_list[0]
+    assert call.kwargs["params"] == {"db": "testdb"}
+    assert call.kwargs["headers"]["Content-Type"] == "application/octet-stream"
+
+
+@pytest.fixture
+def coalescing_forwarder(mock_influx_dataframe_client):
+    forwarder = ForwardPredictionsIntoInflux(
+        destination_influx_uri="root:root@localhost:8086/testdb", n_retries=0, coalesce_bytes=10_000
+    )
+    mock_influx_dataframe_client._database = "testdb"
+    mock_influx_dataframe_client._headers = {}
+    forwarder.dataframe_client = mock_influx_dataframe_client
+    return forwarder
+
+
+def test_coalesce_writes(coalescing_forwarder, mock_influx_dataframe_client, machine):
+    predictions = pd.DataFrame(
+        np.ones((4, 4)),
+        columns=pd.MultiIndex.from_product([["model-input", "model-output"], ["TRC1", "TRC2"]]),
+        index=pd.date_range("2020-01-01", periods=4, freq="10T", tz="UTC"),
+    )
+
+    coalescing_forwarder(predictions=predictions, machine=machine)
+    coalescing_forwarder(resampled_sensor_data=get_test_data(["TRC1", "TRC2"]))
+
+    assert coalescing_forwarder.deferred
+    assert not mock_influx_dataframe_client.request.called
+    assert coalescing_forwarder.flush() == []
+    (call,) = mock_influx_dataframe_client.request.call_args_list
+    lines = call.kwargs["data"].decode().splitlines()
+    assert len(lines) == 2 * 8 + 8
+    assert lines[0].startswith("model-input,machine=gordo-test,") and lines[-1].startswith("resampled,")
+
+    # Written right away once there are enough points
+    coalescing_forwarder.coalesce_bytes = 1
+    coalescing_forwarder(predictions=predictions, machine=machine)
+    assert mock_influx_dataframe_client.request.call_count == 3
+
+
+def test_coalesce_writes_failures(coalescing_forwarder, mock_influx_dataframe_client, machine):
+    mock_influx_dataframe_client.request.side_effect = OSError("Connection refused")
+    predictions = pd.DataFrame(
+        {"TRC1": [1.0, 2.0], "TRC2": [1.0, 2.0]}, index=pd.date_range("2020-01-01", periods=2, freq="10T")
+    )
+    later_predictions = predictions.shift(2, freq="10T")
+    coalescing_forwarder(predictions=predictions, machine=machine)
+    coalescing_forwarder(predictions=later_predictions, machine=machine)
+
+    assert coalescing_forwarder.flush() == [
+        ForwardingFailure(
+            machine=machine, start=predictions.index[0], end=later_predictions.index[-1], error="Connection refused"
+        )
+    ]
+    assert coalescing_forwarder.flush() == []
+
+    # A queued forwarder flushes the forwarder it queues for
+    queued = QueuedForwarder(coalescing_forwarder)
+    queued(predictions=predictions, machine=machine)
+    assert [failure.machine for failure in queued.close()] == [machine]
+
+
+def test_write_to_influx_concurrently(mock_influx_dataframe_client):
+    lock = threading.Lock()
+    running, max_running, attempts = [0], [0], []
+
+    def request(data, **kwargs):
+        with lock:
+            attempts.append(data)
+            running[0] += 1
+            max_running[0] = max(max_running[0], running[0])
+            # The first attempt of one of the bodies fails
+            failing = attempts.count(data) == 1 and b"sensor_name=tag-2 sensor_value=2i " in data
+        try:
+            threading.Event().wait(0.05)
+            if failing:
+                raise OSError("Connection reset")
+        finally:
+            with lock:
+                running[0] -= 1
+
+    forwarder = ForwardPredictionsIntoInflux(
+        destination_influx_uri="root:root@localhost:8086/testdb", points_per_request=1, write_workers=3
+    )
+    mock_influx_dataframe_client._database = "testdb"
+    mock_influx_dataframe_client._headers = {}
+    mock_influx_dataframe_client.request.side_effect = request
+    forwarder.dataframe_client = mock_influx_dataframe_client
+
+    with patch("gordo_client.forwarders.time.sleep"):
+        forwarder._write_to_influx_with_retries(get_test_data(["tag-1", "tag-2"]), "resampled")
+
+    # Every body once, and the failed one again
+    assert len(attempts) == 8 + 1
+    assert len(set(attempts)) == 8
+    assert max_running[0] == 3
+
+
+def test_write_to_influx_concurrently_raises(mock_influx_dataframe_client):
+    forwarder = ForwardPredictionsIntoInflux(
+        destination_influx_uri="root:root@localhost:8086/testdb", n_retries=0, points_per_request=1, write_workers=2
+    )
+    mock_influx_dataframe_client.request.side_effect = OSError("Connection refused")
+    forwarder.dataframe_client = mock_influx_dataframe_client
+
+    with pytest.raises(OSError, match="Connection refused"):
+        forwarder._write_to_influx_with_retries(get_test_data(["tag-1", "tag-2"]), "resampled")
+    # Stops encoding and posting the bodies after the first failures
+    assert mock_influx_dataframe_client.request.call_count < 8
+
+
+def test_forward_predictions_missing_values(mock_influx_dataframe_client, machine):
+    forwarder = ForwardPredictionsIntoInflux(destination_influx_uri="root:root@localhost:8086/testdb")
+    mock_influx_dataframe_client._database = "testdb"
+    mock_influx_dataframe_client._headers = {}
+    forwarder.dataframe_client = mock_influx_dataframe_client
+    predictions = pd.DataFrame(
+        [[np.nan, 1.0, np.inf, 2.0], [3.0, 4.0, 5.0, 6.0]],
+        columns=pd.MultiIndex.from_product([["model-input", "model-output"], [0, 1]]),
+        index=pd.date_range("2020-01-01", periods=2, freq="10T", tz="UTC"),
+    )
+
+    with patch("gordo_client.forwarders.extract_tag_name", side_effect=sensor_tag.extract_tag_name) as tag_name:
+        forwarder(predictions=predictions, machine=machine)
+        forwarder(predictions=predictions, machine=machine)
+
+    # Computed once for the tag list of the machine
+    assert tag_name.call_count == len(machine.dataset["tag_list"])
+    lines = [
+        line
+        for call in mock_influx_dataframe_client.request.call_args_list[:2]
+        for line in call.kwargs["data"].decode().splitlines()
+    ]
+    # Only the missing values are skipped, not the other values of their rows
+    assert [line.split(" ")[0].split(",", 2)[-1] + " " + line.split(" ")[1] for line in lines] == [
+        "sensor_name=TRC2 sensor_value=1.0",
+        "sensor_name=TRC1 sensor_value=3.0",
+        "sensor_name=TRC2 sensor_value=4.0",
+        "sensor_name=TRC2 sensor_value=2.0",
+        "sensor_name=TRC1 sensor_value=5.0",
+        "sensor_name=TRC2 sensor_value=6.0",
+    ]
+
+
+def test_parquet_forwarder(tmpdir, machine):
+    forwarder = ForwardPredictionsIntoParquet(str(tmpdir), rows_per_file=90, row_group_size=40)
+    index = pd.date_range("2020-01-01", periods=2 * 144, freq="10T", tz="UTC")
+    predictions = pd.DataFrame(
+        np.random.rand(len(index), 2),
+        columns=pd.MultiIndex.from_product([["model-output"], ["TRC1", "TRC2"]]),
+        index=index,
+    )
+    other_machine = machine.copy(update={"name": "gordo test/2"})
+
+    # From the workers of the client, a batch of 48 rows at a time
+    threads = [
+        threading.Thread(target=forwarder, kwargs=dict(predictions=predictions.iloc[i : i + 48], machine=m))
+        for i in range(0, len(index), 48)
+        for m in (machine, other_machine)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    # 144 rows per machine and day: a file once 96 of them are buffered, the others left to flush
+    assert len(ds.dataset(str(tmpdir.join("predictions")), partitioning="hive").files) == 2 * 2
+    assert forwarder.flush() == []
+
+    dataset = ds.dataset(str(tmpdir.join("predictions")), partitioning="hive")
+    table = dataset.to_table()
+    assert table.num_rows == 2 * len(index)
+    assert sorted(set(table.column("machine").to_pylist())) == ["gordo test/2", "gordo-test"]
+    assert sorted(set(table.column("date").to_pylist())) == ["2020-01-01", "2020-01-02"]
+    files = [pq.ParquetFile(path) for path in dataset.files]
+    assert len(files) == 2 * 2 * 2
+    assert max(f.metadata.row_group(i).num_rows for f in files for i in range(f.num_row_groups)) == 40
+    # No partial files left behind
+    assert not [path for path in tmpdir.visit() if path.basename.startswith(".")]
+
+    machine_1 = dataset.to_table(filter=ds.field("machine") == "gordo-test").to_pandas().sort_values("time")
+    assert np.allclose(machine_1["model-output/TRC1"].values, predictions[("model-output", "TRC1")].values)
+
+
+def test_parquet_forwarder_failures(tmpdir, machine):
+    # A file where the dataset directory should be
+    tmpdir.join("predictions").write("")
+    forwarder = ForwardPredictionsIntoParquet(str(tmpdir))
+    predictions = pd.DataFrame({"value": [1.0, 2.0]}, index=pd.date_range("2020-01-01", periods=2, freq="10T"))
+
+    forwarder(predictions=predictions, machine=machine)
+    forwarder(resampled_sensor_data=predictions)
+
+    (failure,) = forwarder.flush()
+    assert (failure.machine, failure.start, failure.end) == (machine, predictions.index[0], predictions.index[1])
+    assert forwarder.deferred and forwarder.flush() == []
+    assert len(ds.dataset(str(tmpdir.join("resampled")), partitioning="hive").files) == 1
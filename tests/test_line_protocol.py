@@ -0,0 +1,77 @@
+import numpy as np
+import pandas as pd
+import pytest
+from influxdb import DataFrameClient
+
+from gordo_client.line_protocol import encode_points
+
+
+def _stacked_lines(df: pd.DataFrame, measurement: str, tags: dict) -> list:
+    """
+    Lines DataFrameClient writes for the frame stacked into name and value columns.
+    """
+    df = df.copy()
+    df.columns = df.columns.astype(str)
+    stacked = df.stack().to_frame(name="sensor_value").reset_index(level=1)
+    stacked = stacked.rename(columns={"level_1": "sensor_name"})
+    return DataFrameClient()._convert_dataframe_to_lines(
+        stacked, measurement, field_columns=["sensor_value"], tag_columns=["sensor_name"], global_tags=tags
+    )
+
+
+@pytest.mark.parametrize(
+    "values",
+    [
+        np.random.RandomState(0).normal(scale=1e6, size=(50, 4)),
+        np.random.RandomState(0).randint(-100, 100, size=(50, 4)),
+    ],
+)
+def test_encode_points_as_data_frame_client(values):
+    df = pd.DataFrame(values, columns=["tag-1", "tag-2", 3, "tag-4"])
+    df.index = pd.date_range("2020-01-01", periods=len(df), freq="10T", tz="UTC")
+    tags = {"machine": "machine-1", "anomaly": "yes"}
+
+    lines = b"".join(encode_points(df, "model-output", tags=tags)).decode().splitlines()
+
+    assert lines == _stacked_lines(df, "model-output", tags)
+
+
+def test_encode_points_batches():
+    df = pd.DataFrame(
+        {"tag-1": [1.0, np.nan, np.inf, 4.0], "tag-2": [1.0, 2.0, 3.0, -np.inf]},
+        index=pd.date_range("2020-01-01", periods=4, freq="10T"),
+    )
+
+    bodies = list(encode_points(df, "resampled", batch_size=2))
+
+    assert [body.count(b"\n") for body in bodies] == [2, 2, 1]
+    assert b"inf" not in b"".join(bodies) and b"nan" not in b"".join(bodies)
+    assert list(encode_points(df.iloc[:0], "resampled")) == []
+
+
+def test_encode_points_escapes():
+    df = pd.DataFrame({"tag 1,a=b": [1.0]}, index=pd.date_range("2020-01-01", periods=1))
+
+    (body,) = encode_points(df, "model output", tags={"machine": "machine=1"})
+
+    assert (
+        body == b"model\\ output,machine=machine\\=1,sensor_name=tag\\ 1\\,a\\=b sensor_value=1.0 1577836800000000000\n"
+    )
+
+
+def test_encode_points_requires_dates():
+    with pytest.raises(TypeError):
+        list(encode_points(pd.DataFrame({"tag-1": [1.0]}), "resampled"))
+
+
+def test_encode_points_columns():
+    df = pd.DataFrame({0: [1.0], 1: [2.0]}, index=pd.date_range("2020-01-01", periods=1))
+
+    (body,) = encode_points(df, "model-output", columns=["tag-1", "tag-2"])
+
+    assert [line.split(" ")[0] for line in body.decode().splitlines()] == [
+        "model-output,sensor_name=tag-1",
+        "model-output,sensor_name=tag-2",
+    ]
+    with pytest.raises(ValueError):
+        list(encode_points(df, "model-output", columns=["tag-1"]))
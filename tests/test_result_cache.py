@@ -0,0 +1,48 @@
+from datetime import datetime
+
+import pandas as pd
+import pyarrow as pa
+from pytz import UTC
+
+from gordo_client.result_cache import ResultCache, input_hash
+
+
+def _predictions(value: float) -> pd.DataFrame:
+    return pd.DataFrame({"model-output": [value]}, index=pd.date_range("2020-01-01", periods=1, tz=UTC))
+
+
+def test_input_hash():
+    X = _predictions(1.0)
+    assert input_hash(X, X) == input_hash(X.copy(), X.copy())
+    assert input_hash(X) != input_hash(X, X)
+    assert input_hash(X) != input_hash(X.rename(columns={"model-output": "other"}))
+    assert input_hash(X) != input_hash(X.shift(freq="1D"))
+
+
+def test_set_replaces_other_inputs(tmpdir):
+    cache = ResultCache(str(tmpdir), project="gordo-test")
+    start, end = datetime(2020, 1, 1, tzinfo=UTC), datetime(2020, 1, 2, tzinfo=UTC)
+    cache.set("machine-1", "1", start, end, "old", _predictions(1.0))
+    cache.set("machine-1", "1", start, end, "new", pa.Table.from_pandas(_predictions(2.0)))
+
+    assert cache.get("machine-1", "1", start, end, "old") is None
+    assert cache.get("machine-1", "1", start, end, "new").to_pandas().equals(_predictions(2.0))
+    assert cache.get("machine-1", "1", pd.Timestamp(start), pd.Timestamp(end), "new") is not None
+
+
+def test_prune(tmpdir):
+    cache = ResultCache(str(tmpdir), project="gordo-test")
+    for revision in ("1", "2"):
+        for day in (1, 2):
+            start, end = datetime(2020, 1, day, tzinfo=UTC), datetime(2020, 1, day + 1, tzinfo=UTC)
+            cache.set("machine-1", revision, start, end, "hash", _predictions(1.0))
+
+    cache.prune(["2"], before=datetime(2020, 1, 3, tzinfo=UTC))
+
+    assert (
+        cache.get("machine-1", "1", datetime(2020, 1, 2, tzinfo=UTC), datetime(2020, 1, 3, tzinfo=UTC), "hash") is None
+    )
+    assert (
+        cache.get("machine-1", "2", datetime(2020, 1, 1, tzinfo=UTC), datetime(2020, 1, 2, tzinfo=UTC), "hash") is None
+    )
+    assert cache.get("machine-1", "2", datetime(2020, 1, 2, tzinfo=UTC), datetime(2020, 1, 3, tzinfo=UTC), "hash")
@@ -0,0 +1,147 @@
+import threading
+import time
+from concurrent.futures import CancelledError, wait
+
+import pytest
+
+from gordo_client.scheduler import RetryLater, Scheduler, run_now
+
+
+class Gate:
+    """
+    Tasks which block until released, recording the order they started in
+    """
+
+    def __init__(self):
+        self.started = []
+        self.running = 0
+        self.max_running = 0
+        self._lock = threading.Lock()
+        self._release = threading.Event()
+
+    def task(self, name):
+        with self._lock:
+            self.started.append(name)
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+        self._release.wait(timeout=10)
+        with self._lock:
+            self.running -= 1
+        return name
+
+    def release(self):
+        self._release.set()
+
+
+@pytest.fixture
+def scheduler():
+    scheduler = Scheduler(max_workers=2)
+    yield scheduler
+    scheduler.shutdown()
+
+
+def test_submit_result(scheduler):
+    assert scheduler.submit("group", sum, [1, 2, 3]).result() == 6
+
+
+def test_submit_exception(scheduler):
+    future = scheduler.submit("group", int, "not-a-number")
+    with pytest.raises(ValueError):
+        future.result()
+
+
+def test_max_workers(scheduler):
+    gate = Gate()
+    futures = [scheduler.submit(f"group-{i % 3}", gate.task, i) for i in range(10)]
+    time.sleep(0.1)
+
+    assert scheduler.n_running == 2
+    assert scheduler.n_pending == 8
+    gate.release()
+    wait(futures)
+    assert gate.max_running == 2
+    assert sorted(future.result() for future in futures) == list(range(10))
+
+
+def test_round_robin():
+    scheduler = Scheduler(max_workers=1)
+    gate = Gate()
+    # Occupy the only worker, so the order of the others is decided by the scheduler
+    blocker = scheduler.submit("blocker", gate.task, "blocker")
+    futures = [scheduler.submit("big", gate.task, f"big-{i}") for i in range(3)]
+    futures += [scheduler.submit("small", gate.task, "small-0")]
+    gate.release()
+    wait([blocker, *futures])
+    scheduler.shutdown()
+
+    assert gate.started == ["blocker", "big-0", "small-0", "big-1", "big-2"]
+
+
+def test_max_per_group():
+    scheduler = Scheduler(max_workers=3, max_per_group=1)
+    gate = Gate()
+    futures = [scheduler.submit("big", gate.task, f"big-{i}") for i in range(3)]
+    futures += [scheduler.submit("small", gate.task, "small-0")]
+    time.sleep(0.1)
+
+    assert sorted(gate.started) == ["big-0", "small-0"]
+    gate.release()
+    wait(futures)
+    scheduler.shutdown()
+    assert gate.max_running == 2
+
+
+def test_cancel_pending():
+    scheduler = Scheduler(max_workers=1)
+    gate = Gate()
+    running = scheduler.submit("group", gate.task, "running")
+    pending = scheduler.submit("group", gate.task, "pending")
+
+    assert pending.cancel()
+    gate.release()
+    running.result()
+    scheduler.shutdown()
+    assert gate.started == ["running"]
+
+
+def _flaky(attempt=1, failures=1, delay=0.2):
+    if attempt <= failures:
+        raise RetryLater(delay, attempt=attempt + 1)
+    return attempt
+
+
+def test_retry_later():
+    scheduler = Scheduler(max_workers=1)
+    retried = scheduler.submit("flaky", _flaky)
+    # Runs on the only worker while the flaky task waits for its retry
+    other = scheduler.submit("other", sum, [1, 2])
+
+    assert other.result(timeout=0.1) == 3
+    assert scheduler.n_delayed == 1
+    assert not retried.done()
+    assert retried.result(timeout=5) == 2
+    scheduler.shutdown()
+
+
+def test_cancel_retry_later():
+    scheduler = Scheduler(max_workers=1)
+    future = scheduler.submit("flaky", _flaky, delay=10)
+    time.sleep(0.1)
+
+    assert scheduler.cancel(future)
+    with pytest.raises(CancelledError):
+        future.result(timeout=1)
+    done = scheduler.submit("group", sum, [1])
+    done.result()
+    assert not scheduler.cancel(done)
+    scheduler.shutdown()
+
+
+def test_run_now():
+    assert run_now(_flaky, failures=2, delay=0) == 3
+
+
+@pytest.mark.parametrize("kwargs", [dict(max_workers=0), dict(max_workers=1, max_per_group=0)])
+def test_invalid_limits(kwargs):
+    with pytest.raises(ValueError):
+        Scheduler(**kwargs)
@@ -0,0 +1,74 @@
+import socket
+
+import pytest
+import requests
+
+from benchmarks.server import StandInServer
+from gordo_client import Client
+from gordo_client.transport import PooledAdapter, TransportStats, keepalive_socket_options
+
+MACHINES = {f"machine-{i}": ["tag-1", "tag-2"] for i in range(20)}
+
+
+@pytest.fixture(scope="module")
+def server():
+    with StandInServer(machines=MACHINES) as server:
+        yield server
+
+
+def _client(server, **kwargs) -> Client:
+    return Client(project=server.project, host=server.host, port=server.port, scheme="http", **kwargs)
+
+
+@pytest.mark.parametrize("session_per_worker", [False, True])
+def test_connections_reused(server, session_per_worker):
+    client = _client(server, parallelism=4, session_per_worker=session_per_worker)
+
+    assert len(client.get_metadata()) == len(MACHINES)
+
+    # The revisions, the models, and the metadata of every machine
+    stats = client.transport_stats()
+    assert stats.requests == 2 + len(MACHINES)
+    assert 1 <= stats.connections <= 4
+
+
+def test_idle_timeout(server):
+    client = _client(server, parallelism=1, idle_timeout=0)
+
+    client.get_machine_names()
+    client.session.get(f"{client.server_endpoint}/revisions").raise_for_status()
+
+    assert client.transport_stats() == TransportStats(requests=3, connections=3)
+    # Only the pool of the current connection is kept
+    assert len(client.session.adapters["http://"]._pools) == 1
+
+
+def test_mounted_adapters_kept(server):
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(max_retries=3)
+    session.mount("http://", adapter)
+
+    client = _client(server, session=session)
+
+    assert client.session.adapters["http://"] is adapter
+    assert isinstance(client.session.adapters["https://"], PooledAdapter)
+    # The session of the caller is left as is
+    assert not isinstance(session.adapters["https://"], PooledAdapter)
+    client.get_machine_names()
+    assert client.transport_stats() == TransportStats(requests=0, connections=0)
+
+
+def test_http2(server):
+    pytest.importorskip("httpx")
+    # The stand-in server only speaks HTTP/1.1, which httpx falls back to
+    client = _client(server, parallelism=4, http2=True)
+
+    assert len(client.get_metadata()) == len(MACHINES)
+
+    stats = client.transport_stats()
+    assert stats.requests == 2 + len(MACHINES)
+    assert 1 <= stats.connections <= 4
+
+
+def test_keepalive_socket_options():
+    assert (socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1) in keepalive_socket_options(60)